@@ -0,0 +1,643 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import functools
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+
+from aiohttp import web
+
+# Add the parent directory to Python path so we can import from src
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from src.utils import (
+    create_bedrock_client,
+    generate_conversation,
+    stream_conversation,
+    SingleFlightClient,
+    ScheduledClient,
+    RequestScheduler,
+    INTERACTIVE,
+    QueueFullError,
+    CircuitOpenError,
+    ContextWindowExceededError,
+    CancellationToken,
+    StreamBuffer,
+    NOVA_LITE,
+    ASYNC_BEDROCK_AVAILABLE,
+    AsyncSingleFlightClient,
+    create_async_bedrock_client,
+    async_generate_conversation,
+    async_stream_conversation,
+    get_stop_reason_stats,
+    warm_up_client,
+    async_warm_up_client,
+    KeepAlive,
+    AsyncKeepAlive,
+    extract_text,
+)
+
+# Serving limits, configurable through environment variables. Requests over
+# API_CONCURRENCY_LIMIT are rejected with 429 instead of queueing without bound
+CONCURRENCY_LIMIT = int(os.environ.get("API_CONCURRENCY_LIMIT", "200"))
+MAX_THREADS = int(os.environ.get("API_MAX_THREADS", "64"))
+# Bedrock calls running at once. The API process has its own scheduler, so
+# its calls do not share the process default of 8 slots
+BEDROCK_CONCURRENCY = int(os.environ.get("API_BEDROCK_CONCURRENCY", str(MAX_THREADS)))
+WARM_CONNECTIONS = int(os.environ.get("API_WARM_CONNECTIONS", "4"))
+KEEPALIVE_SECONDS = float(os.environ.get("API_KEEPALIVE_SECONDS", "60"))
+
+CHAT_SYSTEM_PROMPT = "You are a helpful, friendly AI assistant."
+
+# Endpoints not counted against the concurrency limit
+UNLIMITED_PATHS = ("/health", "/metrics")
+
+
+def load_pattern(directory):
+    """
+    Import a pattern's example.py. Every pattern module is named example, so
+    each one is loaded under its directory name instead of through sys.path.
+    """
+    path = os.path.join(ROOT, "patterns", directory, "example.py")
+    spec = importlib.util.spec_from_file_location(f"pattern_{directory}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+prompt_chaining = load_pattern("0_prompt_chaining")
+routing = load_pattern("1_routing")
+parallelization = load_pattern("2_parallelization")
+
+MARKETING_PLATFORMS = {
+    "email": parallelization.generate_email_content,
+    "instagram": parallelization.generate_instagram_content,
+    "website": parallelization.generate_website_content,
+}
+
+
+class Metrics:
+    """
+    Request counters and latencies per endpoint, thread-safe.
+    """
+
+    def __init__(self, window=1000):
+        """
+        Args:
+            window (int): Number of recent latencies kept per endpoint for percentiles
+        """
+        self.in_flight = 0
+        self.rejected = 0
+        self._started = time.time()
+        self._requests = collections.Counter()
+        self._errors = collections.Counter()
+        self._latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=window)
+        )
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency, error=False):
+        with self._lock:
+            self._requests[endpoint] += 1
+            if error:
+                self._errors[endpoint] += 1
+            self._latencies[endpoint].append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, count in self._requests.items():
+                latencies = sorted(self._latencies[endpoint])
+                endpoints[endpoint] = {
+                    "requests": count,
+                    "errors": self._errors[endpoint],
+                    "p50_seconds": _percentile(latencies, 50),
+                    "p95_seconds": _percentile(latencies, 95),
+                    "p99_seconds": _percentile(latencies, 99),
+                }
+            return {
+                "uptime_seconds": time.time() - self._started,
+                "in_flight": self.in_flight,
+                "concurrency_limit": CONCURRENCY_LIMIT,
+                "rejected": self.rejected,
+                "endpoints": endpoints,
+            }
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+_DONE = object()
+
+
+async def iterate_in_thread(generator, executor):
+    """
+    Iterate a blocking generator from the event loop, running each step on a
+    worker thread. When the caller stops early the generator is closed, which
+    cancels any Bedrock stream it holds, once its current step has returned.
+    """
+    future = None
+    try:
+        while True:
+            context = contextvars.copy_context()
+            future = executor.submit(context.run, next, generator, _DONE)
+            item = await asyncio.wrap_future(future)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        if future is None:
+            generator.close()
+        else:
+            # A running generator cannot be closed, wait for its step to end
+            future.add_done_callback(lambda _: generator.close())
+
+
+def stream_chat_tokens(client, prompt, conversation_history):
+    """
+    Blocking token stream used when aiobotocore is not installed.
+
+    Yields:
+        str: Response text so far
+    """
+    token_buffer = StreamBuffer()
+    cancel_token = CancellationToken()
+
+    def stream_thread():
+        try:
+            stream_conversation(
+                client=client,
+                prompt=prompt,
+                model_id=NOVA_LITE,
+                system_prompt=CHAT_SYSTEM_PROMPT,
+                conversation_history=conversation_history,
+                callback=token_buffer.put,
+                cancel_token=cancel_token,
+                check_context=True,
+            )
+        except Exception as exc:
+            # Raised to the consumer from iter_text
+            token_buffer.fail(exc)
+        finally:
+            token_buffer.close()
+
+    threading.Thread(target=stream_thread, daemon=True).start()
+
+    try:
+        yield from token_buffer.iter_text()
+    finally:
+        if not token_buffer.finished():
+            cancel_token.cancel()
+            token_buffer.cancel()
+
+
+def format_history(history):
+    """
+    Convert [{"role": ..., "content": "text"}, ...] into Converse messages.
+    """
+    messages = []
+    for turn in history or []:
+        if turn.get("role") not in ("user", "assistant") or not isinstance(
+            turn.get("content"), str
+        ):
+            raise web.HTTPBadRequest(
+                text=json.dumps(
+                    {"error": "history items need a role (user or assistant) and text"}
+                ),
+                content_type="application/json",
+            )
+        messages.append({"role": turn["role"], "content": [{"text": turn["content"]}]})
+    return messages
+
+
+async def read_json(request, *required):
+    """
+    Parse the request body and check that the required string fields are present.
+    """
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        body = None
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(
+            text=json.dumps({"error": "Request body must be a JSON object"}),
+            content_type="application/json",
+        )
+    for field in required:
+        if not isinstance(body.get(field), str) or not body[field].strip():
+            raise web.HTTPBadRequest(
+                text=json.dumps({"error": f"Missing field: {field}"}),
+                content_type="application/json",
+            )
+    return body
+
+
+async def open_event_stream(request):
+    """
+    Start a Server-Sent Events response.
+    """
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            # Stop proxies such as nginx from buffering the stream
+            "X-Accel-Buffering": "no",
+        }
+    )
+    await response.prepare(request)
+    return response
+
+
+async def send_event(response, event, data):
+    await response.write(
+        f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+    )
+
+
+def error_status(exc):
+    """
+    HTTP status for an exception raised by a pattern or helper.
+    """
+    if isinstance(exc, ContextWindowExceededError):
+        return 413
+    if isinstance(exc, (QueueFullError, CircuitOpenError)):
+        return 503
+    return 500
+
+
+async def send_error_event(response, exc):
+    # The status is already sent once a stream has started, so the event
+    # carries the status the error would have had
+    await send_event(
+        response,
+        "error",
+        {"error": f"{type(exc).__name__}: {exc}", "status": error_status(exc)},
+    )
+
+
+@web.middleware
+async def limits_middleware(request, handler):
+    """
+    Reject requests over the concurrency limit and record metrics.
+    """
+    metrics = request.app["metrics"]
+    if request.path in UNLIMITED_PATHS:
+        return await handler(request)
+
+    if metrics.in_flight >= CONCURRENCY_LIMIT:
+        metrics.rejected += 1
+        return web.json_response(
+            {"error": "Too many concurrent requests"},
+            status=429,
+            headers={"Retry-After": "1"},
+        )
+
+    resource = request.match_info.route.resource
+    endpoint = resource.canonical if resource is not None else "unmatched"
+    metrics.in_flight += 1
+    start = time.perf_counter()
+    error = False
+    try:
+        response = await handler(request)
+        error = response.status >= 400
+        return response
+    except (web.HTTPException, ConnectionResetError) as exc:
+        # Client errors and disconnects during a stream pass through unchanged
+        error = getattr(exc, "status", 500) >= 400
+        raise
+    except Exception as exc:
+        error = True
+        return web.json_response(
+            {"error": f"{type(exc).__name__}: {exc}"}, status=error_status(exc)
+        )
+    finally:
+        metrics.in_flight -= 1
+        metrics.record(endpoint, time.perf_counter() - start, error)
+
+
+async def run_blocking(request, fn, *args, **kwargs):
+    """
+    Run a blocking pattern function on the API's worker threads.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        request.app["executor"], functools.partial(context.run, fn, *args, **kwargs)
+    )
+
+
+async def handle_route(request):
+    """
+    POST /v1/route {"inquiry"}: classify an inquiry and generate the routed response.
+    """
+    body = await read_json(request, "inquiry")
+    inquiry = body["inquiry"]
+
+    client = request.app["client"]
+
+    classification = await run_blocking(
+        request, routing.classify_inquiry, inquiry, client=client
+    )
+    response = await run_blocking(
+        request,
+        routing.generate_response,
+        inquiry,
+        classification["language"],
+        classification["category"],
+        client=client,
+    )
+    return web.json_response({"classification": classification, "response": response})
+
+
+async def handle_support_email(request):
+    """
+    POST /v1/support-email {"inquiry", "stream"}: run the prompt chain.
+
+    Streamed as "analysis", "points", then "token" events with the email text
+    and a final "done" event.
+    """
+    body = await read_json(request, "inquiry")
+    inquiry = body["inquiry"]
+    client = request.app["client"]
+
+    if not body.get("stream"):
+        email = await run_blocking(
+            request, prompt_chaining.generate_support_email, inquiry, client=client
+        )
+        return web.json_response({"email": email})
+
+    response = await open_event_stream(request)
+    steps = iterate_in_thread(
+        prompt_chaining.generate_support_email_stream(inquiry, client=client),
+        request.app["executor"],
+    )
+    email = ""
+    try:
+        async for step, value in steps:
+            if step == "email":
+                await send_event(response, "token", {"text": value[len(email):]})
+                email = value
+            else:
+                await send_event(response, step, value)
+        await send_event(response, "done", {"email": email})
+    except Exception as exc:
+        await send_error_event(response, exc)
+    finally:
+        await steps.aclose()
+    return response
+
+
+async def handle_marketing(request):
+    """
+    POST /v1/marketing {"product_info", "platforms", "stream"}: generate content
+    for several platforms concurrently.
+
+    Streamed as one "content" event per platform in completion order and a
+    final "done" event.
+    """
+    body = await read_json(request, "product_info")
+    platforms = body.get("platforms") or list(MARKETING_PLATFORMS)
+    unknown = [p for p in platforms if p not in MARKETING_PLATFORMS]
+    if unknown:
+        return web.json_response(
+            {
+                "error": f"Unknown platforms: {unknown}",
+                "platforms": list(MARKETING_PLATFORMS),
+            },
+            status=400,
+        )
+
+    tasks = [
+        asyncio.ensure_future(
+            run_blocking(
+                request,
+                MARKETING_PLATFORMS[platform],
+                body["product_info"],
+                client=request.app["client"],
+            )
+        )
+        for platform in platforms
+    ]
+
+    if not body.get("stream"):
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return web.json_response({"results": results})
+
+    response = await open_event_stream(request)
+    try:
+        for task in asyncio.as_completed(tasks):
+            try:
+                await send_event(response, "content", await task)
+            except Exception as exc:
+                await send_error_event(response, exc)
+        await send_event(response, "done", {"platforms": platforms})
+    finally:
+        for task in tasks:
+            task.cancel()
+    return response
+
+
+async def handle_chat(request):
+    """
+    POST /v1/chat {"prompt", "history", "stream"}: one chat turn.
+
+    history is a list of {"role": "user" | "assistant", "content": text}.
+    Streamed as "token" events and a final "done" event with the full text.
+    """
+    body = await read_json(request, "prompt")
+    history = format_history(body.get("history"))
+    prompt = body["prompt"]
+    async_client = request.app["async_client"]
+
+    if not body.get("stream"):
+        if async_client is not None:
+            result = await async_generate_conversation(
+                client=async_client,
+                prompt=prompt,
+                model_id=NOVA_LITE,
+                system_prompt=CHAT_SYSTEM_PROMPT,
+                conversation_history=history,
+                check_context=True,
+            )
+        else:
+            result = await run_blocking(
+                request,
+                lambda: generate_conversation(
+                    client=request.app["client"],
+                    prompt=prompt,
+                    model_id=NOVA_LITE,
+                    system_prompt=CHAT_SYSTEM_PROMPT,
+                    conversation_history=history,
+                    check_context=True,
+                ),
+            )
+        return web.json_response(
+            {
+                "text": extract_text(result),
+                "stop_reason": result.get("stopReason"),
+                "usage": result.get("usage"),
+            }
+        )
+
+    if async_client is not None:
+        tokens = async_stream_conversation(
+            client=async_client,
+            prompt=prompt,
+            model_id=NOVA_LITE,
+            system_prompt=CHAT_SYSTEM_PROMPT,
+            conversation_history=history,
+            check_context=True,
+        )
+    else:
+        tokens = _deltas(
+            iterate_in_thread(
+                stream_chat_tokens(request.app["client"], prompt, history),
+                request.app["executor"],
+            )
+        )
+
+    response = await open_event_stream(request)
+    text = ""
+    try:
+        async for token in tokens:
+            text += token
+            await send_event(response, "token", {"text": token})
+        await send_event(response, "done", {"text": text})
+    except Exception as exc:
+        await send_error_event(response, exc)
+    finally:
+        await tokens.aclose()
+    return response
+
+
+async def _deltas(texts_so_far):
+    # Turn "text so far" updates into the new chunks only
+    previous = ""
+    try:
+        async for text in texts_so_far:
+            yield text[len(previous):]
+            previous = text
+    finally:
+        await texts_so_far.aclose()
+
+
+async def handle_health(request):
+    """
+    GET /health: liveness check, does not call Bedrock.
+    """
+    return web.json_response(
+        {"status": "ok", "async_client": request.app["async_client"] is not None}
+    )
+
+
+async def handle_metrics(request):
+    """
+    GET /metrics: request counters and latency percentiles per endpoint,
+    scheduler queue state and stop reason counts.
+    """
+    return web.json_response(
+        {
+            "api": request.app["metrics"].snapshot(),
+            "scheduler": request.app["scheduler"].stats(),
+            "stop_reasons": get_stop_reason_stats(),
+        },
+        dumps=lambda value: json.dumps(value, default=str),
+    )
+
+
+async def on_startup(app):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(app["executor"])
+
+    # Open connections before the first request arrives
+    await loop.run_in_executor(None, warm_up_client, app["client"], WARM_CONNECTIONS)
+    if KEEPALIVE_SECONDS > 0:
+        app["keep_alive"] = KeepAlive(
+            app["client"], KEEPALIVE_SECONDS, WARM_CONNECTIONS
+        ).start()
+
+    if ASYNC_BEDROCK_AVAILABLE:
+        client = await create_async_bedrock_client(
+            max_pool_connections=CONCURRENCY_LIMIT
+        )
+        await async_warm_up_client(client, WARM_CONNECTIONS)
+        if KEEPALIVE_SECONDS > 0:
+            app["async_keep_alive"] = AsyncKeepAlive(
+                client, KEEPALIVE_SECONDS, WARM_CONNECTIONS
+            ).start()
+        app["async_client"] = AsyncSingleFlightClient(client)
+
+
+async def on_cleanup(app):
+    if "keep_alive" in app:
+        app["keep_alive"].stop()
+    if "async_keep_alive" in app:
+        await app["async_keep_alive"].stop()
+    if app["async_client"] is not None:
+        await app["async_client"].client.close()
+    app["executor"].shutdown(wait=False, cancel_futures=True)
+
+
+def create_app():
+    """
+    Build the API application.
+
+    Returns:
+        web.Application
+    """
+    app = web.Application(middlewares=[limits_middleware])
+    app["metrics"] = Metrics()
+    app["executor"] = concurrent.futures.ThreadPoolExecutor(
+        max_workers=MAX_THREADS, thread_name_prefix="api"
+    )
+    # All API calls are interactive, so no slots are reserved
+    app["scheduler"] = RequestScheduler(
+        max_concurrency=BEDROCK_CONCURRENCY, reserved_slots=0
+    )
+    # Used by the pattern endpoints, and for chat when aiobotocore is not
+    # installed. Identical concurrent requests share one Bedrock call, at
+    # interactive priority
+    app["client"] = SingleFlightClient(
+        ScheduledClient(
+            create_bedrock_client(max_pool_connections=MAX_THREADS),
+            scheduler=app["scheduler"],
+            priority=INTERACTIVE,
+            tenant="api",
+        )
+    )
+    app["async_client"] = None
+
+    app.router.add_post("/v1/route", handle_route)
+    app.router.add_post("/v1/support-email", handle_support_email)
+    app.router.add_post("/v1/marketing", handle_marketing)
+    app.router.add_post("/v1/chat", handle_chat)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP API for the agentic patterns.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    web.run_app(create_app(), host=args.host, port=args.port)
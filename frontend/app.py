@@ -1,4 +1,5 @@
 import gradio as gr
+import asyncio
 import sys
 import os
 
@@ -7,12 +8,43 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from src.utils import (
     create_bedrock_client,
+    SingleFlightClient,
+    ScheduledClient,
+    INTERACTIVE,
     generate_conversation,
+    ContextWindowExceededError,
     NOVA_LITE,
+    ASYNC_BEDROCK_AVAILABLE,
+    AsyncSingleFlightClient,
+    create_async_bedrock_client,
+    warm_up_client,
+    async_warm_up_client,
+    KeepAlive,
+    AsyncKeepAlive,
+    async_generate_conversation,
+    extract_text,
 )
 
-# Create a Bedrock client
-bedrock_client = create_bedrock_client()
+# Serving limits, configurable through environment variables. With the async
+# handler a waiting chat holds no thread, so the limit can be in the hundreds
+CONCURRENCY_LIMIT = int(os.environ.get("CHAT_CONCURRENCY_LIMIT", "200"))
+MAX_THREADS = int(os.environ.get("CHAT_MAX_THREADS", "40"))
+
+# Connections opened at startup and kept warm between bursts of traffic.
+# Set CHAT_KEEPALIVE_SECONDS=0 to disable the background keep-alive
+WARM_CONNECTIONS = int(os.environ.get("CHAT_WARM_CONNECTIONS", "4"))
+KEEPALIVE_SECONDS = float(os.environ.get("CHAT_KEEPALIVE_SECONDS", "60"))
+
+# Create a Bedrock client. Identical concurrent requests (e.g. many users
+# clicking the same example prompt) share a single Bedrock call, and chat
+# requests run at interactive priority ahead of any batch work in the process
+bedrock_client = SingleFlightClient(
+    ScheduledClient(
+        create_bedrock_client(max_pool_connections=MAX_THREADS),
+        priority=INTERACTIVE,
+        tenant="chat",
+    )
+)
 
 EXAMPLE_PROMPTS = [
     "Explain quantum computing in simple terms.",
@@ -20,12 +52,46 @@ EXAMPLE_PROMPTS = [
     "In 2 sentences, what's your take on the meaning of life?",
 ]
 
+SYSTEM_PROMPT = "You are a helpful, friendly AI assistant."
 
-def generate_response(prompt, history):
+CONTEXT_FULL_MESSAGE = "This conversation is too long for the model. Please clear the chat and start again."
+
+
+# Non-blocking client, created inside Gradio's event loop when the page is
+# first loaded, so its connections are warm before the first message
+async_client = None
+async_client_lock = asyncio.Lock()
+async_keep_alive = None
+
+
+async def get_async_client():
+    global async_client, async_keep_alive
+    async with async_client_lock:
+        if async_client is None:
+            client = await create_async_bedrock_client(
+                max_pool_connections=CONCURRENCY_LIMIT
+            )
+            await async_warm_up_client(client, WARM_CONNECTIONS)
+            if KEEPALIVE_SECONDS > 0:
+                async_keep_alive = AsyncKeepAlive(
+                    client, KEEPALIVE_SECONDS, WARM_CONNECTIONS
+                ).start()
+            async_client = AsyncSingleFlightClient(client)
+    return async_client
+
+
+async def warm_up_async_client():
     """
-    Generate text response using Bedrock's Converse API (non-streaming)
+    Page load handler that creates and warms the async client ahead of the
+    first message.
+    """
+    await get_async_client()
+
+
+def format_history(history):
+    """
+    Format Gradio chat history for the Converse API
     """
-    # Format conversation history for the Converse API
     conversation_history = []
     
     if history:
@@ -37,34 +103,76 @@ def generate_response(prompt, history):
                 conversation_history.append(
                     {"role": "assistant", "content": [{"text": assistant_msg}]}
                 )
+
+    return conversation_history
+
+
+def generate_response(prompt, history):
+    """
+    Generate text response using Bedrock's Converse API (non-streaming)
+    """
+    conversation_history = format_history(history)
     
     # Get the response from the model using generate_conversation
-    response = generate_conversation(
-        client=bedrock_client,
-        prompt=prompt,
-        model_id=NOVA_LITE,
-        system_prompt="You are a helpful, friendly AI assistant.",
-        temperature=0.7,
-        conversation_history=conversation_history,
-    )
-    
-    # Extract the text from the response
-    output_message = response["output"]["message"]
-    text_response = ""
-    
-    for content in output_message["content"]:
-        if "text" in content:
-            text_response = content["text"]
-            break
+    try:
+        response = generate_conversation(
+            client=bedrock_client,
+            prompt=prompt,
+            model_id=NOVA_LITE,
+            system_prompt=SYSTEM_PROMPT,
+            temperature=0.7,
+            conversation_history=conversation_history,
+            check_context=True,  # Reject oversized histories before calling Bedrock
+        )
+    except ContextWindowExceededError:
+        return CONTEXT_FULL_MESSAGE
     
     # Return the complete response (no streaming)
-    return text_response
+    return extract_text(response)
+
+
+async def generate_response_async(prompt, history):
+    """
+    Async version of generate_response. The Bedrock call does not block a
+    worker thread while waiting for the model.
+    """
+    client = await get_async_client()
+
+    try:
+        response = await async_generate_conversation(
+            client=client,
+            prompt=prompt,
+            model_id=NOVA_LITE,
+            system_prompt=SYSTEM_PROMPT,
+            temperature=0.7,
+            conversation_history=format_history(history),
+            check_context=True,
+        )
+    except ContextWindowExceededError:
+        return CONTEXT_FULL_MESSAGE
+
+    return extract_text(response)
 
 
 if __name__ == "__main__":
-    gr.ChatInterface(
-        fn=generate_response,
+    # Resolve credentials and open connections before the first user arrives.
+    # The async client lives on Gradio's event loop, so it is warmed on page load
+    if not ASYNC_BEDROCK_AVAILABLE:
+        warm_up_client(bedrock_client, WARM_CONNECTIONS)
+        if KEEPALIVE_SECONDS > 0:
+            KeepAlive(bedrock_client, KEEPALIVE_SECONDS, WARM_CONNECTIONS).start()
+
+    # Prefer the async handler, fall back to threads without aiobotocore
+    demo = gr.ChatInterface(
+        fn=generate_response_async if ASYNC_BEDROCK_AVAILABLE else generate_response,
         examples=EXAMPLE_PROMPTS,
         title="Bedrock Converse API Chat (Non-Streaming)",
         description="Basic chat example using AWS Bedrock Converse API without streaming.",
-    ).queue().launch(server_port=7861)
\ No newline at end of file
+    )
+    if ASYNC_BEDROCK_AVAILABLE:
+        with demo:
+            demo.load(warm_up_async_client, show_progress="hidden")
+
+    demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT).launch(
+        server_port=7861, max_threads=MAX_THREADS
+    )
\ No newline at end of file
@@ -1,7 +1,7 @@
 import gradio as gr
+import asyncio
 import sys
 import os
-import queue
 import threading
 
 # Add the parent directory to Python path so we can import from src
@@ -9,12 +9,45 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from src.utils import (
     create_bedrock_client,
+    SingleFlightClient,
+    ScheduledClient,
+    INTERACTIVE,
     stream_conversation,
+    CancellationToken,
+    StreamBuffer,
+    check_context_budget,
+    ContextWindowExceededError,
     NOVA_LITE,
+    ASYNC_BEDROCK_AVAILABLE,
+    AsyncSingleFlightClient,
+    create_async_bedrock_client,
+    warm_up_client,
+    async_warm_up_client,
+    KeepAlive,
+    AsyncKeepAlive,
+    async_stream_conversation,
 )
 
-# Create a Bedrock client
-bedrock_client = create_bedrock_client()
+# Serving limits, configurable through environment variables. With the async
+# handler a streaming chat holds no thread, so the limit can be in the hundreds
+CONCURRENCY_LIMIT = int(os.environ.get("CHAT_CONCURRENCY_LIMIT", "200"))
+MAX_THREADS = int(os.environ.get("CHAT_MAX_THREADS", "40"))
+
+# Connections opened at startup and kept warm between bursts of traffic.
+# Set CHAT_KEEPALIVE_SECONDS=0 to disable the background keep-alive
+WARM_CONNECTIONS = int(os.environ.get("CHAT_WARM_CONNECTIONS", "4"))
+KEEPALIVE_SECONDS = float(os.environ.get("CHAT_KEEPALIVE_SECONDS", "60"))
+
+# Create a Bedrock client. Identical concurrent requests (e.g. many users
+# clicking the same example prompt) share a single Bedrock call, and chat
+# requests run at interactive priority ahead of any batch work in the process
+bedrock_client = SingleFlightClient(
+    ScheduledClient(
+        create_bedrock_client(max_pool_connections=MAX_THREADS),
+        priority=INTERACTIVE,
+        tenant="chat",
+    )
+)
 
 EXAMPLE_PROMPTS = [
     "Explain quantum computing in simple terms.",
@@ -22,13 +55,50 @@ EXAMPLE_PROMPTS = [
     "In 2 sentences, what's your take on the meaning of life?",
 ]
 
+SYSTEM_PROMPT = "You are a helpful, friendly AI assistant."
 
-def generate_streaming_response(prompt, history):
+CONTEXT_FULL_MESSAGE = "This conversation is too long for the model. Please clear the chat and start again."
+
+
+# Bounded token buffer for the threaded handler: "block", "coalesce" or "latest"
+STREAM_BUFFER_POLICY = os.environ.get("STREAM_BUFFER_POLICY", StreamBuffer.COALESCE)
+STREAM_BUFFER_SIZE = int(os.environ.get("STREAM_BUFFER_SIZE", "64"))
+
+# Non-blocking client, created inside Gradio's event loop when the page is
+# first loaded, so its connections are warm before the first message
+async_client = None
+async_client_lock = asyncio.Lock()
+async_keep_alive = None
+
+
+async def get_async_client():
+    global async_client, async_keep_alive
+    async with async_client_lock:
+        if async_client is None:
+            client = await create_async_bedrock_client(
+                max_pool_connections=CONCURRENCY_LIMIT
+            )
+            await async_warm_up_client(client, WARM_CONNECTIONS)
+            if KEEPALIVE_SECONDS > 0:
+                async_keep_alive = AsyncKeepAlive(
+                    client, KEEPALIVE_SECONDS, WARM_CONNECTIONS
+                ).start()
+            async_client = AsyncSingleFlightClient(client)
+    return async_client
+
+
+async def warm_up_async_client():
     """
-    Generate streaming text response using Bedrock's Converse API
-    with true token-by-token streaming from the model to the UI.
+    Page load handler that creates and warms the async client ahead of the
+    first message.
+    """
+    await get_async_client()
+
+
+def format_history(history):
+    """
+    Format Gradio chat history for the Converse API
     """
-    # Format conversation history for the Converse API
     conversation_history = []
     
     if history:
@@ -40,52 +110,119 @@ def generate_streaming_response(prompt, history):
                 conversation_history.append(
                     {"role": "assistant", "content": [{"text": assistant_msg}]}
                 )
+
+    return conversation_history
+
+
+def generate_streaming_response(prompt, history):
+    """
+    Generate streaming text response using Bedrock's Converse API
+    with true token-by-token streaming from the model to the UI.
+    """
+    conversation_history = format_history(history)
+
+    # Reject oversized histories locally, before starting the stream
+    try:
+        check_context_budget(
+            NOVA_LITE,
+            conversation_history + [{"role": "user", "content": [{"text": prompt}]}],
+            [{"text": SYSTEM_PROMPT}],
+        )
+    except ContextWindowExceededError:
+        yield CONTEXT_FULL_MESSAGE
+        return
     
-    # Create a queue to communicate between the streaming thread and the generator
-    token_queue = queue.Queue()
-    
-    # This will signal when the streaming is complete
-    done_streaming = threading.Event()
+    # Bounded buffer between the streaming thread and the generator, so a slow
+    # client cannot make memory grow without limit
+    token_buffer = StreamBuffer(
+        max_items=STREAM_BUFFER_SIZE, policy=STREAM_BUFFER_POLICY
+    )
     
-    # Callback function that will be called by stream_conversation
-    def handle_token(token):
-        token_queue.put(token)
+    # Cancelled when the user presses stop or disconnects, which closes the
+    # Bedrock stream and stops paying for tokens nobody will read
+    cancel_token = CancellationToken()
     
     # Run the streaming in a background thread
     def stream_thread():
-        stream_conversation(
-            client=bedrock_client,
-            prompt=prompt,
-            model_id=NOVA_LITE,
-            system_prompt="You are a helpful, friendly AI assistant.",
-            conversation_history=conversation_history,
-            callback=handle_token,  # Pass our callback function
-        )
-        # Signal that streaming is complete
-        done_streaming.set()
+        try:
+            stream_conversation(
+                client=bedrock_client,
+                prompt=prompt,
+                model_id=NOVA_LITE,
+                system_prompt=SYSTEM_PROMPT,
+                conversation_history=conversation_history,
+                callback=token_buffer.put,  # Returns False once cancelled
+                cancel_token=cancel_token,
+            )
+        except Exception as exc:
+            # Raised in the generator below, so Gradio shows the error
+            token_buffer.fail(exc)
+        finally:
+            # Signal that streaming is complete
+            token_buffer.close()
     
     # Start the streaming thread
     threading.Thread(target=stream_thread, daemon=True).start()
     
-    # Generate function that yields tokens as they come in
+    try:
+        # Yield the accumulated response as tokens come in
+        for partial_response in token_buffer.iter_text():
+            yield partial_response
+    finally:
+        # Gradio closes this generator on stop or disconnect
+        if not token_buffer.finished():
+            cancel_token.cancel()
+            token_buffer.cancel()
+
+
+async def generate_streaming_response_async(prompt, history):
+    """
+    Async version of generate_streaming_response. Tokens are read from the
+    non-blocking event stream directly, without a background thread or queue.
+    On stop or disconnect Gradio cancels this generator, which closes the
+    Bedrock stream.
+    """
+    client = await get_async_client()
     partial_response = ""
-    
-    # Keep yielding until we've received all tokens
-    while not done_streaming.is_set() or not token_queue.empty():
-        try:
-            # Get the next token (timeout to check if we're done)
-            token = token_queue.get(timeout=0.05)
+
+    try:
+        async for token in async_stream_conversation(
+            client=client,
+            prompt=prompt,
+            model_id=NOVA_LITE,
+            system_prompt=SYSTEM_PROMPT,
+            conversation_history=format_history(history),
+            check_context=True,
+        ):
             partial_response += token
             yield partial_response
-        except queue.Empty:
-            # No tokens available right now, check if we're done
-            continue
+    except ContextWindowExceededError:
+        yield CONTEXT_FULL_MESSAGE
 
 
 if __name__ == "__main__":
-    gr.ChatInterface(
-        fn=generate_streaming_response,
+    # Resolve credentials and open connections before the first user arrives.
+    # The async client lives on Gradio's event loop, so it is warmed on page load
+    if not ASYNC_BEDROCK_AVAILABLE:
+        warm_up_client(bedrock_client, WARM_CONNECTIONS)
+        if KEEPALIVE_SECONDS > 0:
+            KeepAlive(bedrock_client, KEEPALIVE_SECONDS, WARM_CONNECTIONS).start()
+
+    # Prefer the async handler, fall back to threads without aiobotocore
+    demo = gr.ChatInterface(
+        fn=(
+            generate_streaming_response_async
+            if ASYNC_BEDROCK_AVAILABLE
+            else generate_streaming_response
+        ),
         examples=EXAMPLE_PROMPTS,
         title="Bedrock Converse API Chat with Streaming",
         description="Chat example using AWS Bedrock Converse API with real-time token streaming.",
-    ).queue().launch(server_port=7862)
\ No newline at end of file
+    )
+    if ASYNC_BEDROCK_AVAILABLE:
+        with demo:
+            demo.load(warm_up_async_client, show_progress="hidden")
+
+    demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT).launch(
+        server_port=7862, max_threads=MAX_THREADS
+    )
\ No newline at end of file
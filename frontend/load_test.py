@@ -0,0 +1,97 @@
+import argparse
+import concurrent.futures
+import statistics
+import time
+
+from gradio_client import Client
+
+DEFAULT_PROMPT = "In 2 sentences, what's your take on the meaning of life?"
+
+
+def run_chat(url, prompt):
+    """
+    Run one chat request and time it.
+
+    Returns:
+        dict: "first_output" and "total" latencies in seconds, and "error"
+    """
+    client = Client(url, verbose=False)
+    start = time.perf_counter()
+    first_output = None
+
+    try:
+        job = client.submit(prompt, api_name="/chat")
+        # Streaming apps produce several outputs, the first marks time to first token
+        for _ in job:
+            if first_output is None:
+                first_output = time.perf_counter() - start
+        job.result()
+    except Exception as exc:
+        return {"first_output": None, "total": None, "error": str(exc)}
+
+    total = time.perf_counter() - start
+    return {"first_output": first_output or total, "total": total, "error": None}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(name, values):
+    if not values:
+        return f"{name}: no successful requests"
+    return (
+        f"{name}: p50={percentile(values, 50):.2f}s "
+        f"p95={percentile(values, 95):.2f}s "
+        f"p99={percentile(values, 99):.2f}s "
+        f"max={max(values):.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test a running chat frontend with concurrent chats."
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:7862")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument(
+        "--unique",
+        action="store_true",
+        help="Make every prompt unique so requests are not coalesced",
+    )
+    args = parser.parse_args()
+
+    prompts = [
+        f"{args.prompt} (request {i})" if args.unique else args.prompt
+        for i in range(args.requests)
+    ]
+
+    print(
+        f"Sending {args.requests} chats to {args.url} "
+        f"with {args.concurrency} in flight..."
+    )
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda p: run_chat(args.url, p), prompts))
+    elapsed = time.perf_counter() - start
+
+    succeeded = [r for r in results if not r["error"]]
+    errors = [r["error"] for r in results if r["error"]]
+
+    print(f"\nCompleted in {elapsed:.2f} seconds")
+    print(f"Succeeded: {len(succeeded)}, failed: {len(errors)}")
+    print(f"Throughput: {len(succeeded) / elapsed:.1f} chats/s")
+    print(summarize("Time to first output", [r["first_output"] for r in succeeded]))
+    print(summarize("Total latency", [r["total"] for r in succeeded]))
+    if succeeded:
+        print(f"Mean latency: {statistics.mean(r['total'] for r in succeeded):.2f}s")
+    if errors:
+        print(f"First error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
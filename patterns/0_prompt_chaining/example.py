@@ -1,18 +1,27 @@
 import sys
 import os
+import threading
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.utils import (
     create_bedrock_client,
     text_completion,
-    generate_conversation,
+    stream_conversation,
     extract_json_from_text,
+    RequestTemplate,
+    CancellationToken,
+    StreamBuffer,
+    TracingClient,
+    ProfilingClient,
+    get_profiler,
+    get_tracer,
+    traced,
     NOVA_LITE
 )
 
 # Create a client once to be reused
-bedrock_client = create_bedrock_client()
+bedrock_client = ProfilingClient(TracingClient(create_bedrock_client()))
 
 # System prompt for better consistency across all interactions
 SYSTEM_PROMPT = """
@@ -21,50 +30,36 @@ Always provide factual, helpful responses.
 When asked to return JSON, format it properly within ```json code blocks.
 """
 
-def analyze_inquiry(inquiry):
-    prompt = f"""
+# One request template per step: the system prompt and inference settings
+# are built once instead of on every call
+ANALYSIS_REQUEST = RequestTemplate(
+    """
     Analyze the following customer inquiry. Identify the main issue and the customer's sentiment.
     Return the result as a JSON object with keys 'main_issue' and 'sentiment'.
 
     Customer Inquiry: "{inquiry}"
-    """
-    response = generate_conversation(
-        client=bedrock_client,
-        prompt=prompt,
-        model_id=NOVA_LITE,
-        system_prompt=SYSTEM_PROMPT
-    )
-    
-    # Extract text from response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return extract_json_from_text(content["text"])
-
+    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    preset="classification",
+    name="analyze_inquiry"
+)
 
-def generate_response_points(analysis):
-    prompt = f"""
+POINTS_REQUEST = RequestTemplate(
+    """
     Based on the following analysis of a customer inquiry, generate a list of 3-5 key points to address in the response.
     Return the result as a JSON array of strings.
 
     Analysis: {analysis}
-    """
-    response = generate_conversation(
-        client=bedrock_client,
-        prompt=prompt,
-        model_id=NOVA_LITE,
-        system_prompt=SYSTEM_PROMPT
-    )
-    
-    # Extract text from response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return extract_json_from_text(content["text"])
-
+    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    preset="json_extraction",
+    name="generate_response_points"
+)
 
-def craft_email(analysis, points):
-    prompt = f"""
+EMAIL_REQUEST = RequestTemplate(
+    """
     Craft a personalized customer support email based on the following analysis and key points.
     The email should address the customer's concerns, match their sentiment, and provide helpful information.
 
@@ -72,38 +67,152 @@ def craft_email(analysis, points):
     Key Points: {points}
 
     Begin the email with 'Dear Customer,' and end it with 'Best regards, Customer Support Team'.
+    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    preset="long_form",
+    name="craft_email"
+)
+
+@traced()
+def analyze_inquiry(inquiry, cache=None, client=None):
     """
-    response = generate_conversation(
-        client=bedrock_client,
-        prompt=prompt,
-        model_id=NOVA_LITE,
-        system_prompt=SYSTEM_PROMPT
+    Identify the main issue and sentiment of an inquiry.
+    Pass a NearDuplicateCache to reuse analyses of paraphrased inquiries.
+    Every step accepts client to use another client than bedrock_client.
+    """
+    if cache is not None:
+        cached = cache.get(inquiry)
+        if cached is not None:
+            return cached
+
+    analysis = extract_json_from_text(ANALYSIS_REQUEST.text(client or bedrock_client, inquiry=inquiry))
+    if cache is not None:
+        cache.put(inquiry, analysis)
+    return analysis
+
+
+@traced()
+def generate_response_points(analysis, client=None):
+    return extract_json_from_text(
+        POINTS_REQUEST.text(client or bedrock_client, analysis=analysis)
     )
-    
-    # Extract text from response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return content["text"]
 
 
-def generate_support_email(customer_inquiry):
+def email_prompt(analysis, points):
+    return EMAIL_REQUEST.render(analysis=analysis, points=points)
+
+
+@traced()
+def craft_email(analysis, points, client=None):
+    return EMAIL_REQUEST.text(client or bedrock_client, analysis=analysis, points=points)
+
+
+def stream_email(analysis, points, client=None):
+    """
+    Streaming version of craft_email. Yields the email text so far as tokens arrive.
+    """
+    token_buffer = StreamBuffer()
+    cancel_token = CancellationToken()
+
+    def stream_thread():
+        try:
+            stream_conversation(
+                client=client or bedrock_client,
+                prompt=email_prompt(analysis, points),
+                model_id=NOVA_LITE,
+                system_prompt=SYSTEM_PROMPT,
+                preset="long_form",
+                callback=token_buffer.put,
+                cancel_token=cancel_token,
+            )
+        except Exception as exc:
+            # Raised to the caller from iter_text
+            token_buffer.fail(exc)
+        finally:
+            token_buffer.close()
+
+    threading.Thread(target=stream_thread, daemon=True).start()
+
+    try:
+        yield from token_buffer.iter_text()
+    finally:
+        # The caller stopped reading, stop generating the rest of the email
+        if not token_buffer.finished():
+            cancel_token.cancel()
+            token_buffer.cancel()
+
+
+@traced()
+def generate_support_email(customer_inquiry, cache=None, client=None, verbose=False):
     # Step 1: Analyze the inquiry
-    analysis = analyze_inquiry(customer_inquiry)
-    print("Analysis:", analysis)
+    analysis = analyze_inquiry(customer_inquiry, cache=cache, client=client)
+    if verbose:
+        print("Analysis:", analysis)
 
     # Step 2: Generate response points
-    points = generate_response_points(analysis)
-    print("Response Points:", points)
+    points = generate_response_points(analysis, client=client)
+    if verbose:
+        print("Response Points:", points)
 
     # Step 3: Craft the email
-    email = craft_email(analysis, points)
-    print("\nGenerated Email:\n", email)
+    email = craft_email(analysis, points, client=client)
+    if verbose:
+        print("\nGenerated Email:\n", email)
 
     return email
 
 
+def generate_support_email_stream(customer_inquiry, cache=None, client=None):
+    """
+    Pipelined version of generate_support_email. Each step result is yielded
+    as soon as it is ready and the email streams token by token, so the caller
+    can show output long before the whole chain has finished.
+
+    Yields:
+        tuple: ("analysis", dict), then ("points", list), then ("email", str)
+               once per streamed chunk with the email text so far
+    """
+    analysis = analyze_inquiry(customer_inquiry, cache=cache, client=client)
+    yield "analysis", analysis
+
+    points = generate_response_points(analysis, client=client)
+    yield "points", points
+
+    for email_so_far in stream_email(analysis, points, client=client):
+        yield "email", email_so_far
+
+
 # Example usage
 if __name__ == "__main__":
+    # Record a timeline of the run, open trace.json in https://ui.perfetto.dev
+    if "--trace" in sys.argv:
+        get_tracer().enabled = True
+
+    # Measure client-side CPU, allocations and payload bytes per helper
+    if "--profile" in sys.argv:
+        get_profiler().start()
+
     customer_inquiry = "I've been waiting for my order for over a week now, and it still hasn't arrived. This is unacceptable! Can you tell me where my package is and why it's taking so long?"
-    generate_support_email(customer_inquiry)
\ No newline at end of file
+
+    if "--stream" in sys.argv:
+        printed = 0
+        for step, result in generate_support_email_stream(customer_inquiry):
+            if step == "analysis":
+                print("Analysis:", result)
+            elif step == "points":
+                print("Response Points:", result)
+                print("\nGenerated Email:")
+            else:
+                print(result[printed:], end="", flush=True)
+                printed = len(result)
+        print()
+    else:
+        generate_support_email(customer_inquiry, verbose=True)
+
+    if get_tracer().enabled:
+        get_tracer().export_chrome_trace("trace.json")
+        print("\nTrace written to trace.json")
+
+    if get_profiler().enabled:
+        print("\n" + get_profiler().format_report())
@@ -1,25 +1,23 @@
 import gradio as gr
 import json
-from example import analyze_inquiry, generate_response_points, craft_email
+from example import generate_support_email_stream
 
 EXAMPLE_INQUIRY = """I've been waiting for my order #12345 for over a week now, and it still hasn't arrived. 
 This is unacceptable! I paid for express shipping and was promised delivery within 3 days. 
 Can you tell me where my package is and why it's taking so long? I need this for an important event this weekend."""
 
 def generate_email_with_steps(inquiry):
-    # Step 1: Analyze inquiry
-    analysis = analyze_inquiry(inquiry)
-    analysis_output = f"Step 1 - Analysis:\n{json.dumps(analysis, indent=2)}\n\n"
-    
-    # Step 2: Generate response points
-    points = generate_response_points(analysis)
-    points_output = f"Step 2 - Response Points:\n{json.dumps(points, indent=2)}\n\n"
-    
-    # Step 3: Craft email
-    email = craft_email(analysis, points)
-    email_output = f"Step 3 - Final Email:\n{email}"
-    
-    return analysis_output, points_output, email_output
+    # Show each step as soon as it finishes and stream the final email
+    analysis_output = points_output = email_output = ""
+
+    for step, result in generate_support_email_stream(inquiry):
+        if step == "analysis":
+            analysis_output = f"Step 1 - Analysis:\n{json.dumps(result, indent=2)}\n\n"
+        elif step == "points":
+            points_output = f"Step 2 - Response Points:\n{json.dumps(result, indent=2)}\n\n"
+        else:
+            email_output = f"Step 3 - Final Email:\n{result}"
+        yield analysis_output, points_output, email_output
 
 iface = gr.Interface(
     fn=generate_email_with_steps,
@@ -1,17 +1,35 @@
 import sys
 import os
+import re
+import collections
+import concurrent.futures
+import threading
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.utils import (
     create_bedrock_client,
-    generate_conversation,
+    stream_conversation,
     extract_json_from_text,
+    extract_text,
+    RequestTemplate,
+    CancellationToken,
+    NearDuplicateCache,
+    write_batch_input,
+    read_batch_output,
+    run_sharded_batch,
+    TracingClient,
+    ProfilingClient,
+    get_profiler,
+    get_tracer,
+    traced,
+    propagate,
+    current_span,
     NOVA_LITE
 )
 
 # Create a client once to be reused
-bedrock_client = create_bedrock_client()
+bedrock_client = ProfilingClient(TracingClient(create_bedrock_client()))
 
 # System prompt for improved consistency across all interactions
 SYSTEM_PROMPT = """
@@ -20,66 +38,136 @@ Always provide factual, helpful responses.
 When asked to return JSON, format it properly within ```json code blocks.
 """
 
-def classify_inquiry(inquiry):
-    prompt = f"""
+# Request templates build the system prompt and inference settings once
+CLASSIFICATION_REQUEST = RequestTemplate(
+    """
     Analyze the following customer inquiry. Identify the language and the main topic category.
     Return the result as a JSON object with keys 'language' and 'category'.
     Language should be one of: 'English', 'Spanish', 'French', 'German', 'Danish', 'Swedish' or 'Other'.
     Category should be one of: 'Technical', 'Billing', 'Product', or 'General'.
 
     Customer Inquiry: "{inquiry}"
+    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    preset="classification",
+    name="classify_inquiry"
+)
+
+RESPONSE_REQUEST = RequestTemplate(
     """
-    response = generate_conversation(
-        client=bedrock_client,
-        prompt=prompt,
-        model_id=NOVA_LITE,
-        system_prompt=SYSTEM_PROMPT
-    )
+    Generate a {category}-related response in {language} for the following inquiry:
+    "{inquiry}"
     
-    # Extract text from response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return extract_json_from_text(content["text"])
+    Additional instructions: {instructions}
+    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    preset="long_form",
+    name="generate_response"
+)
 
-def generate_response(inquiry, language, category):
+def classification_prompt(inquiry):
+    return CLASSIFICATION_REQUEST.render(inquiry=inquiry)
+
+@traced()
+def classify_inquiry(inquiry, cache=None, client=None):
     """
-    Unified response generator with routing handled via the prompt.
-    This simplifies the code by using a single function instead of four separate ones.
+    Classify an inquiry by language and category.
+    Pass a NearDuplicateCache to reuse classifications of paraphrased inquiries,
+    and client to use another client than bedrock_client.
     """
-    # Create a prompt based on the category
-    category_instructions = {
-        "Technical": "Provide troubleshooting steps and technical instructions.",
-        "Billing": "Explain billing policies, payment options, and account information.",
-        "Product": "Describe product features, specifications, and usage instructions.",
-        "General": "Provide general information and friendly guidance."
+    if cache is not None:
+        cached = cache.get(inquiry)
+        if cached is not None:
+            return cached
+
+    classification = extract_json_from_text(
+        CLASSIFICATION_REQUEST.text(client or bedrock_client, inquiry=inquiry)
+    )
+    if cache is not None:
+        cache.put(inquiry, classification)
+    return classification
+
+def export_classification_batch(inquiries, output_path):
+    """
+    Write classification requests for many inquiries as a batch inference job input file.
+    Record IDs are the inquiries' positions in the list.
+    """
+    requests = (
+        (index, CLASSIFICATION_REQUEST.build(inquiry=inquiry))
+        for index, inquiry in enumerate(inquiries)
+    )
+    return write_batch_input(requests, output_path)
+
+def import_classification_batch(output_path):
+    """
+    Read a batch inference job output file back into classifications, keyed by record ID.
+    Failed records and records without a JSON classification map to None and
+    are reported as skipped, instead of stopping the import.
+    """
+    classifications = {}
+    skipped = []
+    total = 0
+    for result in read_batch_output(NOVA_LITE, output_path):
+        total += 1
+        classification = None
+        error = result["error"]
+        if result["response"] is not None:
+            text = extract_text(result["response"], default=None)
+            try:
+                if text is None:
+                    raise ValueError("No text in the response")
+                classification = extract_json_from_text(text)
+            except ValueError as exc:
+                error = str(exc)
+        if error is not None:
+            skipped.append((result["record_id"], error))
+        if result["record_id"] is not None:
+            classifications[result["record_id"]] = classification
+
+    if skipped:
+        print(f"Skipped {len(skipped)} of {total} records:")
+        for record_id, error in skipped[:10]:
+            print(f"  {record_id}: {error}")
+    return classifications
+
+# Extra instructions per category, the route is applied through the prompt
+CATEGORY_INSTRUCTIONS = {
+    "Technical": "Provide troubleshooting steps and technical instructions.",
+    "Billing": "Explain billing policies, payment options, and account information.",
+    "Product": "Describe product features, specifications, and usage instructions.",
+    "General": "Provide general information and friendly guidance."
+}
+
+def response_values(inquiry, language, category):
+    """
+    Placeholder values of RESPONSE_REQUEST for a route.
+    """
+    return {
+        "category": category.lower(),
+        "language": language,
+        "inquiry": inquiry,
+        "instructions": CATEGORY_INSTRUCTIONS.get(category, CATEGORY_INSTRUCTIONS["General"]),
     }
-    
-    instructions = category_instructions.get(category, category_instructions["General"])
-    
-    prompt = f"""
-    Generate a {category.lower()}-related response in {language} for the following inquiry:
-    "{inquiry}"
-    
-    Additional instructions: {instructions}
+
+def response_prompt(inquiry, language, category):
+    return RESPONSE_REQUEST.render(**response_values(inquiry, language, category))
+
+@traced()
+def generate_response(inquiry, language, category, client=None):
     """
-    
-    response = generate_conversation(
-        client=bedrock_client,
-        prompt=prompt,
-        model_id=NOVA_LITE,
-        system_prompt=SYSTEM_PROMPT
+    Unified response generator with routing handled via the prompt.
+    This simplifies the code by using a single function instead of four separate ones.
+    """
+    return RESPONSE_REQUEST.text(
+        client or bedrock_client, **response_values(inquiry, language, category)
     )
-    
-    # Extract text from response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return content["text"]
 
-def route_and_respond(inquiry):
+@traced()
+def route_and_respond(inquiry, cache=None):
     # Step 1: Classify the inquiry
-    classification = classify_inquiry(inquiry)
+    classification = classify_inquiry(inquiry, cache=cache)
     print("Classification:", classification)
 
     # Step 2: Route to the appropriate response generator based on category
@@ -92,8 +180,223 @@ def route_and_respond(inquiry):
     print(f"\nGenerated Response ({language}):\n", response)
     return response
 
+# Words that hint at a category or language, matched against word prefixes
+CATEGORY_KEYWORDS = {
+    "Technical": (
+        "password", "login", "log in", "error", "crash", "reset", "install", "bug",
+        "connect", "contraseña", "mot de passe", "passwort", "adgangskode", "lösenord",
+    ),
+    "Billing": (
+        "bill", "invoice", "payment", "charge", "refund", "subscription", "factura",
+        "pago", "facture", "paiement", "rechnung", "zahlung", "faktura", "betal",
+    ),
+    "Product": (
+        "feature", "specification", "caracter", "característ", "produkt", "producto",
+        "produit", "product", "eigenschaft", "egenskab", "egenskap",
+    ),
+}
+
+LANGUAGE_WORDS = {
+    "English": {"the", "how", "what", "my", "is", "do", "i", "can", "when", "where"},
+    "Spanish": {"el", "la", "mi", "cómo", "cuándo", "qué", "es", "por", "para", "de"},
+    "French": {"le", "les", "mon", "ma", "comment", "quand", "est", "sont", "quelles", "du"},
+    "German": {"der", "die", "das", "ich", "mein", "wie", "ist", "habe", "eine", "zur"},
+    "Danish": {"jeg", "hvordan", "min", "et", "og", "hvad", "hvornår", "er", "mit"},
+    "Swedish": {"jag", "hur", "min", "ett", "och", "vad", "när", "är", "mitt"},
+}
+
+class RoutePredictor:
+    """
+    Cheap local guess of an inquiry's route, used to start generating a
+    response before the classifier has answered.
+
+    The category is guessed from keywords and the language from common words,
+    falling back to the most frequent category and language seen so far.
+    """
+
+    def __init__(self, default_category="General", default_language="English"):
+        self.default_category = default_category
+        self.default_language = default_language
+        self._categories = collections.Counter()
+        self._languages = collections.Counter()
+        self._predictions = 0
+        self._hits = 0
+        self._category_hits = 0
+        self._language_hits = 0
+        self._lock = threading.Lock()
+
+    def predict(self, inquiry):
+        """
+        Returns:
+            tuple: Predicted (category, language)
+        """
+        text = inquiry.lower()
+        words = re.findall(r"\w+", text)
+
+        def score(keyword):
+            if " " in keyword:
+                return keyword in text
+            return any(word.startswith(keyword) for word in words)
+
+        category_scores = {
+            category: sum(score(keyword) for keyword in keywords)
+            for category, keywords in CATEGORY_KEYWORDS.items()
+        }
+        language_scores = {
+            language: sum(word in common for word in words)
+            for language, common in LANGUAGE_WORDS.items()
+        }
+
+        with self._lock:
+            category = max(category_scores, key=category_scores.get)
+            if not category_scores[category]:
+                category = self._most_frequent(self._categories, self.default_category)
+            language = max(language_scores, key=language_scores.get)
+            if not language_scores[language]:
+                language = self._most_frequent(self._languages, self.default_language)
+        return category, language
+
+    @staticmethod
+    def _most_frequent(counter, default):
+        return counter.most_common(1)[0][0] if counter else default
+
+    def record(self, predicted, actual):
+        """
+        Record a prediction against the classifier's answer.
+
+        Args:
+            predicted (tuple): Predicted (category, language)
+            actual (tuple): Classified (category, language)
+
+        Returns:
+            bool: True if both the category and the language were right
+        """
+        category_hit = predicted[0].lower() == str(actual[0]).lower()
+        language_hit = predicted[1].lower() == str(actual[1]).lower()
+        with self._lock:
+            self._categories[actual[0]] += 1
+            self._languages[actual[1]] += 1
+            self._predictions += 1
+            self._category_hits += category_hit
+            self._language_hits += language_hit
+            self._hits += category_hit and language_hit
+        return category_hit and language_hit
+
+    def stats(self):
+        """
+        Get the prediction hit rates.
+
+        Returns:
+            dict: "predictions", "hits", "hit_rate", "category_hit_rate" and "language_hit_rate"
+        """
+        with self._lock:
+            predictions = self._predictions or 1
+            return {
+                "predictions": self._predictions,
+                "hits": self._hits,
+                "hit_rate": self._hits / predictions,
+                "category_hit_rate": self._category_hits / predictions,
+                "language_hit_rate": self._language_hits / predictions,
+            }
+
+route_predictor = RoutePredictor()
+
+# Runs speculative responses while the classifier is in flight
+speculation_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix="speculative"
+)
+
+def stream_response(inquiry, language, category, cancel_token=None):
+    """
+    Streaming version of generate_response that can be cancelled midway.
+    """
+    return stream_conversation(
+        client=bedrock_client,
+        prompt=response_prompt(inquiry, language, category),
+        model_id=NOVA_LITE,
+        system_prompt=SYSTEM_PROMPT,
+        preset="long_form",
+        # Collect silently, a cancelled response is never shown
+        callback=lambda chunk: None,
+        cancel_token=cancel_token
+    )
+
+@traced()
+def route_and_respond_speculative(inquiry, cache=None, predictor=route_predictor):
+    """
+    Speculative version of route_and_respond. The response for the predicted
+    route starts generating while the inquiry is being classified. If the
+    classifier agrees it is kept, so the common case takes about one round
+    trip. Otherwise it is cancelled and the response for the actual route is
+    generated.
+    """
+    predicted = predictor.predict(inquiry)
+    cancel_token = CancellationToken()
+    speculative = speculation_pool.submit(
+        propagate(stream_response), inquiry, predicted[1], predicted[0], cancel_token
+    )
+
+    try:
+        classification = classify_inquiry(inquiry, cache=cache)
+    except Exception:
+        cancel_token.cancel()
+        raise
+    print("Classification:", classification)
+
+    category = classification['category']
+    language = classification['language']
+    hit = predictor.record(predicted, (category, language))
+    current_span().set_attributes(
+        predicted_category=predicted[0], predicted_language=predicted[1], speculation_hit=hit
+    )
+
+    if hit:
+        response = speculative.result()
+    else:
+        # Stop paying for the wrong response and generate the right one
+        cancel_token.cancel()
+        print(f"Speculation missed ({predicted[0]}, {predicted[1]}), restarting")
+        response = generate_response(inquiry, language, category)
+
+    print(f"\nGenerated Response ({language}):\n", response)
+    return response
+
+def respond_to_record(record):
+    """
+    Batch worker: classify and answer one {"inquiry": ...} record.
+    Module-level so that run_sharded_batch can send it to worker processes.
+    """
+    inquiry = record["inquiry"]
+    classification = classify_inquiry(inquiry)
+    response = generate_response(
+        inquiry, classification["language"], classification["category"]
+    )
+    return {"classification": classification, "response": response}
+
 # Example usage
 if __name__ == "__main__":
+    # Record a timeline of the run, open trace.json in https://ui.perfetto.dev
+    if "--trace" in sys.argv:
+        get_tracer().enabled = True
+
+    # Measure client-side CPU, allocations and payload bytes per helper
+    if "--profile" in sys.argv:
+        get_profiler().start()
+
+    # Answer a JSONL file of {"inquiry": ...} records with one process per
+    # core, each with its own client: python example.py --batch inquiries.jsonl
+    if "--batch" in sys.argv:
+        input_path = sys.argv[sys.argv.index("--batch") + 1]
+        summary = run_sharded_batch(
+            respond_to_record, input_path, "routing.db", max_workers=8, progress=print
+        )
+        print(
+            f"{summary['succeeded']} succeeded, {summary['failed']} failed, "
+            f"{summary['skipped']} skipped in {summary['seconds']:.1f}s "
+            f"({summary['items_per_second']:.1f} items/s)"
+        )
+        sys.exit()
+
     inquiries = [
         "How do I reset my password?",
         "¿Cuándo vence mi factura?",
@@ -102,7 +405,27 @@ if __name__ == "__main__":
         "Hvordan returnerer jeg et produkt?"
     ]
 
+    # Paraphrased inquiries reuse the classification instead of calling the model
+    classification_cache = NearDuplicateCache(threshold=0.7)
+
+    # Start generating before classification has finished
+    speculative = "--speculative" in sys.argv
+
     for inquiry in inquiries:
         print("\n" + "="*50)
         print(f"Processing inquiry: {inquiry}")
-        route_and_respond(inquiry)
\ No newline at end of file
+        if speculative:
+            route_and_respond_speculative(inquiry, cache=classification_cache)
+        else:
+            route_and_respond(inquiry, cache=classification_cache)
+
+    print("\nClassification cache:", classification_cache.stats())
+    if speculative:
+        print("Route predictions:", route_predictor.stats())
+
+    if get_tracer().enabled:
+        get_tracer().export_chrome_trace("trace.json")
+        print("\nTrace written to trace.json")
+
+    if get_profiler().enabled:
+        print("\n" + get_profiler().format_report())
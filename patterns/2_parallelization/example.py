@@ -1,17 +1,33 @@
 import sys
 import os
+import re
 import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 import concurrent.futures
 from src.utils import (
     create_bedrock_client,
-    generate_conversation,
+    RequestTemplate,
+    ScheduledClient,
+    BATCH,
+    TracingClient,
+    ProfilingClient,
+    get_profiler,
+    get_tracer,
+    traced,
+    propagate,
+    get_model_limits,
+    estimate_cost,
     NOVA_LITE
 )
 
-# Create a client once to be reused
-bedrock_client = create_bedrock_client()
+# Create a client once to be reused. Calls run at batch priority so that
+# interactive requests sharing the process-wide scheduler go first
+bedrock_client = ProfilingClient(
+    TracingClient(
+        ScheduledClient(create_bedrock_client(), priority=BATCH, tenant="marketing")
+    )
+)
 
 # System prompt for improved consistency across all interactions
 SYSTEM_PROMPT = """
@@ -20,8 +36,10 @@ Create engaging, concise, and effective marketing content tailored for different
 Focus on highlighting product benefits and value propositions.
 """
 
-def generate_email_content(product_info):
-    prompt = f"""
+# One request template per platform: the system prompt and inference
+# settings are built once instead of on every call
+EMAIL_REQUEST = RequestTemplate(
+    """
     Create engaging email marketing content for the following product.
     Include a catchy subject line and main body text.
     Keep it professional and focused on value proposition.
@@ -33,24 +51,15 @@ def generate_email_content(product_info):
     Subject Line: [your subject line]
     ---
     [your email body]
-    """
-    response = generate_conversation(
-        client=bedrock_client,
-        prompt=prompt,
-        model_id=NOVA_LITE,
-        system_prompt=SYSTEM_PROMPT
-    )
-    
-    # Extract text from response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return {"platform": "email", "content": content["text"]}
-    
-    return {"platform": "email", "content": "Error: No content generated"}
+    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    preset="long_form",
+    name="generate_email_content"
+)
 
-def generate_instagram_content(product_info):
-    prompt = f"""
+INSTAGRAM_REQUEST = RequestTemplate(
+    """
     Create engaging Instagram post content for the following product.
     Include:
     - Catchy caption (max 200 characters)
@@ -59,24 +68,15 @@ def generate_instagram_content(product_info):
     
     Product Information:
     {product_info}
-    """
-    response = generate_conversation(
-        client=bedrock_client,
-        prompt=prompt,
-        model_id=NOVA_LITE,
-        system_prompt=SYSTEM_PROMPT
-    )
-    
-    # Extract text from response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return {"platform": "instagram", "content": content["text"]}
-    
-    return {"platform": "instagram", "content": "Error: No content generated"}
+    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    max_tokens=400,  # Caption, hashtags and a few visual notes
+    name="generate_instagram_content"
+)
 
-def generate_website_content(product_info):
-    prompt = f"""
+WEBSITE_REQUEST = RequestTemplate(
+    """
     Create engaging website product description content.
     Include:
     - Compelling headline
@@ -86,22 +86,29 @@ def generate_website_content(product_info):
     
     Product Information:
     {product_info}
-    """
-    response = generate_conversation(
-        client=bedrock_client,
-        prompt=prompt,
-        model_id=NOVA_LITE,
-        system_prompt=SYSTEM_PROMPT
-    )
-    
-    # Extract text from response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return {"platform": "website", "content": content["text"]}
-    
-    return {"platform": "website", "content": "Error: No content generated"}
+    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    preset="long_form",
+    name="generate_website_content"
+)
+
+@traced()
+def generate_email_content(product_info, client=None):
+    content = EMAIL_REQUEST.text(client or bedrock_client, product_info=product_info)
+    return {"platform": "email", "content": content or "Error: No content generated"}
+
+@traced()
+def generate_instagram_content(product_info, client=None):
+    content = INSTAGRAM_REQUEST.text(client or bedrock_client, product_info=product_info)
+    return {"platform": "instagram", "content": content or "Error: No content generated"}
+
+@traced()
+def generate_website_content(product_info, client=None):
+    content = WEBSITE_REQUEST.text(client or bedrock_client, product_info=product_info)
+    return {"platform": "website", "content": content or "Error: No content generated"}
 
+@traced()
 def generate_marketing_content_sequential(product_info):
     start_time = time.time()
     results = []
@@ -126,6 +133,7 @@ def generate_marketing_content_sequential(product_info):
     
     return results, execution_time
 
+@traced()
 def generate_marketing_content_parallel(product_info):
     start_time = time.time()
     results = []
@@ -133,11 +141,12 @@ def generate_marketing_content_parallel(product_info):
     print("Starting parallel content generation...\n")
     
     with concurrent.futures.ThreadPoolExecutor() as executor:
-        # Create tasks for each platform
+        # Create tasks for each platform. propagate() keeps their spans
+        # under this function's span although they run on other threads
         tasks = {
-            executor.submit(generate_email_content, product_info): "email",
-            executor.submit(generate_instagram_content, product_info): "instagram",
-            executor.submit(generate_website_content, product_info): "website"
+            executor.submit(propagate(generate_email_content), product_info): "email",
+            executor.submit(propagate(generate_instagram_content), product_info): "instagram",
+            executor.submit(propagate(generate_website_content), product_info): "website"
         }
         
         for future in concurrent.futures.as_completed(tasks):
@@ -154,8 +163,141 @@ def generate_marketing_content_parallel(product_info):
     
     return results, execution_time
 
+FUSED_PLATFORMS = ("email", "instagram", "website")
+
+def split_fused_content(text):
+    """
+    Split a fused response into per-platform results. A section cut off by
+    the output limit keeps the text generated so far.
+    """
+    results = []
+    for platform in FUSED_PLATFORMS:
+        match = re.search(
+            rf"<{platform}>(.*?)(?:</{platform}>|$)", text, re.DOTALL
+        )
+        content = match.group(1).strip() if match else ""
+        results.append(
+            {"platform": platform, "content": content or "Error: No content generated"}
+        )
+    return results
+
+FUSED_REQUEST = RequestTemplate(
+    """
+    Create marketing content for the following product for three platforms.
+
+    Email: engaging email marketing content with a catchy subject line and main body text.
+    Keep it professional and focused on value proposition. Format it as:
+    Subject Line: [your subject line]
+    ---
+    [your email body]
+
+    Instagram: engaging post content with a catchy caption (max 200 characters),
+    relevant hashtags (max 5) and key visual elements to include in the photo.
+
+    Website: engaging product description content with a compelling headline,
+    an SEO-optimized product description, key features and benefits, and
+    technical specifications.
+
+    Product Information:
+    {product_info}
+
+    Write each platform's content between its tags, in this order:
+    <email>...</email>
+    <instagram>...</instagram>
+    <website>...</website>
+    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    preset="long_form",
+    # One response holds all three outputs
+    max_tokens=get_model_limits(NOVA_LITE)["max_output_tokens"],
+    name="generate_marketing_content_fused"
+)
+
+@traced()
+def generate_marketing_content_fused(product_info):
+    """
+    Generate the content for all platforms in a single request, so the system
+    prompt and product information are sent once instead of three times.
+    The response is split back into the same results as the other modes.
+    """
+    start_time = time.time()
+
+    print("Starting fused content generation...\n")
+
+    text = FUSED_REQUEST.text(bedrock_client, product_info=product_info)
+    results = split_fused_content(text)
+
+    for result in results:
+        print(f"Generated content for {result['platform']}: {result['content'][:100]}...\n")
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+
+    return results, execution_time
+
+def compare_marketing_strategies(product_info, runs=1):
+    """
+    Run the sequential, parallel and fused modes and measure each one.
+
+    Token usage is read from the spans of the traced client, so tracing is
+    enabled for the duration of the comparison.
+
+    Args:
+        product_info (str): Product information
+        runs (int): Runs per mode, the report shows the averages
+
+    Returns:
+        list: One dict per mode with "mode", "calls", "latency_seconds",
+              "input_tokens", "output_tokens" and "cost" (USD)
+    """
+    strategies = {
+        "sequential": generate_marketing_content_sequential,
+        "parallel": generate_marketing_content_parallel,
+        "fused": generate_marketing_content_fused,
+    }
+    tracer = get_tracer()
+    was_enabled = tracer.enabled
+    tracer.enabled = True
+
+    report = []
+    try:
+        for mode, strategy in strategies.items():
+            totals = {"calls": 0, "latency_seconds": 0.0, "input_tokens": 0, "output_tokens": 0}
+            for _ in range(runs):
+                with tracer.span("compare_marketing_strategies", mode=mode) as root:
+                    _, execution_time = strategy(product_info)
+                calls = [
+                    span for span in tracer.spans()
+                    if span.trace_id == root.trace_id and span.name == "converse"
+                ]
+                totals["calls"] += len(calls)
+                totals["latency_seconds"] += execution_time
+                totals["input_tokens"] += sum(span.attributes.get("input_tokens") or 0 for span in calls)
+                totals["output_tokens"] += sum(span.attributes.get("output_tokens") or 0 for span in calls)
+
+            averages = {key: value / runs for key, value in totals.items()}
+            averages["cost"] = estimate_cost(
+                NOVA_LITE, averages["input_tokens"], averages["output_tokens"]
+            )
+            report.append(dict(mode=mode, **averages))
+    finally:
+        tracer.enabled = was_enabled
+        if not was_enabled:
+            tracer.clear()
+
+    return report
+
 # Example usage
 if __name__ == "__main__":
+    # Record a timeline of the run, open trace.json in https://ui.perfetto.dev
+    if "--trace" in sys.argv:
+        get_tracer().enabled = True
+
+    # Measure client-side CPU, allocations and payload bytes per helper
+    if "--profile" in sys.argv:
+        get_profiler().start()
+
     product_info = """
     Product: EcoTech Smart Water Bottle
     Price: $39.99
@@ -187,4 +329,28 @@ if __name__ == "__main__":
 
     # Calculate and display the performance improvement
     improvement = (sequential_time - parallel_time) / sequential_time * 100
-    print(f"\nPerformance improvement: {improvement:.1f}%")
\ No newline at end of file
+    print(f"\nPerformance improvement: {improvement:.1f}%")
+
+    print("\n" + "="*50 + "\n")
+
+    # Run fused execution: one request for all platforms
+    fused_results, fused_time = generate_marketing_content_fused(product_info)
+    print(f"\nFused execution completed in {fused_time:.2f} seconds")
+
+    # Compare latency, tokens and cost of the three modes
+    if "--compare" in sys.argv:
+        print("\n" + "="*50 + "\n")
+        report = compare_marketing_strategies(product_info, runs=3)
+        print(f"{'Mode':<12}{'Calls':>7}{'Latency':>10}{'Input':>9}{'Output':>9}{'Cost':>12}")
+        for row in report:
+            print(
+                f"{row['mode']:<12}{row['calls']:>7.0f}{row['latency_seconds']:>9.2f}s"
+                f"{row['input_tokens']:>9.0f}{row['output_tokens']:>9.0f}{row['cost']:>12.6f}"
+            )
+
+    if get_tracer().enabled:
+        get_tracer().export_chrome_trace("trace.json")
+        print("\nTrace written to trace.json")
+
+    if get_profiler().enabled:
+        print("\n" + get_profiler().format_report())
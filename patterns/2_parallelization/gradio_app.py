@@ -1,7 +1,8 @@
 import gradio as gr
 from example import (
     generate_marketing_content_sequential,
-    generate_marketing_content_parallel
+    generate_marketing_content_parallel,
+    generate_marketing_content_fused
 )
 import time
 
@@ -47,9 +48,11 @@ def process_product_info(product_info, execution_mode):
         content = parallel_content  # Use parallel results for display
     
     else:
-        # Run single mode (either sequential or parallel)
+        # Run single mode (sequential, parallel or fused)
         if execution_mode == "Sequential":
             results, exec_time = generate_marketing_content_sequential(product_info)
+        elif execution_mode == "Fused":
+            results, exec_time = generate_marketing_content_fused(product_info)
         else:  # Parallel
             results, exec_time = generate_marketing_content_parallel(product_info)
             
@@ -72,7 +75,7 @@ iface = gr.Interface(
             value=EXAMPLE_PRODUCT
         ),
         gr.Radio(
-            choices=["Sequential", "Parallel", "Compare Both"],
+            choices=["Sequential", "Parallel", "Fused", "Compare Both"],
             label="Execution Mode",
             value="Compare Both"
         )
@@ -90,6 +93,7 @@ iface = gr.Interface(
     You can compare sequential vs parallel execution to see the performance benefits of parallelization.
     - Sequential: Generates content for each platform one after another
     - Parallel: Generates content for all platforms simultaneously
+    - Fused: Generates content for all platforms in a single request
     - Compare Both: Runs both methods and shows the performance improvement""",
     allow_flagging="never"
 )
@@ -5,14 +5,19 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 from src.utils import (
     create_bedrock_client,
-    generate_conversation,
+    RequestTemplate,
     extract_json_from_text,
     invoke_with_prefill,
+    TracingClient,
+    ProfilingClient,
+    get_profiler,
+    get_tracer,
+    traced,
     NOVA_LITE
 )
 
 # Create a client once to be reused
-bedrock_client = create_bedrock_client()
+bedrock_client = ProfilingClient(TracingClient(create_bedrock_client()))
 
 # System prompt for better consistency 
 SYSTEM_PROMPT = """
@@ -21,7 +26,39 @@ When asked for JSON output, always format properly within ```json code blocks.
 Focus on creating compelling, concise, and effective email subject lines.
 """
 
+EVALUATION_REQUEST = RequestTemplate(
+    """
+        Evaluate the following email subject line based on these criteria:
+        1. Relevance to content (0-10)
+        2. Catchiness (0-10)
+        3. Clarity (0-10)
+        4. Urgency (0-10)
+
+        Subject line: "{subject_line}"
+        Email content: "{email_content}"
+
+        Return the result as a JSON object with keys 'relevance', 'catchiness', 'clarity', 'urgency', and 'total_score'.
+        The 'total_score' should be the sum of all other scores.
+        """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    preset="json_extraction",
+    name="SubjectLineEvaluator.evaluate"
+)
+
+FEEDBACK_REQUEST = RequestTemplate(
+    """
+                    Based on the best subject line so far: "{best_subject_line}" with score {best_score},
+                    provide brief feedback on how to improve for the next iteration.
+                    """,
+    model_id=NOVA_LITE,
+    system_prompt=SYSTEM_PROMPT,
+    max_tokens=300,  # Brief feedback only
+    name="SubjectLineOptimizer.feedback"
+)
+
 class SubjectLineGenerator:
+    @traced("SubjectLineGenerator.generate")
     def generate(self, email_content, num_options=5):
         prompt = f"""
         Generate {num_options} engaging email subject lines for the following email content. 
@@ -41,6 +78,7 @@ class SubjectLineGenerator:
             prompt=prompt,
             prefill=prefill,
             model_id=NOVA_LITE,
+            preset="json_extraction",
         )
         
         # Combine prefill with result
@@ -48,32 +86,13 @@ class SubjectLineGenerator:
         return extract_json_from_text(full_result)
 
 class SubjectLineEvaluator:
+    @traced("SubjectLineEvaluator.evaluate")
     def evaluate(self, subject_line, email_content):
-        prompt = f"""
-        Evaluate the following email subject line based on these criteria:
-        1. Relevance to content (0-10)
-        2. Catchiness (0-10)
-        3. Clarity (0-10)
-        4. Urgency (0-10)
-
-        Subject line: "{subject_line}"
-        Email content: "{email_content}"
-
-        Return the result as a JSON object with keys 'relevance', 'catchiness', 'clarity', 'urgency', and 'total_score'.
-        The 'total_score' should be the sum of all other scores.
-        """
-        response = generate_conversation(
-            client=bedrock_client,
-            prompt=prompt,
-            model_id=NOVA_LITE,
-            system_prompt=SYSTEM_PROMPT
+        text = EVALUATION_REQUEST.text(
+            bedrock_client, subject_line=subject_line, email_content=email_content
         )
-        
-        # Extract text from response
-        output_message = response["output"]["message"]
-        for content in output_message["content"]:
-            if "text" in content:
-                return extract_json_from_text(content["text"])
+        if text:
+            return extract_json_from_text(text)
         
         return {"total_score": 0}  # Default in case of failure
 
@@ -82,52 +101,50 @@ class SubjectLineOptimizer:
         self.generator = generator
         self.evaluator = evaluator
 
+    @traced("SubjectLineOptimizer.optimize")
     def optimize(self, email_content, iterations=3, options_per_iteration=5):
         best_subject_line = ""
         best_score = 0
 
         for i in range(iterations):
-            print(f"\nIteration {i+1}:")
-            subject_lines = self.generator.generate(email_content, options_per_iteration)
+            with get_tracer().span("iteration", iteration=i + 1):
+                print(f"\nIteration {i+1}:")
+                subject_lines = self.generator.generate(email_content, options_per_iteration)
             
-            for subject_line in subject_lines:
-                evaluation = self.evaluator.evaluate(subject_line, email_content)
-                print(f"Subject Line: {subject_line}")
-                print(f"Score: {evaluation['total_score']}")
-                
-                if evaluation['total_score'] > best_score:
-                    best_subject_line = subject_line
-                    best_score = evaluation['total_score']
-
-            # Feedback for next iteration
-            if i < iterations - 1:  # Don't need feedback after the last iteration
-                feedback_prompt = f"""
-                Based on the best subject line so far: "{best_subject_line}" with score {best_score},
-                provide brief feedback on how to improve for the next iteration.
-                """
+                for subject_line in subject_lines:
+                    evaluation = self.evaluator.evaluate(subject_line, email_content)
+                    print(f"Subject Line: {subject_line}")
+                    print(f"Score: {evaluation['total_score']}")
                 
-                response = generate_conversation(
-                    client=bedrock_client,
-                    prompt=feedback_prompt,
-                    model_id=NOVA_LITE,
-                    system_prompt=SYSTEM_PROMPT
-                )
+                    if evaluation['total_score'] > best_score:
+                        best_subject_line = subject_line
+                        best_score = evaluation['total_score']
+
+                # Feedback for next iteration
+                if i < iterations - 1:  # Don't need feedback after the last iteration
+                    feedback = FEEDBACK_REQUEST.text(
+                        bedrock_client,
+                        best_subject_line=best_subject_line,
+                        best_score=best_score,
+                    )
                 
-                # Extract text from response
-                output_message = response["output"]["message"]
-                for content in output_message["content"]:
-                    if "text" in content:
-                        feedback = content["text"]
+                    print(f"\nFeedback for next iteration: {feedback}")
                 
-                print(f"\nFeedback for next iteration: {feedback}")
-                
-                # Update email_content with feedback for next iteration
-                email_content += f"\nImprovement feedback: {feedback}"
+                    # Update email_content with feedback for next iteration
+                    email_content += f"\nImprovement feedback: {feedback}"
         
         return best_subject_line, best_score
 
 # Example usage
 if __name__ == "__main__":
+    # Record a timeline of the run, open trace.json in https://ui.perfetto.dev
+    if "--trace" in sys.argv:
+        get_tracer().enabled = True
+
+    # Measure client-side CPU, allocations and payload bytes per helper
+    if "--profile" in sys.argv:
+        get_profiler().start()
+
     generator = SubjectLineGenerator()
     evaluator = SubjectLineEvaluator()
     optimizer = SubjectLineOptimizer(generator, evaluator)
@@ -144,4 +161,11 @@ if __name__ == "__main__":
 
     print("\nOptimization complete!")
     print(f"Best Subject Line: {best_subject}")
-    print(f"Best Score: {best_score}")
\ No newline at end of file
+    print(f"Best Score: {best_score}")
+
+    if get_tracer().enabled:
+        get_tracer().export_chrome_trace("trace.json")
+        print("\nTrace written to trace.json")
+
+    if get_profiler().enabled:
+        print("\n" + get_profiler().format_report())
@@ -4,6 +4,8 @@ from .bedrock_converse_utils import (
     invoke_with_media,
     extract_json_from_text,
     read_file,
+    media_block,
+    build_content,
     generate_conversation,
     stream_conversation,
     invoke_with_prefill,
@@ -11,4 +13,85 @@ from .bedrock_converse_utils import (
     CLAUDE_3_5_HAIKU,
     NOVA_LITE,
     NOVA_PRO,
-)
\ No newline at end of file
+    MAX_IMAGES_PER_REQUEST,
+)
+from .video_utils import (
+    get_video_duration,
+    extract_video_frames,
+    invoke_with_video_frames,
+    analyze_video_in_segments,
+)
+from .bulk_images import (
+    find_images,
+    batch_images,
+    analyze_image_batch,
+    analyze_image_directory,
+)
+from .models import MODEL_LIMITS, MODEL_REGIONS, get_model_limits, get_model_regions
+from .token_utils import (
+    ContextWindowExceededError,
+    estimate_text_tokens,
+    estimate_image_tokens,
+    estimate_content_tokens,
+    estimate_message_tokens,
+    estimate_cost,
+    estimate_request,
+    check_context_budget,
+)
+from .prompt_cache import NearDuplicateCache, near_duplicate_cached, normalize_text
+from .single_flight import SingleFlight, SingleFlightClient, request_key
+from .scheduler import (
+    INTERACTIVE,
+    BATCH,
+    QueueFullError,
+    RequestScheduler,
+    ScheduledClient,
+    get_default_scheduler,
+)
+from .async_bedrock import (
+    ASYNC_BEDROCK_AVAILABLE,
+    AsyncSingleFlightClient,
+    create_async_bedrock_client,
+    async_generate_conversation,
+    async_stream_conversation,
+)
+from .streaming import CancellationToken, StreamBuffer
+from .agent_utils import build_tool_config, run_agent_loop, stream_with_tools
+from .inference_config import (
+    INFERENCE_PRESETS,
+    build_inference_config,
+    get_stop_reason_stats,
+    reset_stop_reason_stats,
+)
+from .region_pool import RegionPool, is_retryable_error
+from .circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerClient,
+    CircuitOpenError,
+    CLOSED,
+    OPEN,
+    HALF_OPEN,
+)
+from .batch_runner import ResultStore, read_records, run_batch, shard_of
+from .batch_inference import (
+    RequestRecorder,
+    capture_request,
+    to_model_input,
+    to_converse_response,
+    write_batch_input,
+    read_batch_output,
+    run_batch_input_locally,
+)
+from .history_utils import MediaDescriber, compact_media_history, media_digest
+from .tracing import (
+    Tracer,
+    TracingClient,
+    get_tracer,
+    current_span,
+    traced,
+    propagate,
+)
+from .warmup import AsyncKeepAlive, KeepAlive, async_warm_up_client, warm_up_client
+from .sharding import merge_stop_reason_stats, run_sharded_batch
+from .profiling import ProfilingClient, Profiler, get_profiler, profiled
+from .request_template import RequestTemplate, extract_text
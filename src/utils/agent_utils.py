@@ -0,0 +1,274 @@
+import concurrent.futures
+import json
+
+from .bedrock_converse_utils import NOVA_LITE
+from .inference_config import build_inference_config, record_stop_reason
+
+
+def build_tool_config(tools):
+    """
+    Build a Converse toolConfig from a tool registry.
+
+    Args:
+        tools (dict): Maps tool names to dicts with "function", "description"
+            and "input_schema" (a JSON schema for the tool input)
+
+    Returns:
+        dict: toolConfig for the Converse API
+    """
+    return {
+        "tools": [
+            {
+                "toolSpec": {
+                    "name": name,
+                    "description": tool["description"],
+                    "inputSchema": {"json": tool["input_schema"]},
+                }
+            }
+            for name, tool in tools.items()
+        ]
+    }
+
+
+def stream_with_tools(
+    client,
+    messages,
+    tool_config,
+    model_id=NOVA_LITE,
+    temperature=0,
+    system_prompts=None,
+    on_text=None,
+    on_tool_use=None,
+    cancel_token=None,
+    max_tokens=None,
+):
+    """
+    Stream one model turn that may contain text and tool-use blocks.
+
+    Tool input arrives as JSON fragments; each tool-use block is reported
+    through on_tool_use as soon as its input has fully streamed, while the
+    model may still be generating later blocks.
+
+    Args:
+        client: Bedrock client
+        messages (list): Conversation so far
+        tool_config (dict): Converse toolConfig
+        model_id (str): Model ID to use
+        temperature (float): Controls randomness (0-1)
+        system_prompts (list, optional): Converse system content blocks
+        on_text (callable, optional): Called with each text chunk
+        on_tool_use (callable, optional): Called with each complete toolUse dict
+            ({"toolUseId", "name", "input"})
+        cancel_token (CancellationToken, optional): Cancelling it closes the stream
+        max_tokens (int, optional): Maximum number of output tokens for the turn
+
+    Returns:
+        dict: "message" (the assistant message), "stop_reason" and "usage"
+    """
+    request = {
+        "modelId": model_id,
+        "messages": messages,
+        "toolConfig": tool_config,
+        "inferenceConfig": build_inference_config(temperature, max_tokens),
+    }
+    if system_prompts:
+        request["system"] = system_prompts
+
+    response = client.converse_stream(**request)
+    stream = response.get("stream")
+
+    blocks = {}  # content block index -> block being assembled
+    stop_reason = None
+    usage = {}
+
+    if stream:
+        if cancel_token:
+            cancel_token.on_cancel(stream.close)
+
+        try:
+            for event in stream:
+                if cancel_token and cancel_token.cancelled:
+                    break
+
+                if "contentBlockStart" in event:
+                    start = event["contentBlockStart"]
+                    if "toolUse" in start.get("start", {}):
+                        tool_use = start["start"]["toolUse"]
+                        blocks[start["contentBlockIndex"]] = {
+                            "toolUse": {
+                                "toolUseId": tool_use["toolUseId"],
+                                "name": tool_use["name"],
+                                "input": "",
+                            }
+                        }
+
+                elif "contentBlockDelta" in event:
+                    index = event["contentBlockDelta"]["contentBlockIndex"]
+                    delta = event["contentBlockDelta"]["delta"]
+                    if "text" in delta:
+                        block = blocks.setdefault(index, {"text": ""})
+                        block["text"] += delta["text"]
+                        if on_text:
+                            on_text(delta["text"])
+                    elif "toolUse" in delta:
+                        blocks[index]["toolUse"]["input"] += delta["toolUse"]["input"]
+
+                elif "contentBlockStop" in event:
+                    block = blocks.get(event["contentBlockStop"]["contentBlockIndex"])
+                    if block and "toolUse" in block:
+                        # The input JSON is complete, the tool can start now
+                        tool_use = block["toolUse"]
+                        tool_use["input"] = json.loads(tool_use["input"] or "{}")
+                        if on_tool_use:
+                            on_tool_use(tool_use)
+
+                elif "messageStop" in event:
+                    stop_reason = event["messageStop"]["stopReason"]
+                    record_stop_reason(model_id, stop_reason, max_tokens)
+
+                elif "metadata" in event:
+                    usage = event["metadata"].get("usage", {})
+        except Exception:
+            if not (cancel_token and cancel_token.cancelled):
+                raise
+
+    # A toolUse block cut off by cancellation or the output limit still has
+    # its partial input JSON string and cannot be sent back to the model
+    message = {
+        "role": "assistant",
+        "content": [
+            blocks[index]
+            for index in sorted(blocks)
+            if not isinstance(blocks[index].get("toolUse", {}).get("input"), str)
+        ],
+    }
+    return {"message": message, "stop_reason": stop_reason, "usage": usage}
+
+
+def _run_tool(tools, tool_use):
+    """
+    Run one tool and wrap its output as a Converse toolResult block.
+    """
+    tool = tools.get(tool_use["name"])
+    try:
+        if tool is None:
+            raise ValueError(f"Unknown tool: {tool_use['name']}")
+        output = tool["function"](**tool_use["input"])
+        if isinstance(output, (dict, list)):
+            content = [{"json": output if isinstance(output, dict) else {"result": output}}]
+        else:
+            content = [{"text": str(output)}]
+        status = "success"
+    except Exception as exc:
+        content = [{"text": f"Error: {exc}"}]
+        status = "error"
+
+    return {
+        "toolResult": {
+            "toolUseId": tool_use["toolUseId"],
+            "content": content,
+            "status": status,
+        }
+    }
+
+
+def run_agent_loop(
+    client,
+    prompt,
+    tools,
+    model_id=NOVA_LITE,
+    temperature=0,
+    system_prompt=None,
+    conversation_history=None,
+    callback=None,
+    max_turns=10,
+    max_workers=8,
+    cancel_token=None,
+    max_tokens=None,
+):
+    """
+    Run a streaming agent loop that executes tool calls in parallel.
+
+    Each tool starts in a thread pool as soon as its input has streamed, so
+    independent tool calls in one turn run concurrently and overlap with the
+    rest of the model's output. Results are sent back as toolResult blocks
+    until the model stops asking for tools.
+
+    Args:
+        client: Bedrock client
+        prompt (str): User prompt
+        tools (dict): Maps tool names to dicts with "function", "description"
+            and "input_schema". Functions are called with the tool input as
+            keyword arguments
+        model_id (str): Model ID to use
+        temperature (float): Controls randomness (0-1)
+        system_prompt (str, optional): System prompt to guide the model's behavior
+        conversation_history (list, optional): Previous messages, extended in place
+        callback (callable, optional): Called with each streamed text chunk
+        max_turns (int): Maximum number of model turns, at least 1
+        max_workers (int): Maximum number of tools running at once
+        cancel_token (CancellationToken, optional): Cancels the current stream
+        max_tokens (int, optional): Maximum number of output tokens per turn
+
+    Returns:
+        dict: "text" (final answer), "messages", "tool_calls" and "turns"
+    """
+    if max_turns < 1:
+        raise ValueError("max_turns must be at least 1")
+
+    messages = conversation_history if conversation_history is not None else []
+    if messages and messages[-1]["role"] == "user":
+        # A previous run stopped after a user message (tool results or a
+        # cancelled turn), roles must alternate
+        messages[-1] = {
+            "role": "user",
+            "content": messages[-1]["content"] + [{"text": prompt}],
+        }
+    else:
+        messages.append({"role": "user", "content": [{"text": prompt}]})
+
+    tool_config = build_tool_config(tools)
+    system_prompts = [{"text": system_prompt}] if system_prompt else None
+    tool_calls = []
+    turn = None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for turns in range(1, max_turns + 1):
+            futures = []
+
+            def start_tool(tool_use):
+                tool_calls.append(tool_use)
+                futures.append(executor.submit(_run_tool, tools, tool_use))
+
+            turn = stream_with_tools(
+                client,
+                messages,
+                tool_config,
+                model_id=model_id,
+                temperature=temperature,
+                system_prompts=system_prompts,
+                on_text=callback,
+                on_tool_use=start_tool,
+                cancel_token=cancel_token,
+                max_tokens=max_tokens,
+            )
+            # Empty when cancelled before any output
+            if turn["message"]["content"]:
+                messages.append(turn["message"])
+            if not futures:
+                break
+
+            # Every toolUse block in the history needs its toolResult, also
+            # when the turn stopped early. Results keep the order of the blocks
+            messages.append(
+                {"role": "user", "content": [future.result() for future in futures]}
+            )
+            if turn["stop_reason"] != "tool_use":
+                break
+            if cancel_token and cancel_token.cancelled:
+                break
+
+    text = "".join(
+        block["text"] for block in turn["message"]["content"] if "text" in block
+    )
+    return {"text": text, "messages": messages, "tool_calls": tool_calls, "turns": turns}
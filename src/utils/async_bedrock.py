@@ -0,0 +1,378 @@
+import asyncio
+
+from .bedrock_converse_utils import NOVA_LITE, build_content
+from .single_flight import request_key
+from .token_utils import check_context_budget
+from .inference_config import build_inference_config, record_stop_reason
+from .history_utils import compact_media_history
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+
+    ASYNC_BEDROCK_AVAILABLE = True
+except ImportError:
+    ASYNC_BEDROCK_AVAILABLE = False
+
+
+async def create_async_bedrock_client(region_name="us-west-2", max_pool_connections=100):
+    """
+    Create a non-blocking Bedrock client with aiobotocore.
+
+    The client must be created inside the event loop that uses it and closed
+    with `await client.close()` when no longer needed.
+
+    Args:
+        region_name (str): AWS region name. Default is "us-west-2"
+        max_pool_connections (int): Maximum number of pooled HTTP connections
+
+    Returns:
+        Async Bedrock client
+    """
+    if not ASYNC_BEDROCK_AVAILABLE:
+        raise ImportError(
+            "The async Bedrock client requires aiobotocore. "
+            "Install it with: pip install aiobotocore"
+        )
+
+    context = get_session().create_client(
+        "bedrock-runtime",
+        region_name=region_name,
+        config=AioConfig(max_pool_connections=max_pool_connections),
+    )
+    return await context.__aenter__()
+
+
+def _build_request(
+    model_id, inference_config, system_prompt, conversation_history, content
+):
+    # Mirrors generate_conversation: the history list is extended in place
+    messages = conversation_history if conversation_history is not None else []
+    messages.append({"role": "user", "content": content})
+
+    request = {
+        "modelId": model_id,
+        "messages": messages,
+        "inferenceConfig": inference_config,
+    }
+    if system_prompt:
+        request["system"] = [{"text": system_prompt}]
+    return request
+
+
+async def async_generate_conversation(
+    client,
+    prompt,
+    model_id=NOVA_LITE,
+    temperature=0,
+    system_prompt=None,
+    conversation_history=None,
+    image_path=None,
+    video_path=None,
+    image_paths=None,
+    check_context=False,
+    max_tokens=None,
+    stop_sequences=None,
+    top_p=None,
+    preset=None,
+    keep_media_turns=None,
+):
+    """
+    Async version of generate_conversation for use with an async client.
+
+    Args:
+        client: Async Bedrock client
+        prompt (str): Text prompt to send
+        model_id (str): Model ID to use
+        temperature (float): Controls randomness (0-1)
+        system_prompt (str, optional): System prompt to guide the model's behavior
+        conversation_history (list, optional): Previous messages in the conversation
+        image_path (str, optional): Path to an image file to include with the prompt
+        video_path (str, optional): Path to a video file to include with the prompt
+        image_paths (list, optional): Paths to several image files to include with the prompt
+        check_context (bool): Raise ContextWindowExceededError before sending if the
+            request does not fit the model's context window
+        max_tokens (int, optional): Maximum number of output tokens
+        stop_sequences (list, optional): Sequences that stop generation
+        top_p (float, optional): Nucleus sampling probability mass
+        preset (str, optional): INFERENCE_PRESETS name providing the defaults above
+        keep_media_turns (int, optional): Keep media bytes only in this many of the most
+            recent messages with media, replacing older media with text references
+
+    Returns:
+        dict: Full response from the model
+    """
+    content = build_content(prompt, image_path, video_path, image_paths)
+    inference_config = build_inference_config(
+        temperature, max_tokens, stop_sequences, top_p, preset
+    )
+    request = _build_request(
+        model_id, inference_config, system_prompt, conversation_history, content
+    )
+    if keep_media_turns is not None:
+        compact_media_history(request["messages"], keep_media_turns)
+
+    if check_context:
+        check_context_budget(
+            model_id,
+            request["messages"],
+            request.get("system"),
+            inference_config.get("maxTokens"),
+        )
+
+    response = await client.converse(**request)
+    record_stop_reason(
+        model_id, response.get("stopReason"), inference_config.get("maxTokens")
+    )
+    return response
+
+
+async def async_stream_conversation(
+    client,
+    prompt,
+    model_id=NOVA_LITE,
+    temperature=0,
+    system_prompt=None,
+    conversation_history=None,
+    check_context=False,
+    max_tokens=None,
+    stop_sequences=None,
+    top_p=None,
+    preset=None,
+):
+    """
+    Async version of stream_conversation that yields text chunks as they arrive.
+
+    The upstream event stream is closed when the generator is closed or its
+    task is cancelled, so abandoned streams stop consuming output tokens.
+
+    Args:
+        client: Async Bedrock client
+        prompt (str): Text prompt to send
+        model_id (str): Model ID to use
+        temperature (float): Controls randomness (0-1)
+        system_prompt (str, optional): System prompt to guide the model's behavior
+        conversation_history (list, optional): Previous messages in the conversation
+        check_context (bool): Raise ContextWindowExceededError before sending if the
+            request does not fit the model's context window
+        max_tokens (int, optional): Maximum number of output tokens
+        stop_sequences (list, optional): Sequences that stop generation
+        top_p (float, optional): Nucleus sampling probability mass
+        preset (str, optional): INFERENCE_PRESETS name providing the defaults above
+
+    Yields:
+        str: Text chunks
+    """
+    inference_config = build_inference_config(
+        temperature, max_tokens, stop_sequences, top_p, preset
+    )
+    request = _build_request(
+        model_id,
+        inference_config,
+        system_prompt,
+        conversation_history,
+        [{"text": prompt}],
+    )
+
+    if check_context:
+        check_context_budget(
+            model_id,
+            request["messages"],
+            request.get("system"),
+            inference_config.get("maxTokens"),
+        )
+
+    response = await client.converse_stream(**request)
+    stream = response.get("stream")
+    if not stream:
+        return
+
+    try:
+        async for event in stream:
+            if "messageStop" in event:
+                record_stop_reason(
+                    model_id,
+                    event["messageStop"].get("stopReason"),
+                    inference_config.get("maxTokens"),
+                )
+            if "contentBlockDelta" in event:
+                text_chunk = event["contentBlockDelta"]["delta"].get("text")
+                if text_chunk:
+                    yield text_chunk
+    finally:
+        stream.close()
+
+
+class _AsyncSharedStream:
+    """
+    Fan out one upstream async event stream to any number of subscribers.
+
+    A dedicated task reads upstream and buffers the events, so cancelling a
+    subscriber (e.g. a client disconnecting) never cancels the read the
+    others depend on, and late subscribers replay from the start. The
+    upstream stream is closed once every subscriber has closed.
+    """
+
+    def __init__(self, upstream, on_finished):
+        self._upstream = upstream
+        self._on_finished = on_finished
+        self._events = []
+        self._finished = False
+        self._abandoned = False
+        self._error = None
+        self._subscribers = 0
+        self._condition = asyncio.Condition()
+        self._task = asyncio.ensure_future(self._read_upstream())
+
+    async def _read_upstream(self):
+        try:
+            async for event in self._upstream:
+                async with self._condition:
+                    self._events.append(event)
+                    self._condition.notify_all()
+        except asyncio.CancelledError:
+            # Cancelled by unsubscribe() after every subscriber left
+            pass
+        except Exception as e:
+            self._error = e
+        finally:
+            self._finish()
+            async with self._condition:
+                self._condition.notify_all()
+
+    def subscribe(self):
+        """
+        Returns:
+            _AsyncSubscription: A new subscription, or None if every
+                                subscriber has left and upstream was closed
+        """
+        if self._abandoned:
+            return None
+        self._subscribers += 1
+        return _AsyncSubscription(self)
+
+    async def events(self):
+        index = 0
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(
+                    lambda: index < len(self._events) or self._finished
+                )
+                if index < len(self._events):
+                    event = self._events[index]
+                elif self._error is not None:
+                    raise self._error
+                else:
+                    return
+            index += 1
+            yield event
+
+    def unsubscribe(self):
+        self._subscribers -= 1
+        if self._subscribers == 0 and not self._finished:
+            # Nobody is reading any more, stop generation upstream
+            self._abandoned = True
+            self._finish()
+            self._task.cancel()
+            if hasattr(self._upstream, "close"):
+                self._upstream.close()
+
+    def _finish(self):
+        if not self._finished:
+            self._finished = True
+            self._on_finished()
+
+
+class AsyncSingleFlightClient:
+    """
+    Async counterpart of SingleFlightClient for aiobotocore clients.
+
+    Identical concurrent converse calls await one shared response, and
+    identical converse_stream calls subscribe to one shared event stream.
+    """
+
+    def __init__(self, client):
+        """
+        Args:
+            client: Async Bedrock client to wrap
+        """
+        self.client = client
+        self._calls = {}
+        self._streams = {}
+        self.coalesced = 0
+
+    async def converse(self, **kwargs):
+        key = request_key("converse", kwargs)
+        task = self._calls.get(key)
+        if task is None:
+            # The upstream call runs as its own task, so a cancelled caller
+            # does not cancel it for the others
+            task = asyncio.ensure_future(self.client.converse(**kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def converse_stream(self, **kwargs):
+        key = request_key("converse_stream", kwargs)
+
+        async def open_stream():
+            task = asyncio.current_task()
+            response = await self.client.converse_stream(**kwargs)
+
+            def finished():
+                if self._streams.get(key) is task:
+                    del self._streams[key]
+
+            return response, _AsyncSharedStream(response.get("stream"), finished)
+
+        def opened(task):
+            # Failed calls are not shared with later requests
+            if task.cancelled() or task.exception() is not None:
+                if self._streams.get(key) is task:
+                    del self._streams[key]
+
+        while True:
+            task = self._streams.get(key)
+            if task is None:
+                task = asyncio.ensure_future(open_stream())
+                self._streams[key] = task
+                task.add_done_callback(opened)
+                coalesced = False
+            else:
+                coalesced = True
+
+            response, shared = await asyncio.shield(task)
+            subscription = shared.subscribe()
+            if subscription is not None:
+                if coalesced:
+                    self.coalesced += 1
+                return dict(response, stream=subscription)
+            # Every subscriber left before this one joined, open a new stream
+
+    async def close(self):
+        await self.client.close()
+
+    def __getattr__(self, name):
+        # Delegate everything else to the wrapped client
+        return getattr(self.client, name)
+
+
+class _AsyncSubscription:
+    """
+    One subscriber's view of a shared stream. Closing it closes the upstream
+    stream only when no other subscriber is still reading.
+    """
+
+    def __init__(self, shared):
+        self._shared = shared
+        self._closed = False
+
+    def __aiter__(self):
+        return self._shared.events()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._shared.unsubscribe()
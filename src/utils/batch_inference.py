@@ -0,0 +1,333 @@
+import base64
+import json
+
+from .models import get_model_limits
+
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+
+# Converse image formats and the matching Anthropic media types
+ANTHROPIC_MEDIA_TYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+
+
+class RequestRecorded(Exception):
+    """
+    Raised by RequestRecorder to stop a helper once its request has been captured.
+    """
+
+
+class RequestRecorder:
+    """
+    Stand-in Bedrock client that records converse requests instead of sending them.
+
+    Helpers such as generate_conversation build the request and call
+    client.converse, which stores the keyword arguments and raises
+    RequestRecorded, so the helper never tries to parse a response.
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    def converse(self, **kwargs):
+        self.requests.append(kwargs)
+        raise RequestRecorded()
+
+
+def capture_request(helper, *args, **kwargs):
+    """
+    Build the Converse request a helper would send, without sending it.
+
+    Args:
+        helper (callable): Helper taking a client as its first argument,
+            e.g. generate_conversation or invoke_with_media
+        *args, **kwargs: Helper arguments other than the client
+
+    Returns:
+        dict: The converse keyword arguments ("modelId", "messages", ...)
+    """
+    recorder = RequestRecorder()
+    try:
+        helper(recorder, *args, **kwargs)
+    except RequestRecorded:
+        return recorder.requests[-1]
+    raise ValueError(f"{helper.__name__} did not call converse")
+
+
+def _is_anthropic(model_id):
+    return "anthropic." in model_id
+
+
+def _anthropic_content(content):
+    blocks = []
+    for block in content:
+        if "text" in block:
+            blocks.append({"type": "text", "text": block["text"]})
+        elif "image" in block:
+            image = block["image"]
+            blocks.append(
+                {
+                    "type": "image",
+                    "source": {
+                        "type": "base64",
+                        "media_type": ANTHROPIC_MEDIA_TYPES[image["format"]],
+                        "data": base64.b64encode(image["source"]["bytes"]).decode(),
+                    },
+                }
+            )
+        else:
+            raise ValueError(
+                f"Unsupported content block for batch inference: {list(block)}"
+            )
+    return blocks
+
+
+def _nova_content(content):
+    blocks = []
+    for block in content:
+        if "text" in block:
+            blocks.append({"text": block["text"]})
+        elif "image" in block or "video" in block:
+            media_type = "image" if "image" in block else "video"
+            media = block[media_type]
+            blocks.append(
+                {
+                    media_type: {
+                        "format": media["format"],
+                        "source": {
+                            "bytes": base64.b64encode(media["source"]["bytes"]).decode()
+                        },
+                    }
+                }
+            )
+        else:
+            raise ValueError(
+                f"Unsupported content block for batch inference: {list(block)}"
+            )
+    return blocks
+
+
+def to_model_input(request):
+    """
+    Convert a Converse request into the model's native InvokeModel body.
+
+    Args:
+        request (dict): Converse keyword arguments, e.g. from capture_request
+
+    Returns:
+        dict: Anthropic Messages API body for Claude models, messages-v1 body for Nova models
+    """
+    model_id = request["modelId"]
+    config = request.get("inferenceConfig") or {}
+    system = request.get("system") or []
+
+    if _is_anthropic(model_id):
+        body = {
+            "anthropic_version": ANTHROPIC_VERSION,
+            # Required by the Messages API, unlike Converse
+            "max_tokens": config.get("maxTokens")
+            or get_model_limits(model_id)["max_output_tokens"],
+            "messages": [
+                {"role": m["role"], "content": _anthropic_content(m["content"])}
+                for m in request["messages"]
+            ],
+        }
+        if system:
+            body["system"] = "\n".join(block["text"] for block in system)
+        for converse_key, native_key in (
+            ("temperature", "temperature"),
+            ("topP", "top_p"),
+            ("stopSequences", "stop_sequences"),
+        ):
+            if converse_key in config:
+                body[native_key] = config[converse_key]
+        return body
+
+    body = {
+        "schemaVersion": "messages-v1",
+        "messages": [
+            {"role": m["role"], "content": _nova_content(m["content"])}
+            for m in request["messages"]
+        ],
+    }
+    if system:
+        body["system"] = [{"text": block["text"]} for block in system]
+    native_config = {}
+    for converse_key, native_key in (
+        ("maxTokens", "max_new_tokens"),
+        ("temperature", "temperature"),
+        ("topP", "top_p"),
+        ("stopSequences", "stopSequences"),
+    ):
+        if converse_key in config:
+            native_config[native_key] = config[converse_key]
+    if native_config:
+        body["inferenceConfig"] = native_config
+    return body
+
+
+def to_converse_response(model_id, model_output):
+    """
+    Convert a native model response into the shape returned by converse.
+
+    Args:
+        model_id (str): Model that produced the output
+        model_output (dict): Native InvokeModel response body
+
+    Returns:
+        dict: Response with "output", "stopReason" and "usage" like a converse response
+    """
+    if _is_anthropic(model_id):
+        content = []
+        for block in model_output.get("content", []):
+            if block["type"] == "text":
+                content.append({"text": block["text"]})
+            elif block["type"] == "tool_use":
+                content.append(
+                    {
+                        "toolUse": {
+                            "toolUseId": block["id"],
+                            "name": block["name"],
+                            "input": block["input"],
+                        }
+                    }
+                )
+        usage = model_output.get("usage", {})
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        return {
+            "output": {"message": {"role": "assistant", "content": content}},
+            "stopReason": model_output.get("stop_reason"),
+            "usage": {
+                "inputTokens": input_tokens,
+                "outputTokens": output_tokens,
+                "totalTokens": input_tokens + output_tokens,
+            },
+        }
+
+    # Nova's native response already uses the Converse layout
+    return {
+        "output": model_output["output"],
+        "stopReason": model_output.get("stopReason"),
+        "usage": model_output.get("usage", {}),
+    }
+
+
+def write_batch_input(requests, output_path):
+    """
+    Write Converse requests as a model invocation job input file.
+
+    Args:
+        requests (iterable): (record_id, request) pairs. Requests are Converse
+            keyword arguments, e.g. from capture_request, and must all use the same model
+        output_path (str): JSONL file to write, to be uploaded to S3
+
+    Returns:
+        dict: "model_id" of the job and the number of "records" written
+    """
+    model_id = None
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as file:
+        for record_id, request in requests:
+            if model_id is None:
+                model_id = request["modelId"]
+            elif request["modelId"] != model_id:
+                raise ValueError(
+                    "All records of a batch inference job must use the same model, "
+                    f"got {model_id} and {request['modelId']}"
+                )
+            record = {"recordId": str(record_id), "modelInput": to_model_input(request)}
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return {"model_id": model_id, "records": count}
+
+
+def read_batch_output(model_id, input_path):
+    """
+    Read a model invocation job output file as converse-shaped responses.
+
+    Args:
+        model_id (str): Model the job ran with
+        input_path (str): Downloaded .jsonl.out file
+
+    Yields:
+        dict: "record_id", "response" (converse-shaped, None on error) and "error".
+              Malformed lines are yielded as errors instead of ending the file
+    """
+    with open(input_path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield {
+                    "record_id": None,
+                    "response": None,
+                    "error": f"Malformed record: {exc}",
+                }
+                continue
+            if "error" in record:
+                error = record["error"]
+                if isinstance(error, dict):
+                    error = f"{error.get('errorCode')}: {error.get('errorMessage')}"
+                yield {
+                    "record_id": record.get("recordId"),
+                    "response": None,
+                    "error": error,
+                }
+                continue
+
+            try:
+                response = to_converse_response(model_id, record["modelOutput"])
+            except (KeyError, TypeError, ValueError) as exc:
+                yield {
+                    "record_id": record.get("recordId"),
+                    "response": None,
+                    "error": f"Malformed record: {type(exc).__name__}: {exc}",
+                }
+                continue
+            yield {
+                "record_id": record.get("recordId"),
+                "response": response,
+                "error": None,
+            }
+
+
+def run_batch_input_locally(client, model_id, input_path, output_path):
+    """
+    Produce a job output file from a job input file with on-demand invoke_model calls.
+
+    Writes the same record format as a model invocation job, so export and
+    import can be tested end to end with local files before running a job.
+
+    Args:
+        client: Bedrock client
+        model_id (str): Model ID to use
+        input_path (str): Job input JSONL file
+        output_path (str): Output JSONL file
+
+    Returns:
+        int: Number of records processed
+    """
+    count = 0
+    with open(input_path, encoding="utf-8") as source, open(
+        output_path, "w", encoding="utf-8"
+    ) as target:
+        for line in source:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            try:
+                response = client.invoke_model(
+                    modelId=model_id, body=json.dumps(record["modelInput"])
+                )
+                record["modelOutput"] = json.loads(response["body"].read())
+            except Exception as exc:
+                record["error"] = {"errorCode": 500, "errorMessage": str(exc)}
+            target.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
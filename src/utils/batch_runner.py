@@ -0,0 +1,312 @@
+import concurrent.futures
+import csv
+import json
+import sqlite3
+import time
+import zlib
+
+# Statuses stored per item
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def read_records(input_path, chunk_size=1000):
+    """
+    Read a CSV or JSONL file in chunks without loading it into memory.
+
+    Args:
+        input_path (str): CSV file, or JSONL file (any other extension)
+        chunk_size (int): Number of records per chunk
+
+    Yields:
+        list: Records as dicts
+    """
+    if input_path.lower().endswith(".csv"):
+        # Imported here so that importing the utils does not load pandas
+        import pandas as pd
+
+        chunks = pd.read_csv(
+            input_path, chunksize=chunk_size, dtype=str, keep_default_na=False
+        )
+        for chunk in chunks:
+            yield chunk.to_dict("records")
+        return
+
+    with open(input_path, encoding="utf-8") as file:
+        chunk = []
+        for line in file:
+            if line.strip():
+                chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class ResultStore:
+    """
+    SQLite store of batch results, one row per input item.
+
+    Every result is committed as soon as it is saved, so the store doubles as
+    the checkpoint: a restarted run skips the items already succeeded.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        """
+        Args:
+            path (str): SQLite database file, created if missing
+            timeout (float): Seconds to wait for the write lock when several
+                processes share the store
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                item_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                input TEXT,
+                output TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                completed_at REAL
+            )
+            """
+        )
+        self.connection.commit()
+
+    def finished(self, item_ids, include_failed=False):
+        """
+        Get which of the given items need no further processing.
+
+        Args:
+            item_ids (list): Item IDs to look up
+            include_failed (bool): Treat failed items as finished too
+
+        Returns:
+            set: The finished item IDs
+        """
+        statuses = (SUCCEEDED, FAILED) if include_failed else (SUCCEEDED,)
+        finished = set()
+        # Stay under SQLite's limit on query parameters
+        for start in range(0, len(item_ids), 500):
+            batch = [str(item_id) for item_id in item_ids[start:start + 500]]
+            rows = self.connection.execute(
+                f"SELECT item_id FROM results "
+                f"WHERE status IN ({','.join('?' * len(statuses))}) "
+                f"AND item_id IN ({','.join('?' * len(batch))})",
+                (*statuses, *batch),
+            )
+            finished.update(row[0] for row in rows)
+        return finished
+
+    def save(self, item_id, record, output=None, error=None):
+        """
+        Save the result of one item and commit it.
+
+        Args:
+            item_id: Item ID
+            record (dict): Input record
+            output: JSON-serialisable result, if the item succeeded
+            error (str, optional): Error message, if the item failed
+        """
+        self.connection.execute(
+            """
+            INSERT INTO results (item_id, status, input, output, error, completed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(item_id) DO UPDATE SET
+                status = excluded.status,
+                input = excluded.input,
+                output = excluded.output,
+                error = excluded.error,
+                attempts = attempts + 1,
+                completed_at = excluded.completed_at
+            """,
+            (
+                str(item_id),
+                FAILED if error else SUCCEEDED,
+                json.dumps(record, ensure_ascii=False, default=str),
+                json.dumps(output, ensure_ascii=False, default=str),
+                error,
+                time.time(),
+            ),
+        )
+        self.connection.commit()
+
+    def results(self, status=None):
+        """
+        Iterate over stored results in completion order.
+
+        Args:
+            status (str, optional): Only "succeeded" or "failed" results
+
+        Yields:
+            dict: "item_id", "status", "input", "output", "error" and "attempts"
+        """
+        query = "SELECT item_id, status, input, output, error, attempts FROM results"
+        params = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY completed_at"
+
+        rows = self.connection.execute(query, params)
+        for item_id, status, record, output, error, attempts in rows:
+            yield {
+                "item_id": item_id,
+                "status": status,
+                "input": json.loads(record),
+                "output": json.loads(output),
+                "error": error,
+                "attempts": attempts,
+            }
+
+    def export(self, output_path):
+        """
+        Write all results to a JSONL file, or a CSV file if the path ends in .csv.
+
+        Args:
+            output_path (str): Output file
+
+        Returns:
+            int: Number of results written
+        """
+        count = 0
+        with open(output_path, "w", newline="", encoding="utf-8") as file:
+            writer = None
+            for result in self.results():
+                if output_path.lower().endswith(".csv"):
+                    if writer is None:
+                        writer = csv.DictWriter(file, fieldnames=list(result))
+                        writer.writeheader()
+                    row = dict(result)
+                    row["input"] = json.dumps(row["input"], ensure_ascii=False)
+                    if not isinstance(row["output"], (str, type(None))):
+                        row["output"] = json.dumps(row["output"], ensure_ascii=False)
+                    writer.writerow(row)
+                else:
+                    file.write(json.dumps(result, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    def stats(self):
+        """
+        Get the number of stored items per status.
+
+        Returns:
+            dict: Counts of "succeeded" and "failed"
+        """
+        counts = {SUCCEEDED: 0, FAILED: 0}
+        for status, count in self.connection.execute(
+            "SELECT status, COUNT(*) FROM results GROUP BY status"
+        ):
+            counts[status] = count
+        return counts
+
+    def close(self):
+        self.connection.close()
+
+
+def shard_of(item_id, shards):
+    """
+    Stable shard index of an item ID, the same in every process and run.
+    """
+    return zlib.crc32(str(item_id).encode("utf-8")) % shards
+
+
+def run_batch(
+    fn,
+    input_path,
+    store_path,
+    id_column=None,
+    max_workers=4,
+    chunk_size=500,
+    retry_failed=True,
+    progress=None,
+    shard=None,
+):
+    """
+    Run a function over every record of a CSV or JSONL file, resumably.
+
+    Input is read in chunks and a bounded number of items run concurrently,
+    so memory stays flat regardless of input size. Each result is committed
+    to a SQLite store as soon as it completes; running the same job again
+    skips every item already in the store and continues where it stopped.
+
+    Args:
+        fn (callable): Called with each record (a dict). Must return a
+            JSON-serialisable result. Exceptions are stored as failures
+        input_path (str): CSV or JSONL input file
+        store_path (str): SQLite file holding results and progress
+        id_column (str, optional): Column with a unique item ID. Default is
+            the record's position in the file, so the input must not change
+            between runs
+        max_workers (int): Number of items processed concurrently
+        chunk_size (int): Number of records read at a time
+        retry_failed (bool): Run items that failed in a previous run again
+        progress (callable, optional): Called with the run summary after each item
+        shard (tuple, optional): (index, count) to process only the items whose
+            shard_of(item_id, count) is index, for splitting a job across processes
+
+    Returns:
+        dict: Counts of "succeeded", "failed" and "skipped" items in this run
+    """
+    store = ResultStore(store_path)
+    summary = {SUCCEEDED: 0, FAILED: 0, "skipped": 0}
+
+    def record_result(future, item_id, record):
+        try:
+            store.save(item_id, record, output=future.result())
+            summary[SUCCEEDED] += 1
+        except Exception as exc:
+            store.save(item_id, record, error=f"{type(exc).__name__}: {exc}")
+            summary[FAILED] += 1
+        if progress:
+            progress(dict(summary))
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            position = 0
+            for chunk in read_records(input_path, chunk_size):
+                ids = [
+                    record[id_column] if id_column else position + i
+                    for i, record in enumerate(chunk)
+                ]
+                position += len(chunk)
+                if shard is not None:
+                    ids, chunk = _select_shard(ids, chunk, *shard)
+                finished = store.finished(ids, include_failed=not retry_failed)
+
+                for item_id, record in zip(ids, chunk):
+                    if str(item_id) in finished:
+                        summary["skipped"] += 1
+                        continue
+
+                    pending[executor.submit(fn, record)] = (item_id, record)
+
+                    # Keep a bounded number of items in flight so memory stays flat
+                    if len(pending) >= max_workers * 2:
+                        done, _ = concurrent.futures.wait(
+                            pending, return_when=concurrent.futures.FIRST_COMPLETED
+                        )
+                        for future in done:
+                            record_result(future, *pending.pop(future))
+
+            for future in concurrent.futures.as_completed(pending):
+                record_result(future, *pending[future])
+    finally:
+        store.close()
+
+    return summary
+
+
+def _select_shard(ids, records, index, count):
+    selected = [
+        (item_id, record)
+        for item_id, record in zip(ids, records)
+        if shard_of(item_id, count) == index
+    ]
+    return [item_id for item_id, _ in selected], [record for _, record in selected]
@@ -1,32 +1,73 @@
 import boto3
+from botocore.config import Config
 import json
 import base64
 import re
 
-# Common model IDs for easy reference
-CLAUDE_3_5_SONNET = "us.anthropic.claude-3-5-sonnet-20240620-v1:0"
-CLAUDE_3_5_HAIKU = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
-NOVA_LITE = "us.amazon.nova-lite-v1:0"
-NOVA_PRO = "us.amazon.nova-pro-v1:0"
+from .models import CLAUDE_3_5_SONNET, CLAUDE_3_5_HAIKU, NOVA_LITE, NOVA_PRO
+from .token_utils import check_context_budget
+from .inference_config import build_inference_config, record_stop_reason
+from .history_utils import compact_media_history
+from .profiling import PARSE, profiled
+from .request_template import extract_text
 
+# Maximum number of images accepted in a single Converse request
+MAX_IMAGES_PER_REQUEST = 20
 
-def create_bedrock_client(region_name="us-west-2"):
+# File extensions whose Converse format name differs from the extension
+MEDIA_FORMAT_ALIASES = {"jpg": "jpeg"}
+
+
+def create_bedrock_client(
+    region_name="us-west-2",
+    max_pool_connections=10,
+    tcp_keepalive=True,
+    connect_timeout=None,
+    read_timeout=None,
+):
     """
     Create a Bedrock client with the specified region.
 
     Args:
         region_name (str): AWS region name. Default is "us-west-2"
+        max_pool_connections (int): Maximum number of pooled HTTP connections.
+            Raise it when many threads share the client
+        tcp_keepalive (bool): Enable TCP keep-alive so idle pooled connections
+            are less likely to be dropped between bursts of traffic
+        connect_timeout (float, optional): Seconds to wait for a connection
+        read_timeout (float, optional): Seconds to wait for a response
 
     Returns:
         boto3.client: Bedrock client
     """
+    options = {
+        "max_pool_connections": max_pool_connections,
+        "tcp_keepalive": tcp_keepalive,
+    }
+    if connect_timeout is not None:
+        options["connect_timeout"] = connect_timeout
+    if read_timeout is not None:
+        options["read_timeout"] = read_timeout
+
     return boto3.client(
         service_name="bedrock-runtime",
         region_name=region_name,
+        config=Config(**options),
     )
 
 
-def text_completion(client, prompt, model_id=NOVA_LITE, temperature=0):
+@profiled()
+def text_completion(
+    client,
+    prompt,
+    model_id=NOVA_LITE,
+    temperature=0,
+    check_context=False,
+    max_tokens=None,
+    stop_sequences=None,
+    top_p=None,
+    preset=None,
+):
     """
     Simple text completion with Bedrock models using the converse API.
 
@@ -35,6 +76,13 @@ def text_completion(client, prompt, model_id=NOVA_LITE, temperature=0):
         prompt (str): Text prompt to send
         model_id (str): Model ID to use
         temperature (float): Controls randomness (0-1)
+        check_context (bool): Estimate tokens locally and raise ContextWindowExceededError
+            before sending if the request does not fit the model's context window
+        max_tokens (int, optional): Maximum number of output tokens
+        stop_sequences (list, optional): Sequences that stop generation
+        top_p (float, optional): Nucleus sampling probability mass
+        preset (str, optional): INFERENCE_PRESETS name ("classification",
+            "json_extraction" or "long_form") providing the defaults above
 
     Returns:
         str: Model's text response
@@ -47,20 +95,26 @@ def text_completion(client, prompt, model_id=NOVA_LITE, temperature=0):
         }
     ]
 
+    inference_config = build_inference_config(
+        temperature, max_tokens, stop_sequences, top_p, preset
+    )
+
+    if check_context:
+        check_context_budget(
+            model_id, messages, max_tokens=inference_config.get("maxTokens")
+        )
+
     # Call the model using converse API
     response = client.converse(
         modelId=model_id,
         messages=messages,
-        inferenceConfig={"temperature": temperature},
+        inferenceConfig=inference_config,
+    )
+    record_stop_reason(
+        model_id, response.get("stopReason"), inference_config.get("maxTokens")
     )
 
-    # Extract the text response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return content["text"]
-
-    return ""
+    return extract_text(response)
 
 
 def read_file(file_path):
@@ -77,11 +131,71 @@ def read_file(file_path):
         return file.read()
 
 
+def media_block(file_path, media_type="image"):
+    """
+    Build a Converse content block for an image or video file.
+
+    Args:
+        file_path (str): Path to the media file
+        media_type (str): "image" or "video"
+
+    Returns:
+        dict: Content block with the file format and bytes
+    """
+    file_type = file_path.split(".")[-1].lower()
+    file_type = MEDIA_FORMAT_ALIASES.get(file_type, file_type)
+    return {media_type: {"format": file_type, "source": {"bytes": read_file(file_path)}}}
+
+
+def build_content(prompt, image_path=None, video_path=None, image_paths=None):
+    """
+    Build the content list for a user message with text and optional media.
+
+    Args:
+        prompt (str): Text prompt
+        image_path (str, optional): Path to an image file
+        video_path (str, optional): Path to a video file
+        image_paths (list, optional): Paths to several image files
+
+    Returns:
+        list: Content blocks, starting with the text prompt
+    """
+    content = [{"text": prompt}]
+
+    # Collect all images, keeping the single image_path first
+    images = ([image_path] if image_path else []) + list(image_paths or [])
+    if len(images) > MAX_IMAGES_PER_REQUEST:
+        raise ValueError(
+            f"At most {MAX_IMAGES_PER_REQUEST} images can be sent in one request, "
+            f"got {len(images)}"
+        )
+    for path in images:
+        content.append(media_block(path, "image"))
+
+    # Add video if provided
+    if video_path:
+        content.append(media_block(video_path, "video"))
+
+    return content
+
+
+@profiled()
 def invoke_with_media(
-    client, prompt, model_id=NOVA_LITE, temperature=0, image_path=None, video_path=None
+    client,
+    prompt,
+    model_id=NOVA_LITE,
+    temperature=0,
+    image_path=None,
+    video_path=None,
+    image_paths=None,
+    check_context=False,
+    max_tokens=None,
+    stop_sequences=None,
+    top_p=None,
+    preset=None,
 ):
     """
-    Invoke a model with media (image or video) and text.
+    Invoke a model with media (images or video) and text.
 
     Args:
         client: Bedrock client
@@ -90,28 +204,20 @@ def invoke_with_media(
         temperature (float): Controls randomness (0-1)
         image_path (str, optional): Path to an image file
         video_path (str, optional): Path to a video file
+        image_paths (list, optional): Paths to several image files sent in the same message
+        check_context (bool): Estimate tokens locally and raise ContextWindowExceededError
+            before sending if the request does not fit the model's context window
+        max_tokens (int, optional): Maximum number of output tokens
+        stop_sequences (list, optional): Sequences that stop generation
+        top_p (float, optional): Nucleus sampling probability mass
+        preset (str, optional): INFERENCE_PRESETS name ("classification",
+            "json_extraction" or "long_form") providing the defaults above
 
     Returns:
         str: Model's text response
     """
     # Build the content array starting with the text prompt
-    content = [{"text": prompt}]
-
-    # Add image if provided
-    if image_path:
-        file_type = image_path.split(".")[-1].lower()
-        image_bytes = read_file(image_path)
-        content.append(
-            {"image": {"format": file_type, "source": {"bytes": image_bytes}}}
-        )
-
-    # Add video if provided
-    if video_path:
-        file_type = video_path.split(".")[-1].lower()
-        video_bytes = read_file(video_path)
-        content.append(
-            {"video": {"format": file_type, "source": {"bytes": video_bytes}}}
-        )
+    content = build_content(prompt, image_path, video_path, image_paths)
 
     # Create the message with media and text
     message = {
@@ -119,22 +225,29 @@ def invoke_with_media(
         "content": content,
     }
 
+    inference_config = build_inference_config(
+        temperature, max_tokens, stop_sequences, top_p, preset
+    )
+
+    if check_context:
+        check_context_budget(
+            model_id, [message], max_tokens=inference_config.get("maxTokens")
+        )
+
     # Call the model using converse API
     response = client.converse(
         modelId=model_id,
         messages=[message],
-        inferenceConfig={"temperature": temperature},
+        inferenceConfig=inference_config,
+    )
+    record_stop_reason(
+        model_id, response.get("stopReason"), inference_config.get("maxTokens")
     )
 
-    # Extract the text response
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return content["text"]
-
-    return ""
+    return extract_text(response)
 
 
+@profiled(phase=PARSE)
 def extract_json_from_text(text):
     """
     Extract a JSON object from text within ```json blocks.
@@ -166,6 +279,7 @@ def extract_json_from_text(text):
         raise ValueError(f"Invalid JSON format: {e}")
 
 
+@profiled()
 def generate_conversation(
     client,
     prompt,
@@ -175,6 +289,14 @@ def generate_conversation(
     conversation_history=None,
     image_path=None,
     video_path=None,
+    image_paths=None,
+    check_context=False,
+    max_tokens=None,
+    stop_sequences=None,
+    top_p=None,
+    preset=None,
+    keep_media_turns=None,
+    describe_media=None,
 ):
     """
     Generate a conversation using the Converse API, with optional media support.
@@ -188,51 +310,65 @@ def generate_conversation(
         conversation_history (list, optional): Previous messages in the conversation
         image_path (str, optional): Path to an image file to include with the prompt
         video_path (str, optional): Path to a video file to include with the prompt
+        image_paths (list, optional): Paths to several image files to include with the prompt
+        check_context (bool): Estimate tokens locally and raise ContextWindowExceededError
+            before sending if the request does not fit the model's context window
+        max_tokens (int, optional): Maximum number of output tokens
+        stop_sequences (list, optional): Sequences that stop generation
+        top_p (float, optional): Nucleus sampling probability mass
+        preset (str, optional): INFERENCE_PRESETS name ("classification",
+            "json_extraction" or "long_form") providing the defaults above
+        keep_media_turns (int, optional): Keep media bytes only in this many of the most
+            recent messages with media, including the current one. Older media in
+            conversation_history is replaced by text references, so it is not re-sent
+            every turn. Default keeps all media
+        describe_media (callable, optional): Describes media before it is dropped,
+            e.g. a MediaDescriber, so the reference keeps a text description
 
     Returns:
         dict: Full response from the model, including the conversation
     """
     # Create messages array
-    messages = conversation_history or []
+    messages = conversation_history if conversation_history is not None else []
 
     # Create content array for the current message
-    content = [{"text": prompt}]
-
-    # Add image if provided
-    if image_path:
-        file_type = image_path.split(".")[-1].lower()
-        image_bytes = read_file(image_path)
-        content.append(
-            {"image": {"format": file_type, "source": {"bytes": image_bytes}}}
-        )
-
-    # Add video if provided
-    if video_path:
-        file_type = video_path.split(".")[-1].lower()
-        video_bytes = read_file(video_path)
-        content.append(
-            {"video": {"format": file_type, "source": {"bytes": video_bytes}}}
-        )
+    content = build_content(prompt, image_path, video_path, image_paths)
 
     # Add the current message
     messages.append({"role": "user", "content": content})
 
+    if keep_media_turns is not None:
+        compact_media_history(messages, keep_media_turns, describe_media)
+
     # Create system prompts if provided
     system_prompts = None
     if system_prompt:
         system_prompts = [{"text": system_prompt}]
 
+    inference_config = build_inference_config(
+        temperature, max_tokens, stop_sequences, top_p, preset
+    )
+
+    if check_context:
+        check_context_budget(
+            model_id, messages, system_prompts, inference_config.get("maxTokens")
+        )
+
     # Call the model using converse API
     response = client.converse(
         modelId=model_id,
         messages=messages,
         system=system_prompts,
-        inferenceConfig={"temperature": temperature},
+        inferenceConfig=inference_config,
+    )
+    record_stop_reason(
+        model_id, response.get("stopReason"), inference_config.get("maxTokens")
     )
 
     return response
 
 
+@profiled()
 def stream_conversation(
     client,
     prompt,
@@ -241,6 +377,12 @@ def stream_conversation(
     system_prompt=None,
     conversation_history=None,
     callback=None,
+    check_context=False,
+    cancel_token=None,
+    max_tokens=None,
+    stop_sequences=None,
+    top_p=None,
+    preset=None,
 ):
     """
     Stream a conversation using the Converse API.
@@ -252,13 +394,24 @@ def stream_conversation(
         temperature (float): Controls randomness (0-1)
         system_prompt (str, optional): System prompt to guide the model's behavior
         conversation_history (list, optional): Previous messages in the conversation
-        callback (callable, optional): Function to call with each streamed chunk
+        callback (callable, optional): Function to call with each streamed chunk.
+            If it returns False the stream is closed, so a consumer that has gone
+            away can stop the producer. A callback that blocks applies backpressure
+        check_context (bool): Estimate tokens locally and raise ContextWindowExceededError
+            before sending if the request does not fit the model's context window
+        cancel_token (CancellationToken, optional): Cancelling it closes the event
+            stream immediately, freeing the connection and stopping generation
+        max_tokens (int, optional): Maximum number of output tokens
+        stop_sequences (list, optional): Sequences that stop generation
+        top_p (float, optional): Nucleus sampling probability mass
+        preset (str, optional): INFERENCE_PRESETS name ("classification",
+            "json_extraction" or "long_form") providing the defaults above
 
     Returns:
-        str: Complete text response
+        str: Complete text response, or the text received before cancellation
     """
     # Create messages array
-    messages = conversation_history or []
+    messages = conversation_history if conversation_history is not None else []
 
     # Add the current prompt
     messages.append({"role": "user", "content": [{"text": prompt}]})
@@ -268,12 +421,24 @@ def stream_conversation(
     if system_prompt:
         system_prompts = [{"text": system_prompt}]
 
+    inference_config = build_inference_config(
+        temperature, max_tokens, stop_sequences, top_p, preset
+    )
+
+    if check_context:
+        check_context_budget(
+            model_id, messages, system_prompts, inference_config.get("maxTokens")
+        )
+
+    if cancel_token and cancel_token.cancelled:
+        return ""
+
     # Call the model using converse stream API
     response = client.converse_stream(
         modelId=model_id,
         messages=messages,
         system=system_prompts,
-        inferenceConfig={"temperature": temperature},
+        inferenceConfig=inference_config,
     )
 
     # Process the stream
@@ -281,18 +446,43 @@ def stream_conversation(
     full_text = ""
 
     if stream:
-        for event in stream:
-            if "contentBlockDelta" in event:
-                text_chunk = event["contentBlockDelta"]["delta"]["text"]
-                full_text += text_chunk
-
-                # Call the callback if provided
-                if callback:
-                    callback(text_chunk)
+        # Close the stream as soon as the token is cancelled, even mid-read
+        if cancel_token:
+            cancel_token.on_cancel(stream.close)
+
+        try:
+            for event in stream:
+                if cancel_token and cancel_token.cancelled:
+                    break
+                if "messageStop" in event:
+                    record_stop_reason(
+                        model_id,
+                        event["messageStop"].get("stopReason"),
+                        inference_config.get("maxTokens"),
+                    )
+                if "contentBlockDelta" in event:
+                    # Tool-use and reasoning deltas carry no text
+                    text_chunk = event["contentBlockDelta"]["delta"].get("text")
+                    if not text_chunk:
+                        continue
+                    full_text += text_chunk
+
+                    # Call the callback if provided, it returns False to stop
+                    if callback and callback(text_chunk) is False:
+                        stream.close()
+                        break
+        except Exception:
+            # Reading a stream closed by cancellation fails, which is expected
+            if not (cancel_token and cancel_token.cancelled):
+                raise
+        finally:
+            if cancel_token and cancel_token.cancelled:
+                stream.close()
 
     return full_text
 
 
+@profiled()
 def invoke_with_prefill(
     client,
     prompt,
@@ -301,6 +491,12 @@ def invoke_with_prefill(
     temperature=0,
     image_path=None,
     video_path=None,
+    image_paths=None,
+    check_context=False,
+    max_tokens=None,
+    stop_sequences=None,
+    top_p=None,
+    preset=None,
 ):
     """
     Invoke a model with response prefilling. Can include image or video content.
@@ -313,28 +509,20 @@ def invoke_with_prefill(
         temperature (float): Controls randomness (0-1)
         image_path (str, optional): Path to an image file to include with the prompt
         video_path (str, optional): Path to a video file to include with the prompt
+        image_paths (list, optional): Paths to several image files to include with the prompt
+        check_context (bool): Estimate tokens locally and raise ContextWindowExceededError
+            before sending if the request does not fit the model's context window
+        max_tokens (int, optional): Maximum number of output tokens
+        stop_sequences (list, optional): Sequences that stop generation
+        top_p (float, optional): Nucleus sampling probability mass
+        preset (str, optional): INFERENCE_PRESETS name ("classification",
+            "json_extraction" or "long_form") providing the defaults above
 
     Returns:
         str: Model's completion (not including the prefill)
     """
     # Prepare user content list
-    content = [{"text": prompt}]
-
-    # Add image if provided
-    if image_path:
-        file_type = image_path.split(".")[-1].lower()
-        image_bytes = read_file(image_path)
-        content.append(
-            {"image": {"format": file_type, "source": {"bytes": image_bytes}}}
-        )
-
-    # Add video if provided
-    if video_path:
-        file_type = video_path.split(".")[-1].lower()
-        video_bytes = read_file(video_path)
-        content.append(
-            {"video": {"format": file_type, "source": {"bytes": video_bytes}}}
-        )
+    content = build_content(prompt, image_path, video_path, image_paths)
 
     # Create user message
     user_message = {"role": "user", "content": content}
@@ -345,17 +533,24 @@ def invoke_with_prefill(
     # Create messages array
     messages = [user_message, assistant_message]
 
+    inference_config = build_inference_config(
+        temperature, max_tokens, stop_sequences, top_p, preset
+    )
+
+    if check_context:
+        check_context_budget(
+            model_id, messages, max_tokens=inference_config.get("maxTokens")
+        )
+
     # Call the model using converse API
     response = client.converse(
         modelId=model_id,
         messages=messages,
-        inferenceConfig={"temperature": temperature},
+        inferenceConfig=inference_config,
+    )
+    record_stop_reason(
+        model_id, response.get("stopReason"), inference_config.get("maxTokens")
     )
 
-    # Extract the text response (which will be the completion after the prefill)
-    output_message = response["output"]["message"]
-    for content in output_message["content"]:
-        if "text" in content:
-            return content["text"]
-
-    return ""
+    # The text response is the completion after the prefill
+    return extract_text(response)
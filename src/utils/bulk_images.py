@@ -0,0 +1,249 @@
+import concurrent.futures
+import csv
+import json
+import os
+
+from .bedrock_converse_utils import (
+    NOVA_LITE,
+    MAX_IMAGES_PER_REQUEST,
+    media_block,
+    extract_json_from_text,
+)
+from .inference_config import build_inference_config, record_stop_reason
+from .request_template import extract_text
+
+# Image file extensions picked up when walking a directory
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+# Keep each request comfortably below the Converse payload limit
+MAX_BYTES_PER_REQUEST = 15 * 1024 * 1024
+
+# Wraps the user's question so the model answers per labelled image
+BULK_PROMPT = """
+{prompt}
+
+You will receive {count} images, each preceded by its label.
+Answer the question separately for every image.
+Return a JSON object that maps each label to its answer, within ```json code blocks.
+"""
+
+
+def find_images(directory, recursive=True, extensions=IMAGE_EXTENSIONS):
+    """
+    Find image files in a directory.
+
+    Args:
+        directory (str): Directory to search
+        recursive (bool): Whether to include subdirectories
+        extensions (tuple): File extensions to include
+
+    Returns:
+        generator: Image file paths, in sorted order per directory
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                yield os.path.join(root, name)
+        if not recursive:
+            break
+
+
+def batch_images(
+    image_paths,
+    images_per_request=MAX_IMAGES_PER_REQUEST,
+    max_bytes_per_request=MAX_BYTES_PER_REQUEST,
+):
+    """
+    Pack image paths into batches that fit in a single request.
+
+    Args:
+        image_paths (iterable): Image file paths
+        images_per_request (int): Maximum number of images per batch
+        max_bytes_per_request (int): Maximum total file size per batch
+
+    Returns:
+        generator: Lists of image paths
+    """
+    images_per_request = min(images_per_request, MAX_IMAGES_PER_REQUEST)
+    batch = []
+    batch_bytes = 0
+
+    for path in image_paths:
+        size = os.path.getsize(path)
+        if batch and (
+            len(batch) >= images_per_request
+            or batch_bytes + size > max_bytes_per_request
+        ):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(path)
+        batch_bytes += size
+
+    if batch:
+        yield batch
+
+
+def analyze_image_batch(
+    client, prompt, image_paths, model_id=NOVA_LITE, temperature=0, max_tokens=None
+):
+    """
+    Ask the same question about several images in a single request.
+
+    Args:
+        client: Bedrock client
+        prompt (str): Question to answer for every image
+        image_paths (list): Paths to the images in this batch
+        model_id (str): Model ID to use
+        temperature (float): Controls randomness (0-1)
+        max_tokens (int, optional): Maximum number of output tokens for the whole batch
+
+    Returns:
+        list: Dicts with "image", "response" and "error" keys, one per image
+    """
+    labels = [f"image_{i + 1}" for i in range(len(image_paths))]
+
+    content = [{"text": BULK_PROMPT.format(prompt=prompt, count=len(image_paths))}]
+    for label, path in zip(labels, image_paths):
+        content.append({"text": f"{label}:"})
+        content.append(media_block(path, "image"))
+
+    response = client.converse(
+        modelId=model_id,
+        messages=[{"role": "user", "content": content}],
+        inferenceConfig=build_inference_config(temperature, max_tokens),
+    )
+    record_stop_reason(model_id, response.get("stopReason"), max_tokens)
+
+    text = extract_text(response)
+
+    try:
+        answers = extract_json_from_text(text)
+    except ValueError as e:
+        return [
+            {"image": path, "response": None, "error": f"{e}: {text}"}
+            for path in image_paths
+        ]
+
+    results = []
+    for label, path in zip(labels, image_paths):
+        if label in answers:
+            results.append({"image": path, "response": answers[label], "error": None})
+        else:
+            results.append(
+                {"image": path, "response": None, "error": "Missing from response"}
+            )
+    return results
+
+
+class _ResultSink:
+    """
+    Append results to a JSONL or CSV file as they arrive.
+    """
+
+    def __init__(self, output_path):
+        self.is_csv = output_path.lower().endswith(".csv")
+        self.file = open(output_path, "w", newline="", encoding="utf-8")
+        if self.is_csv:
+            self.writer = csv.DictWriter(
+                self.file, fieldnames=["image", "response", "error"]
+            )
+            self.writer.writeheader()
+
+    def write(self, result):
+        if self.is_csv:
+            row = dict(result)
+            if not isinstance(row["response"], (str, type(None))):
+                row["response"] = json.dumps(row["response"], ensure_ascii=False)
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def analyze_image_directory(
+    client,
+    prompt,
+    directory,
+    output_path,
+    model_id=NOVA_LITE,
+    temperature=0,
+    images_per_request=10,
+    max_bytes_per_request=MAX_BYTES_PER_REQUEST,
+    max_workers=4,
+    recursive=True,
+):
+    """
+    Ask the same question about every image in a directory.
+
+    Images are packed into multi-image requests, batches run concurrently and
+    results are written to the output file as soon as each batch completes.
+
+    Args:
+        client: Bedrock client
+        prompt (str): Question to answer for every image
+        directory (str): Directory containing the images
+        output_path (str): Results file, written as CSV if it ends in .csv, otherwise JSONL
+        model_id (str): Model ID to use
+        temperature (float): Controls randomness (0-1)
+        images_per_request (int): Maximum number of images per request
+        max_bytes_per_request (int): Maximum total image size per request
+        max_workers (int): Number of requests run concurrently
+        recursive (bool): Whether to include subdirectories
+
+    Returns:
+        dict: Counts of "images", "requests" and "errors"
+    """
+    batches = batch_images(
+        find_images(directory, recursive=recursive),
+        images_per_request=images_per_request,
+        max_bytes_per_request=max_bytes_per_request,
+    )
+    summary = {"images": 0, "requests": 0, "errors": 0}
+    sink = _ResultSink(output_path)
+
+    def record(results):
+        summary["requests"] += 1
+        for result in results:
+            summary["images"] += 1
+            if result["error"]:
+                summary["errors"] += 1
+            sink.write(result)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            for batch in batches:
+                future = executor.submit(
+                    analyze_image_batch, client, prompt, batch, model_id, temperature
+                )
+                pending[future] = batch
+
+                # Keep a bounded number of batches in flight so memory stays flat
+                if len(pending) >= max_workers * 2:
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        record(_batch_results(future, pending.pop(future)))
+
+            for future in concurrent.futures.as_completed(pending):
+                record(_batch_results(future, pending[future]))
+    finally:
+        sink.close()
+
+    return summary
+
+
+def _batch_results(future, batch):
+    """
+    Get the results of a finished batch, turning a failed request into per-image errors.
+    """
+    try:
+        return future.result()
+    except Exception as exc:
+        return [{"image": path, "response": None, "error": str(exc)} for path in batch]
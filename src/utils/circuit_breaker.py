@@ -0,0 +1,251 @@
+import threading
+import time
+
+from .region_pool import is_retryable_error
+from .tracing import current_call_span
+
+# Circuit states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised when a call is rejected because the circuits of the model and all
+    of its fallbacks are open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one model.
+
+    Closed: calls go through. After failure_threshold consecutive failures
+    (errors, or calls slower than latency_slo_seconds) the circuit opens.
+    Open: calls are rejected immediately. After reset_timeout_seconds the
+    circuit becomes half-open.
+    Half-open: up to half_open_max_calls probe calls go through. A successful
+    probe closes the circuit, a failed one opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold=5,
+        latency_slo_seconds=None,
+        reset_timeout_seconds=30.0,
+        half_open_max_calls=1,
+    ):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            latency_slo_seconds (float, optional): Calls slower than this count as failures
+            reset_timeout_seconds (float): How long the circuit stays open before probing
+            half_open_max_calls (int): Probe calls allowed at once while half-open
+        """
+        self.failure_threshold = failure_threshold
+        self.latency_slo_seconds = latency_slo_seconds
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._rejected = 0
+        self._times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if (
+            self._state == OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout_seconds
+        ):
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+
+    def allow(self):
+        """
+        Check whether a call may go through, reserving a probe when half-open.
+
+        Returns:
+            bool: False if the call must be rejected
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self, latency):
+        """
+        Record a completed call. Calls breaching the latency SLO count as failures.
+
+        Args:
+            latency (float): Call duration in seconds
+        """
+        if self.latency_slo_seconds is not None and latency > self.latency_slo_seconds:
+            self.record_failure()
+            return
+
+        with self._lock:
+            self._consecutive_failures = 0
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+
+    def record_failure(self):
+        """
+        Record a failed call.
+        """
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN:
+                self._open()
+            elif (
+                self._state == CLOSED
+                and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._open()
+
+    def record_ignored(self):
+        """
+        Release a probe for a call that failed for reasons unrelated to the
+        model's health, such as a validation error.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def stats(self):
+        """
+        Get the breaker state and counters.
+
+        Returns:
+            dict: "state", "consecutive_failures", "times_opened" and "rejected"
+        """
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._consecutive_failures,
+                "times_opened": self._times_opened,
+                "rejected": self._rejected,
+            }
+
+
+class CircuitBreakerClient:
+    """
+    Bedrock client wrapper with a circuit breaker per model ID.
+
+    While a model's circuit is open, calls fail fast with CircuitOpenError or,
+    if fallback models are configured, go to the first fallback whose circuit
+    is closed. Throttling, server and connection errors also move on to the
+    next fallback. Errors caused by the request itself are raised unchanged
+    and do not affect the circuit.
+
+    Can be passed anywhere a Bedrock client is expected.
+    """
+
+    def __init__(
+        self,
+        client,
+        fallback_models=None,
+        failure_threshold=5,
+        latency_slo_seconds=None,
+        reset_timeout_seconds=30.0,
+        half_open_max_calls=1,
+    ):
+        """
+        Args:
+            client: Bedrock client to wrap
+            fallback_models (dict, optional): Maps a model ID to the model IDs to try
+                instead, in order, e.g. {CLAUDE_3_5_SONNET: [CLAUDE_3_5_HAIKU]}
+            failure_threshold (int): Consecutive failures that open a model's circuit
+            latency_slo_seconds (float, optional): Calls slower than this count as failures.
+                For streams this is the time to open the stream
+            reset_timeout_seconds (float): How long a circuit stays open before probing
+            half_open_max_calls (int): Probe calls allowed at once while half-open
+        """
+        self.client = client
+        self.fallback_models = fallback_models or {}
+        self._breaker_options = {
+            "failure_threshold": failure_threshold,
+            "latency_slo_seconds": latency_slo_seconds,
+            "reset_timeout_seconds": reset_timeout_seconds,
+            "half_open_max_calls": half_open_max_calls,
+        }
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, model_id):
+        """
+        Get the circuit breaker of a model, creating it on first use.
+        """
+        with self._lock:
+            if model_id not in self._breakers:
+                self._breakers[model_id] = CircuitBreaker(**self._breaker_options)
+            return self._breakers[model_id]
+
+    def _call(self, operation, kwargs):
+        model_id = kwargs.get("modelId")
+        last_error = None
+
+        for candidate in [model_id] + list(self.fallback_models.get(model_id, [])):
+            breaker = self.breaker(candidate)
+            if not breaker.allow():
+                continue
+
+            if candidate != model_id:
+                current_call_span().set_attribute("fallback_model", candidate)
+
+            start = time.monotonic()
+            try:
+                response = getattr(self.client, operation)(
+                    **dict(kwargs, modelId=candidate)
+                )
+            except Exception as exc:
+                if not is_retryable_error(exc):
+                    breaker.record_ignored()
+                    raise
+                breaker.record_failure()
+                last_error = exc
+                continue
+
+            breaker.record_success(time.monotonic() - start)
+            return response
+
+        if last_error is not None:
+            raise last_error
+        raise CircuitOpenError(f"Circuit open for {model_id} and its fallbacks")
+
+    def converse(self, **kwargs):
+        return self._call("converse", kwargs)
+
+    def converse_stream(self, **kwargs):
+        return self._call("converse_stream", kwargs)
+
+    def stats(self):
+        """
+        Get the breaker state and counters per model ID.
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {model_id: breaker.stats() for model_id, breaker in breakers.items()}
+
+    def __getattr__(self, name):
+        # Delegate everything else (meta, other operations) to the wrapped client
+        return getattr(self.client, name)
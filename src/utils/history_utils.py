@@ -0,0 +1,152 @@
+import collections
+import hashlib
+import threading
+
+from .models import NOVA_LITE
+from .request_template import extract_text
+
+MEDIA_TYPES = ("image", "video", "document")
+
+# Prompt used to describe media once before its bytes are dropped from history
+DESCRIBE_PROMPT = (
+    "Describe this {media_type} in a few sentences, including any text, numbers "
+    "and details someone might ask about later."
+)
+
+
+def media_digest(data):
+    """
+    Short stable identifier for media bytes.
+    """
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _inline_media(block):
+    """
+    Get (media_type, media) for a content block holding media bytes, else None.
+    Media referenced by location (e.g. s3Location) is already lightweight.
+    """
+    for media_type in MEDIA_TYPES:
+        media = block.get(media_type)
+        if media and "bytes" in media.get("source", {}):
+            return media_type, media
+    return None
+
+
+class MediaDescriber:
+    """
+    Describes media blocks with a model, caching descriptions by content digest.
+
+    Pass an instance as describe_media so that compacted turns keep a text
+    description of their media. Each distinct file is described only once.
+    """
+
+    def __init__(
+        self,
+        client,
+        model_id=NOVA_LITE,
+        prompt=DESCRIBE_PROMPT,
+        max_tokens=200,
+        max_entries=1024,
+    ):
+        """
+        Args:
+            client: Bedrock client
+            model_id (str): Model used for descriptions
+            prompt (str): Description prompt, formatted with media_type
+            max_tokens (int): Maximum length of a description
+            max_entries (int): Maximum number of cached descriptions
+        """
+        self.client = client
+        self.model_id = model_id
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.max_entries = max_entries
+        self._descriptions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, block):
+        """
+        Args:
+            block (dict): Content block with image, video or document bytes
+
+        Returns:
+            str: Text description of the media
+        """
+        media_type, media = _inline_media(block)
+        digest = media_digest(media["source"]["bytes"])
+
+        with self._lock:
+            if digest in self._descriptions:
+                self._descriptions.move_to_end(digest)
+                return self._descriptions[digest]
+
+        response = self.client.converse(
+            modelId=self.model_id,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [block, {"text": self.prompt.format(media_type=media_type)}],
+                }
+            ],
+            inferenceConfig={"temperature": 0, "maxTokens": self.max_tokens},
+        )
+        description = extract_text(response).strip()
+
+        with self._lock:
+            self._descriptions[digest] = description
+            if len(self._descriptions) > self.max_entries:
+                self._descriptions.popitem(last=False)
+        return description
+
+
+def compact_media_history(messages, keep_media_turns=1, describe_media=None):
+    """
+    Replace media bytes in older turns with lightweight text references.
+
+    The last keep_media_turns messages that contain media keep their bytes;
+    media in earlier messages becomes a text block naming the media type,
+    format and a content digest, plus a description when describe_media is
+    given. The messages are modified in place, like conversation_history.
+
+    Args:
+        messages (list): Converse messages
+        keep_media_turns (int): Number of most recent messages with media to keep as is
+        describe_media (callable, optional): Called with a media content block,
+            returns a text description, e.g. a MediaDescriber
+
+    Returns:
+        int: Number of media bytes removed from the history
+    """
+    removed = 0
+    media_turns = 0
+
+    for message in reversed(messages):
+        if not any(_inline_media(block) for block in message["content"]):
+            continue
+
+        media_turns += 1
+        if media_turns <= keep_media_turns:
+            continue
+
+        content = []
+        for block in message["content"]:
+            inline = _inline_media(block)
+            if inline is None:
+                content.append(block)
+                continue
+
+            media_type, media = inline
+            data = media["source"]["bytes"]
+            reference = (
+                f"[Earlier {media_type} ({media.get('format', 'unknown')}, "
+                f"id {media_digest(data)}) removed from the conversation history"
+            )
+            if describe_media:
+                reference += f". Description: {describe_media(block)}"
+            content.append({"text": reference + "]"})
+            removed += len(data)
+
+        message["content"] = content
+
+    return removed
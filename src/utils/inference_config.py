@@ -0,0 +1,98 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Output settings for common task shapes. Explicit arguments override a preset
+INFERENCE_PRESETS = {
+    # Short labels or a small JSON object, e.g. routing classifiers
+    "classification": {"maxTokens": 100},
+    # Structured data returned as JSON, e.g. analyses and key point lists
+    "json_extraction": {"maxTokens": 1000},
+    # Emails, articles and other free text
+    "long_form": {"maxTokens": 4096, "topP": 0.9},
+}
+
+_stats_lock = threading.Lock()
+_stop_reason_counts = {}
+
+
+def build_inference_config(
+    temperature=0, max_tokens=None, stop_sequences=None, top_p=None, preset=None
+):
+    """
+    Build the inferenceConfig of a Converse request.
+
+    Args:
+        temperature (float): Controls randomness (0-1)
+        max_tokens (int, optional): Maximum number of output tokens
+        stop_sequences (list, optional): Sequences that stop generation
+        top_p (float, optional): Nucleus sampling probability mass
+        preset (str, optional): Name of an INFERENCE_PRESETS entry providing defaults
+
+    Returns:
+        dict: inferenceConfig for the Converse API
+    """
+    if preset is not None and preset not in INFERENCE_PRESETS:
+        raise ValueError(f"Unknown inference preset: {preset}")
+
+    config = dict(INFERENCE_PRESETS.get(preset, {}))
+    config["temperature"] = temperature
+    if max_tokens is not None:
+        config["maxTokens"] = max_tokens
+    if stop_sequences:
+        config["stopSequences"] = list(stop_sequences)
+    if top_p is not None:
+        config["topP"] = top_p
+    return config
+
+
+def record_stop_reason(model_id, stop_reason, max_tokens=None):
+    """
+    Count a response's stop reason and log responses cut off by maxTokens.
+
+    Args:
+        model_id (str): Model that produced the response
+        stop_reason (str): stopReason from the response or messageStop event
+        max_tokens (int, optional): maxTokens sent with the request, for the log
+    """
+    if stop_reason is None:
+        return
+
+    with _stats_lock:
+        counts = _stop_reason_counts.setdefault(model_id, {})
+        counts[stop_reason] = counts.get(stop_reason, 0) + 1
+
+    if stop_reason == "max_tokens":
+        logger.warning(
+            "Response from %s was truncated at maxTokens=%s",
+            model_id,
+            max_tokens if max_tokens is not None else "model default",
+        )
+
+
+def get_stop_reason_stats():
+    """
+    Get stop reason counts per model and the share of truncated responses.
+
+    Returns:
+        dict: Per model ID, "stop_reasons" counts, "responses" and "truncated_ratio"
+    """
+    with _stats_lock:
+        stats = {}
+        for model_id, counts in _stop_reason_counts.items():
+            responses = sum(counts.values())
+            stats[model_id] = {
+                "stop_reasons": dict(counts),
+                "responses": responses,
+                "truncated_ratio": counts.get("max_tokens", 0) / responses,
+            }
+        return stats
+
+
+def reset_stop_reason_stats():
+    """
+    Clear the stop reason counters.
+    """
+    with _stats_lock:
+        _stop_reason_counts.clear()
@@ -0,0 +1,79 @@
+# Common model IDs for easy reference
+CLAUDE_3_5_SONNET = "us.anthropic.claude-3-5-sonnet-20240620-v1:0"
+CLAUDE_3_5_HAIKU = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
+NOVA_LITE = "us.amazon.nova-lite-v1:0"
+NOVA_PRO = "us.amazon.nova-pro-v1:0"
+
+# Context window, output limit and on-demand price (USD per 1K tokens) per model
+MODEL_LIMITS = {
+    CLAUDE_3_5_SONNET: {
+        "context_window": 200000,
+        "max_output_tokens": 8192,
+        "input_price": 0.003,
+        "output_price": 0.015,
+    },
+    CLAUDE_3_5_HAIKU: {
+        "context_window": 200000,
+        "max_output_tokens": 8192,
+        "input_price": 0.0008,
+        "output_price": 0.004,
+    },
+    NOVA_LITE: {
+        "context_window": 300000,
+        "max_output_tokens": 5000,
+        "input_price": 0.00006,
+        "output_price": 0.00024,
+    },
+    NOVA_PRO: {
+        "context_window": 300000,
+        "max_output_tokens": 5000,
+        "input_price": 0.0008,
+        "output_price": 0.0032,
+    },
+}
+
+# Used for model IDs that are not listed above
+DEFAULT_MODEL_LIMITS = {
+    "context_window": 200000,
+    "max_output_tokens": 4096,
+    "input_price": 0.003,
+    "output_price": 0.015,
+}
+
+# Regions serving each model ID. The "us." IDs are cross-region inference
+# profiles, which can be called from any of the US source regions
+MODEL_REGIONS = {
+    CLAUDE_3_5_SONNET: ["us-west-2", "us-east-1", "us-east-2"],
+    CLAUDE_3_5_HAIKU: ["us-west-2", "us-east-1", "us-east-2"],
+    NOVA_LITE: ["us-west-2", "us-east-1", "us-east-2"],
+    NOVA_PRO: ["us-west-2", "us-east-1", "us-east-2"],
+}
+
+# Used for model IDs that are not listed above
+DEFAULT_MODEL_REGIONS = ["us-west-2"]
+
+
+def get_model_limits(model_id):
+    """
+    Get the context window, output limit and pricing for a model.
+
+    Args:
+        model_id (str): Model ID
+
+    Returns:
+        dict: "context_window", "max_output_tokens", "input_price" and "output_price"
+    """
+    return MODEL_LIMITS.get(model_id, DEFAULT_MODEL_LIMITS)
+
+
+def get_model_regions(model_id):
+    """
+    Get the regions a model can be called in.
+
+    Args:
+        model_id (str): Model ID
+
+    Returns:
+        list: AWS region names
+    """
+    return MODEL_REGIONS.get(model_id, DEFAULT_MODEL_REGIONS)
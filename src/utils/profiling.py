@@ -0,0 +1,386 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import tracemalloc
+
+from .warmup import _unwrap
+
+# Phases of a helper call, in order
+BUILD = "build"  # Building messages and content blocks, reading media files
+WAIT = "wait"  # Client wrappers: scheduler queue, single flight, tracing
+SERIALIZE = "serialize"  # botocore validation, serialization and signing
+NETWORK = "network"  # Sending the request and waiting for the response
+DECODE = "decode"  # botocore parsing the response
+PARSE = "parse"  # Extracting text and JSON from the response
+PHASES = (BUILD, WAIT, SERIALIZE, NETWORK, DECODE, PARSE)
+
+_current_call = contextvars.ContextVar("profiled_call", default=None)
+
+
+class _Call:
+    """
+    One profiled helper call, split into phase segments.
+    """
+
+    def __init__(self, profiler, helper, phase):
+        self.profiler = profiler
+        self.helper = helper
+        self.phase = phase
+        self.phases = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.finished = False
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        self._memory = self._reset_memory_peak()
+
+    @staticmethod
+    def _reset_memory_peak():
+        if not tracemalloc.is_tracing():
+            return 0
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def _close_segment(self):
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        allocated = 0
+        if tracemalloc.is_tracing():
+            # Peak above the memory in use when the segment started
+            allocated = max(0, tracemalloc.get_traced_memory()[1] - self._memory)
+        totals = self.phases.setdefault(self.phase, [0.0, 0.0, 0])
+        totals[0] += wall - self._wall
+        totals[1] += cpu - self._cpu
+        totals[2] += allocated
+        self._wall = wall
+        self._cpu = cpu
+        self._memory = self._reset_memory_peak()
+
+    def switch(self, phase):
+        if self.finished or phase == self.phase:
+            return
+        self._close_segment()
+        self.phase = phase
+
+    def finish(self):
+        if self.finished:
+            return
+        self._close_segment()
+        self.finished = True
+        self.profiler._add(self)
+
+
+class Profiler:
+    """
+    Measures where client-side time goes in each helper call.
+
+    Every call of a profiled helper is split into phases: building the
+    request, waiting in client wrappers, botocore serialization and signing,
+    the network round trip, botocore response parsing and parsing the
+    result. Each phase gets wall time, CPU time of the calling thread and
+    the peak memory allocated, via tracemalloc. Request and response payload
+    bytes are counted per helper.
+
+    Serialization, network and decoding are told apart with botocore event
+    hooks, so they need a ProfilingClient around a boto3 client. Behind
+    other clients, such as RegionPool, the whole client call counts as network.
+
+    Allocation numbers are exact only when one call runs at a time, because
+    tracemalloc's peak is process-wide.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._traces_memory = False
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def start(self, trace_memory=True):
+        """
+        Start profiling.
+
+        Args:
+            trace_memory (bool): Measure allocations with tracemalloc. This
+                slows down allocation-heavy code, which inflates CPU times
+
+        Returns:
+            Profiler: self
+        """
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._traces_memory = True
+        self.enabled = True
+        return self
+
+    def stop(self):
+        self.enabled = False
+        if self._traces_memory:
+            tracemalloc.stop()
+            self._traces_memory = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+        return False
+
+    def _add(self, call):
+        with self._lock:
+            stats = self._stats.setdefault(
+                call.helper,
+                {"calls": 0, "request_bytes": 0, "response_bytes": 0, "phases": {}},
+            )
+            stats["calls"] += 1
+            stats["request_bytes"] += call.request_bytes
+            stats["response_bytes"] += call.response_bytes
+            for phase, (wall, cpu, allocated) in call.phases.items():
+                totals = stats["phases"].setdefault(phase, [0.0, 0.0, 0])
+                totals[0] += wall
+                totals[1] += cpu
+                totals[2] += allocated
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+    def report(self):
+        """
+        Get the totals per helper and phase.
+
+        Returns:
+            dict: Per helper name, "calls", "request_bytes", "response_bytes"
+                  and "phases" with "wall_seconds", "cpu_seconds" and
+                  "allocated_bytes" totals per phase
+        """
+        with self._lock:
+            return {
+                helper: {
+                    "calls": stats["calls"],
+                    "request_bytes": stats["request_bytes"],
+                    "response_bytes": stats["response_bytes"],
+                    "phases": {
+                        phase: {
+                            "wall_seconds": wall,
+                            "cpu_seconds": cpu,
+                            "allocated_bytes": allocated,
+                        }
+                        for phase in PHASES
+                        if phase in stats["phases"]
+                        for wall, cpu, allocated in [stats["phases"][phase]]
+                    },
+                }
+                for helper, stats in self._stats.items()
+            }
+
+    def format_report(self):
+        """
+        Format the report as a table with averages per call.
+
+        Returns:
+            str: One row per helper and phase
+        """
+        lines = [
+            f"{'Helper':<26}{'Phase':<11}{'Calls':>6}{'Wall ms':>10}"
+            f"{'CPU ms':>9}{'Alloc KB':>10}"
+        ]
+        for helper, stats in sorted(self.report().items()):
+            calls = stats["calls"]
+            for phase, totals in stats["phases"].items():
+                lines.append(
+                    f"{helper:<26}{phase:<11}{calls:>6}"
+                    f"{totals['wall_seconds'] / calls * 1000:>10.2f}"
+                    f"{totals['cpu_seconds'] / calls * 1000:>9.2f}"
+                    f"{totals['allocated_bytes'] / calls / 1024:>10.1f}"
+                )
+            lines.append(
+                f"{helper:<26}{'payload':<11}{calls:>6}  "
+                f"request {stats['request_bytes'] / calls / 1024:.1f} KB, "
+                f"response {stats['response_bytes'] / calls / 1024:.1f} KB per call"
+            )
+        return "\n".join(lines)
+
+
+_default_profiler = Profiler()
+if os.environ.get("BEDROCK_PROFILING", "") == "1":
+    _default_profiler.start()
+
+
+def get_profiler():
+    """
+    Get the process-wide profiler, started when BEDROCK_PROFILING=1 is set.
+    """
+    return _default_profiler
+
+
+def profiled(name=None, phase=BUILD, profiler=None):
+    """
+    Decorator that profiles a helper. Helpers called from another profiled
+    helper count as part of the outer one.
+
+    Args:
+        name (str, optional): Helper name in the report. Default is the function name
+        phase (str): Phase the helper starts in, e.g. PARSE for parsing functions
+        profiler (Profiler, optional): Default is the process-wide profiler
+    """
+
+    def decorator(fn):
+        helper = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            active = profiler or _default_profiler
+            if not active.enabled or _current_call.get() is not None:
+                return fn(*args, **kwargs)
+
+            call = _Call(active, helper, phase)
+            token = _current_call.set(call)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current_call.reset(token)
+                call.finish()
+
+        return wrapper
+
+    return decorator
+
+
+def _on_parameter_build(**kwargs):
+    call = _current_call.get()
+    if call is not None:
+        call.switch(SERIALIZE)
+
+
+def _on_send(request, **kwargs):
+    call = _current_call.get()
+    if call is not None:
+        call.switch(NETWORK)
+        if request.body:
+            call.request_bytes += len(request.body)
+
+
+def _on_parse(response_dict, **kwargs):
+    call = _current_call.get()
+    if call is not None:
+        call.switch(DECODE)
+        # Streaming responses have a raw stream here, counted as 0
+        if isinstance(response_dict.get("body"), (bytes, str)):
+            call.response_bytes += len(response_dict["body"])
+
+
+def _register_hooks(client):
+    """
+    Register the phase hooks on the boto3 client under any wrappers.
+
+    Returns:
+        bool: False if the client has no botocore event system
+    """
+    events = getattr(getattr(_unwrap(client), "meta", None), "events", None)
+    if events is None:
+        return False
+    for event, handler in (
+        ("before-parameter-build.bedrock-runtime", _on_parameter_build),
+        ("before-send.bedrock-runtime", _on_send),
+        ("before-parse.bedrock-runtime", _on_parse),
+    ):
+        # The unique ID makes registering the same client twice a no-op
+        events.register(event, handler, unique_id=f"bedrock-profiler-{event}")
+    return True
+
+
+class _ProfiledStream:
+    """
+    Event stream that counts time waiting for events as network time and
+    finishes its call when the stream was opened outside of any helper.
+    """
+
+    def __init__(self, stream, call, owned):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._call = call
+        self._owned = owned
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._call.switch(NETWORK)
+        try:
+            event = next(self._iterator)
+        except BaseException:
+            if self._owned:
+                self._call.finish()
+            raise
+        self._call.switch(PARSE)
+        return event
+
+    def close(self):
+        if self._owned:
+            self._call.finish()
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
+
+class ProfilingClient:
+    """
+    Bedrock client wrapper that attributes client time to profiler phases.
+
+    Calls made from a profiled helper are added to that helper's call, other
+    calls are reported under the operation name. Costs one attribute check
+    per call while the profiler is off.
+
+    Can be passed anywhere a Bedrock client is expected.
+    """
+
+    def __init__(self, client, profiler=None):
+        """
+        Args:
+            client: Bedrock client to wrap
+            profiler (Profiler, optional): Default is the process-wide profiler
+        """
+        self.client = client
+        self.profiler = profiler or _default_profiler
+        self._hooked = _register_hooks(client)
+
+    def _call(self, operation, kwargs):
+        call = _current_call.get()
+        owned = call is None
+        if owned:
+            call = _Call(self.profiler, operation, WAIT)
+        # Without hooks the whole client call is the round trip
+        call.switch(WAIT if self._hooked else NETWORK)
+
+        token = _current_call.set(call)
+        try:
+            response = getattr(self.client, operation)(**kwargs)
+        except BaseException:
+            if owned:
+                call.finish()
+            raise
+        finally:
+            _current_call.reset(token)
+        call.switch(PARSE)
+        return response, call, owned
+
+    def converse(self, **kwargs):
+        if not self.profiler.enabled:
+            return self.client.converse(**kwargs)
+        response, call, owned = self._call("converse", kwargs)
+        if owned:
+            call.finish()
+        return response
+
+    def converse_stream(self, **kwargs):
+        if not self.profiler.enabled:
+            return self.client.converse_stream(**kwargs)
+        response, call, owned = self._call("converse_stream", kwargs)
+        return dict(
+            response, stream=_ProfiledStream(response.get("stream") or (), call, owned)
+        )
+
+    def __getattr__(self, name):
+        # Delegate everything else (meta, other operations) to the wrapped client
+        return getattr(self.client, name)
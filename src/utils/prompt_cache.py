@@ -0,0 +1,269 @@
+import copy
+import functools
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Mersenne prime used for the MinHash permutations
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text):
+    """
+    Normalise text for similarity matching: lowercase, drop punctuation,
+    replace numbers (order IDs, amounts) with a placeholder and collapse whitespace.
+
+    Args:
+        text (str): Text to normalise
+
+    Returns:
+        str: Normalised text
+    """
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    text = re.sub(r"\d+", "0", text)
+    return " ".join(text.split())
+
+
+class NearDuplicateCache:
+    """
+    Cache keyed by text similarity instead of exact text.
+
+    Each key is reduced to a MinHash signature over character shingles of its
+    normalised text. Signatures are indexed with locality-sensitive hashing
+    (banding), so a lookup only compares against a handful of candidates. A
+    candidate is a hit when its estimated Jaccard similarity reaches the
+    threshold. Entries are evicted least-recently-used once max_entries is
+    reached, and optionally after ttl_seconds.
+
+    Intended for classification-style calls where paraphrased inputs should
+    get the same answer.
+    """
+
+    def __init__(
+        self,
+        threshold=0.7,
+        max_entries=1024,
+        ttl_seconds=None,
+        num_perm=64,
+        bands=16,
+        shingle_size=3,
+        seed=1,
+    ):
+        """
+        Args:
+            threshold (float): Minimum estimated Jaccard similarity (0-1) for a hit
+            max_entries (int): Maximum number of cached entries
+            ttl_seconds (float, optional): Expire entries after this many seconds
+            num_perm (int): Number of MinHash permutations
+            bands (int): Number of LSH bands, must divide num_perm
+            shingle_size (int): Character shingle length
+            seed (int): Seed for the MinHash permutations
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Random (a, b) pairs for the universal hash functions a*x + b mod p
+        permutations = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "little") % (_MERSENNE_PRIME - 1) + 1
+            b = int.from_bytes(digest[8:], "little") % _MERSENNE_PRIME
+            permutations.append((a, b))
+        self._permutations = permutations
+
+        self._entries = OrderedDict()  # key -> (signature, value, created_at)
+        self._buckets = {}  # (band, band_hash) -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _shingles(self, text):
+        normalized = normalize_text(text)
+        if len(normalized) <= self.shingle_size:
+            return {normalized}
+        return {
+            normalized[i : i + self.shingle_size]
+            for i in range(len(normalized) - self.shingle_size + 1)
+        }
+
+    def signature(self, text):
+        """
+        Compute the MinHash signature of a text.
+
+        Args:
+            text (str): Text to hash
+
+        Returns:
+            tuple: MinHash values, one per permutation
+        """
+        hashes = [
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "little"
+            )
+            for shingle in self._shingles(text)
+        ]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._permutations
+        )
+
+    def _band_keys(self, signature):
+        return [
+            (band, hash(signature[band * self.rows : (band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(signature_a, signature_b):
+        """
+        Estimate the Jaccard similarity of two MinHash signatures.
+        """
+        matches = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+        return matches / len(signature_a)
+
+    def _remove(self, key):
+        signature, _, _ = self._entries.pop(key)
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _expired(self, created_at):
+        if self.ttl_seconds is None:
+            return False
+        return time.monotonic() - created_at > self.ttl_seconds
+
+    def get(self, text, default=None):
+        """
+        Look up the value cached for the most similar text.
+
+        Args:
+            text (str): Text to look up
+            default: Value returned on a miss
+
+        Returns:
+            A copy of the cached value, or default
+        """
+        signature = self.signature(text)
+
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates.update(self._buckets.get(band_key, ()))
+
+            best_key, best_score = None, 0.0
+            for key in candidates:
+                candidate_signature, _, created_at = self._entries[key]
+                if self._expired(created_at):
+                    self._remove(key)
+                    continue
+                score = self.similarity(signature, candidate_signature)
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            value = self._entries[best_key][1]
+
+        return copy.deepcopy(value)
+
+    def put(self, text, value):
+        """
+        Cache a value for a text.
+
+        Args:
+            text (str): Text the value was computed from
+            value: Value to cache
+        """
+        signature = self.signature(text)
+        key = normalize_text(text)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (signature, copy.deepcopy(value), time.monotonic())
+            for band_key in self._band_keys(signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: "entries", "hits", "misses", "evictions" and "hit_rate"
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def near_duplicate_cached(cache):
+    """
+    Decorator that caches a function by the similarity of its first (text) argument.
+
+    Only use this for functions whose other arguments do not change the answer.
+
+    Args:
+        cache (NearDuplicateCache): Cache to use
+
+    Returns:
+        callable: Decorator
+    """
+
+    def decorator(fn):
+        missing = object()
+
+        @functools.wraps(fn)
+        def wrapper(text, *args, **kwargs):
+            value = cache.get(text, missing)
+            if value is not missing:
+                return value
+            value = fn(text, *args, **kwargs)
+            if value is not None:
+                cache.put(text, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
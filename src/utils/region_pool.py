@@ -0,0 +1,272 @@
+import threading
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .bedrock_converse_utils import create_bedrock_client
+from .models import MODEL_REGIONS, get_model_regions
+from .tracing import current_call_span
+from .warmup import warm_up_client
+
+# Error codes worth retrying in another region; anything else (validation,
+# access denied, ...) would fail the same way everywhere
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "ServiceQuotaExceededException",
+}
+
+
+def is_retryable_error(exc):
+    """
+    Check whether a failed Bedrock call may succeed elsewhere or later.
+
+    Args:
+        exc (Exception): Exception raised by the call
+
+    Returns:
+        bool: True for throttling, server-side and connection errors
+    """
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+    # Connection errors and timeouts
+    return isinstance(exc, BotoCoreError)
+
+
+class _RegionHealth:
+    """
+    Live latency and error statistics of one region.
+    """
+
+    def __init__(self):
+        self.latency = None  # Exponentially weighted mean, seconds
+        self.error_rate = 0.0  # Exponentially weighted, 0-1
+        self.in_flight = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.updated_at = time.monotonic()
+        self.calls = 0
+        self.errors = 0
+
+
+class RegionPool:
+    """
+    Bedrock client that spreads calls over several regions.
+
+    Each call goes to the healthiest region that serves the requested model
+    (see MODEL_REGIONS in models.py), ranked by latency and error rate tracked
+    as exponentially weighted averages and by the calls currently in flight.
+    Throttling, server and connection errors fail over to the next region, and
+    a region that fails repeatedly is skipped for a cooldown period.
+
+    Streams fail over only while opening; the latency recorded for a stream
+    is its time to open, roughly the time to first token.
+
+    Can be passed anywhere a Bedrock client is expected.
+    """
+
+    def __init__(
+        self,
+        regions=None,
+        client_factory=create_bedrock_client,
+        smoothing=0.2,
+        error_penalty_seconds=10.0,
+        error_half_life_seconds=30.0,
+        failure_threshold=3,
+        cooldown_seconds=30.0,
+        max_attempts=None,
+    ):
+        """
+        Args:
+            regions (list, optional): Regions to use. Default is every region in MODEL_REGIONS
+                that serves the requested model
+            client_factory (callable): Creates a client given region_name
+            smoothing (float): Weight of the newest sample in the moving averages (0-1)
+            error_penalty_seconds (float): Latency added to a region's score per unit of error rate
+            error_half_life_seconds (float): Time for an idle region's error rate to halve
+            failure_threshold (int): Consecutive errors before a region is put in cooldown
+            cooldown_seconds (float): How long a failing region is skipped
+            max_attempts (int, optional): Maximum regions tried per call. Default is all
+        """
+        self.regions = list(regions) if regions else None
+        self.client_factory = client_factory
+        self.smoothing = smoothing
+        self.error_penalty_seconds = error_penalty_seconds
+        self.error_half_life_seconds = error_half_life_seconds
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_attempts = max_attempts
+
+        self._clients = {}
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _client(self, region):
+        with self._lock:
+            client = self._clients.get(region)
+        if client is None:
+            # Built outside the lock, which would otherwise hold up calls to
+            # every region. A client built twice in a race is discarded
+            client = self.client_factory(region_name=region)
+            with self._lock:
+                client = self._clients.setdefault(region, client)
+        return client
+
+    def _error_rate(self, health, now):
+        # Halve the error rate every error_half_life_seconds without calls, so a
+        # region that failed earlier gets traffic again and is re-measured
+        idle = now - health.updated_at
+        return health.error_rate * 0.5 ** (idle / self.error_half_life_seconds)
+
+    def _score(self, health, now):
+        # Unmeasured regions score 0 so each region gets tried early on
+        latency = health.latency or 0.0
+        return (
+            latency * (1 + health.in_flight)
+            + self._error_rate(health, now) * self.error_penalty_seconds
+        )
+
+    def candidates(self, model_id):
+        """
+        Get the regions to try for a model, best first.
+
+        Regions in cooldown come last, so a call still goes out when every
+        region is failing. Models missing from MODEL_REGIONS may be called in
+        any configured region.
+
+        Args:
+            model_id (str): Model ID
+
+        Returns:
+            list: Region names
+
+        Raises:
+            ValueError: If none of the configured regions serves the model
+        """
+        regions = get_model_regions(model_id)
+        if self.regions:
+            if model_id in MODEL_REGIONS:
+                regions = [r for r in regions if r in self.regions]
+                if not regions:
+                    raise ValueError(
+                        f"{model_id} is not served in any of the regions "
+                        f"{self.regions}, only in {get_model_regions(model_id)}"
+                    )
+            else:
+                regions = self.regions
+
+        now = time.monotonic()
+        with self._lock:
+            ranked = []
+            for region in regions:
+                health = self._health.setdefault(region, _RegionHealth())
+                cooling = health.cooldown_until > now
+                ranked.append((cooling, self._score(health, now), region))
+
+        ranked.sort()
+        regions = [region for _, _, region in ranked]
+        return regions[: self.max_attempts] if self.max_attempts else regions
+
+    def _start(self, region):
+        with self._lock:
+            self._health[region].in_flight += 1
+
+    def _record(self, region, latency=None, error=False):
+        # latency is None and error is False for caller errors, which say
+        # nothing about the region's health
+        with self._lock:
+            health = self._health[region]
+            health.in_flight -= 1
+            health.calls += 1
+            if latency is None and not error:
+                return
+
+            now = time.monotonic()
+            health.error_rate = self._error_rate(health, now)
+            health.error_rate += self.smoothing * (float(error) - health.error_rate)
+            health.updated_at = now
+
+            if error:
+                health.errors += 1
+                health.consecutive_errors += 1
+                if health.consecutive_errors >= self.failure_threshold:
+                    health.cooldown_until = now + self.cooldown_seconds
+            else:
+                health.consecutive_errors = 0
+                if health.latency is None:
+                    health.latency = latency
+                else:
+                    health.latency += self.smoothing * (latency - health.latency)
+
+    def _call(self, operation, kwargs):
+        last_error = None
+        for attempt, region in enumerate(self.candidates(kwargs.get("modelId")), 1):
+            current_call_span().set_attributes(region=region, region_attempts=attempt)
+            self._start(region)
+            start = time.monotonic()
+            try:
+                response = getattr(self._client(region), operation)(**kwargs)
+            except Exception as exc:
+                retryable = is_retryable_error(exc)
+                self._record(region, error=retryable)
+                if not retryable:
+                    raise
+                last_error = exc
+                continue
+
+            self._record(region, latency=time.monotonic() - start)
+            return response
+
+        raise last_error
+
+    def converse(self, **kwargs):
+        return self._call("converse", kwargs)
+
+    def converse_stream(self, **kwargs):
+        return self._call("converse_stream", kwargs)
+
+    def warm_up(self, model_id, connections=1):
+        """
+        Open connections ahead of time in every region serving a model.
+
+        Args:
+            model_id (str): Model ID
+            connections (int): Connections to open per region
+
+        Returns:
+            dict: warm_up_client result per region
+        """
+        return {
+            region: warm_up_client(self._client(region), connections, model_id)
+            for region in self.candidates(model_id)
+        }
+
+    def stats(self):
+        """
+        Get live statistics per region.
+
+        Returns:
+            dict: Per region, "latency", "error_rate", "in_flight", "calls", "errors"
+                  and "cooling_down"
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                region: {
+                    "latency": health.latency,
+                    "error_rate": self._error_rate(health, now),
+                    "in_flight": health.in_flight,
+                    "calls": health.calls,
+                    "errors": health.errors,
+                    "cooling_down": health.cooldown_until > now,
+                }
+                for region, health in self._health.items()
+            }
+
+    def __getattr__(self, name):
+        # Delegate everything else to a client in the first configured region
+        region = (self.regions or get_model_regions(None))[0]
+        return getattr(self._client(region), name)
@@ -0,0 +1,155 @@
+import string
+
+from .inference_config import build_inference_config, record_stop_reason
+from .models import NOVA_LITE
+from .profiling import profiled
+
+
+def extract_text(response, default=""):
+    """
+    Get the first text block of a converse response.
+
+    Args:
+        response (dict): Response from converse
+        default: Returned when the response has no text block
+
+    Returns:
+        str: The text
+    """
+    for block in response["output"]["message"]["content"]:
+        if "text" in block:
+            return block["text"]
+    return default
+
+
+class RequestTemplate:
+    """
+    A single-turn Converse request whose static parts are built once.
+
+    The system blocks, inferenceConfig and media blocks are created when the
+    template is defined and shared by every request, and the prompt's
+    placeholders are parsed up front. A call only formats the prompt and
+    assembles one message, so define templates at module level, one per
+    pattern step:
+
+        CLASSIFY = RequestTemplate(
+            'Classify this inquiry: "{inquiry}"',
+            system_prompt=SYSTEM_PROMPT,
+            preset="classification",
+            name="classify_inquiry",
+        )
+        label = CLASSIFY.text(client, inquiry="How do I reset my password?")
+
+    Literal braces in the prompt must be doubled, as with str.format.
+    """
+
+    def __init__(
+        self,
+        prompt,
+        model_id=NOVA_LITE,
+        system_prompt=None,
+        media=None,
+        temperature=0,
+        max_tokens=None,
+        stop_sequences=None,
+        top_p=None,
+        preset=None,
+        name="request_template",
+    ):
+        """
+        Args:
+            prompt (str): Prompt with {placeholders} filled in on each call
+            model_id (str): Model ID to use
+            system_prompt (str, optional): System prompt to guide the model's behavior
+            media (list, optional): Content blocks sent after the prompt on every call,
+                e.g. [media_block("logo.png")], read once
+            temperature (float): Controls randomness (0-1)
+            max_tokens (int, optional): Maximum number of output tokens
+            stop_sequences (list, optional): Sequences that stop generation
+            top_p (float, optional): Nucleus sampling probability mass
+            preset (str, optional): INFERENCE_PRESETS name providing the defaults above
+            name (str): Name of the template in profiler reports
+        """
+        self.prompt = prompt
+        self.model_id = model_id
+        self.name = name
+        self.fields = frozenset(
+            field for _, field, _, _ in string.Formatter().parse(prompt) if field
+        )
+        self.inference_config = build_inference_config(
+            temperature, max_tokens, stop_sequences, top_p, preset
+        )
+        self._static = {"modelId": model_id, "inferenceConfig": self.inference_config}
+        if system_prompt:
+            self._static["system"] = [{"text": system_prompt}]
+        self._media = list(media or [])
+        # Prompts without placeholders are sent as is
+        self._text_block = None if self.fields else {"text": prompt}
+        self._call = profiled(name)(self._send)
+
+    def render(self, **values):
+        """
+        Fill in the prompt's placeholders.
+
+        Returns:
+            str: The prompt text
+        """
+        if not self.fields:
+            return self.prompt
+        missing = self.fields - values.keys()
+        if missing:
+            raise ValueError(
+                f"Missing values for {self.name} prompt: {', '.join(sorted(missing))}"
+            )
+        return self.prompt.format_map(values)
+
+    def build(self, **values):
+        """
+        Build the converse keyword arguments. The system blocks,
+        inferenceConfig and media blocks are shared between requests and
+        must not be modified.
+
+        Returns:
+            dict: "modelId", "messages", "inferenceConfig" and "system" if set
+        """
+        text_block = self._text_block or {"text": self.render(**values)}
+        request = dict(self._static)
+        request["messages"] = [
+            {"role": "user", "content": [text_block, *self._media]}
+        ]
+        return request
+
+    def _send(self, client, values, text):
+        response = client.converse(**self.build(**values))
+        record_stop_reason(
+            self.model_id,
+            response.get("stopReason"),
+            self.inference_config.get("maxTokens"),
+        )
+        return extract_text(response) if text else response
+
+    def converse(self, client, **values):
+        """
+        Send the request.
+
+        Args:
+            client: Bedrock client
+            **values: Values of the prompt's placeholders
+
+        Returns:
+            dict: Full response from the model
+        """
+        return self._call(client, values, False)
+
+    def text(self, client, **values):
+        """
+        Send the request and return the first text block of the response.
+
+        Args:
+            client: Bedrock client
+            **values: Values of the prompt's placeholders
+
+        Returns:
+            str: Text response, "" if there is none
+        """
+        return self._call(client, values, True)
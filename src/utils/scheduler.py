@@ -0,0 +1,341 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from .token_utils import estimate_request
+from .tracing import current_call_span
+
+# Priority classes, lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+
+
+class QueueFullError(RuntimeError):
+    """
+    Raised when a request is rejected because the scheduler queue is full.
+    """
+
+
+class _Ticket:
+    """
+    A request waiting for, or holding, a scheduler slot.
+    """
+
+    def __init__(self, priority, tenant, finish_tag):
+        self.priority = priority
+        self.tenant = tenant
+        self.finish_tag = finish_tag
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.wait_seconds = 0.0
+
+
+class RequestScheduler:
+    """
+    Admission scheduler for Bedrock calls with priority classes and fair sharing.
+
+    At most max_concurrency requests run at once. Waiting requests are served
+    strictly by priority class (INTERACTIVE before BATCH), and within a class
+    tenants share capacity by weighted fair queueing: each request gets a
+    virtual finish tag of start + cost / weight, and the smallest tag runs
+    first. Batch work uses any idle capacity, except for reserved_slots kept
+    free for interactive requests so they never wait behind long batch calls.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=8,
+        max_queue_depth=256,
+        max_tenant_queue_depth=None,
+        tenant_weights=None,
+        reserved_slots=1,
+    ):
+        """
+        Args:
+            max_concurrency (int): Maximum number of requests running at once
+            max_queue_depth (int): Maximum number of waiting requests in total
+            max_tenant_queue_depth (int, optional): Maximum waiting requests per tenant
+            tenant_weights (dict, optional): Relative share per tenant. Default weight is 1
+            reserved_slots (int): Slots that only INTERACTIVE requests may use
+        """
+        if reserved_slots >= max_concurrency:
+            raise ValueError("reserved_slots must be smaller than max_concurrency")
+
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.max_tenant_queue_depth = max_tenant_queue_depth
+        self.tenant_weights = dict(tenant_weights or {})
+        self.reserved_slots = reserved_slots
+
+        self._condition = threading.Condition()
+        self._queues = {}  # priority -> heap of (finish_tag, sequence, ticket)
+        self._sequence = itertools.count()
+        self._tenant_finish = {}  # tenant -> finish tag of its last request
+        self._tenant_waiting = {}
+        self._virtual_time = 0.0
+        self._active = 0
+        self._waiting = 0
+        self._completed = {}
+        self._wait_totals = {}
+        self._rejected = 0
+
+    def _enqueue(self, priority, tenant, cost):
+        if self._waiting >= self.max_queue_depth:
+            self._rejected += 1
+            raise QueueFullError(f"Scheduler queue is full ({self._waiting} waiting)")
+        if (
+            self.max_tenant_queue_depth is not None
+            and self._tenant_waiting.get(tenant, 0) >= self.max_tenant_queue_depth
+        ):
+            self._rejected += 1
+            raise QueueFullError(f"Queue for tenant '{tenant}' is full")
+
+        weight = self.tenant_weights.get(tenant, 1)
+        start_tag = max(self._virtual_time, self._tenant_finish.get(tenant, 0.0))
+        finish_tag = start_tag + cost / weight
+        self._tenant_finish[tenant] = finish_tag
+
+        ticket = _Ticket(priority, tenant, finish_tag)
+        heapq.heappush(
+            self._queues.setdefault(priority, []),
+            (finish_tag, next(self._sequence), ticket),
+        )
+        self._waiting += 1
+        self._tenant_waiting[tenant] = self._tenant_waiting.get(tenant, 0) + 1
+        return ticket
+
+    def _dispatch(self):
+        # Grant slots in priority order while capacity is available
+        granted = False
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            limit = self.max_concurrency
+            if priority != INTERACTIVE:
+                limit -= self.reserved_slots
+
+            while queue and self._active < limit:
+                _, _, ticket = heapq.heappop(queue)
+                self._waiting -= 1
+                self._tenant_waiting[ticket.tenant] -= 1
+                ticket.granted = True
+                ticket.wait_seconds = time.monotonic() - ticket.enqueued_at
+                self._virtual_time = max(self._virtual_time, ticket.finish_tag)
+                self._active += 1
+                granted = True
+
+        if granted:
+            self._condition.notify_all()
+
+    def _remove(self, ticket):
+        # Take a waiting ticket out of its queue, so it no longer counts
+        # against the queue depth limits
+        queue = self._queues[ticket.priority]
+        queue[:] = [entry for entry in queue if entry[2] is not ticket]
+        heapq.heapify(queue)
+        self._waiting -= 1
+        self._tenant_waiting[ticket.tenant] -= 1
+
+    def acquire(self, priority=BATCH, tenant="default", cost=1, timeout=None):
+        """
+        Wait for a slot.
+
+        Args:
+            priority (int): Priority class, INTERACTIVE or BATCH
+            tenant (str): Tenant the request is accounted to
+            cost (float): Relative cost of the request, e.g. estimated tokens
+            timeout (float, optional): Maximum seconds to wait
+
+        Returns:
+            _Ticket: Ticket to pass to release()
+
+        Raises:
+            QueueFullError: If the queue depth limit is reached
+            TimeoutError: If no slot was granted within timeout
+        """
+        with self._condition:
+            ticket = self._enqueue(priority, tenant, cost)
+            self._dispatch()
+            granted = self._condition.wait_for(lambda: ticket.granted, timeout)
+            if not granted:
+                self._remove(ticket)
+                raise TimeoutError("Timed out waiting for a scheduler slot")
+        return ticket
+
+    def release(self, ticket):
+        """
+        Release a slot obtained with acquire().
+
+        Args:
+            ticket (_Ticket): Ticket returned by acquire()
+        """
+        with self._condition:
+            self._active -= 1
+            self._completed[ticket.priority] = (
+                self._completed.get(ticket.priority, 0) + 1
+            )
+            self._wait_totals[ticket.priority] = (
+                self._wait_totals.get(ticket.priority, 0.0) + ticket.wait_seconds
+            )
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority=BATCH, tenant="default", cost=1, timeout=None):
+        """
+        Context manager that holds a slot for the duration of the block.
+
+        Yields:
+            _Ticket: The granted ticket, with wait_seconds set
+        """
+        ticket = self.acquire(priority, tenant, cost, timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        """
+        Get scheduler statistics.
+
+        Returns:
+            dict: "active", "waiting", "rejected", and per priority
+                  "completed" counts and "avg_wait_seconds"
+        """
+        with self._condition:
+            return {
+                "active": self._active,
+                "waiting": self._waiting,
+                "rejected": self._rejected,
+                "completed": dict(self._completed),
+                "avg_wait_seconds": {
+                    priority: self._wait_totals[priority] / count
+                    for priority, count in self._completed.items()
+                },
+            }
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    """
+    Get the process-wide scheduler shared by all ScheduledClients that do not specify one.
+
+    Returns:
+        RequestScheduler: The shared scheduler
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RequestScheduler()
+        return _default_scheduler
+
+
+class _ReleasingStream:
+    """
+    Event stream wrapper that calls on_release exactly once when the stream
+    is exhausted, fails, is closed or is garbage collected.
+    """
+
+    def __init__(self, stream, on_release):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._on_release = on_release
+        self._released = False
+        self._lock = threading.Lock()
+
+    def _release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._on_release()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self._release()
+            raise
+
+    def close(self):
+        try:
+            if hasattr(self._stream, "close"):
+                self._stream.close()
+        finally:
+            self._release()
+
+    def __del__(self):
+        self._release()
+
+
+class ScheduledClient:
+    """
+    Bedrock client wrapper that runs every call through a RequestScheduler.
+
+    A streaming call holds its slot until the stream is fully read or closed.
+    The cost of each request is its estimated token count, so tenants sending
+    large requests get proportionally fewer turns.
+
+    Can be passed anywhere a Bedrock client is expected.
+    """
+
+    def __init__(
+        self, client, scheduler=None, priority=BATCH, tenant="default", timeout=None
+    ):
+        """
+        Args:
+            client: Bedrock client to wrap
+            scheduler (RequestScheduler, optional): Default is the process-wide scheduler
+            priority (int): Priority class for calls made through this client
+            tenant (str): Tenant calls are accounted to
+            timeout (float, optional): Maximum seconds to wait for a slot
+        """
+        self.client = client
+        self.scheduler = scheduler or get_default_scheduler()
+        self.priority = priority
+        self.tenant = tenant
+        self.timeout = timeout
+
+    def _cost(self, kwargs):
+        estimate = estimate_request(
+            kwargs.get("modelId"),
+            kwargs.get("messages", []),
+            kwargs.get("system"),
+            (kwargs.get("inferenceConfig") or {}).get("maxTokens"),
+        )
+        return estimate["input_tokens"] + estimate["output_tokens"]
+
+    def converse(self, **kwargs):
+        with self.scheduler.slot(
+            self.priority, self.tenant, self._cost(kwargs), self.timeout
+        ) as ticket:
+            current_call_span().set_attribute(
+                "queue_wait_seconds", ticket.wait_seconds
+            )
+            return self.client.converse(**kwargs)
+
+    def converse_stream(self, **kwargs):
+        ticket = self.scheduler.acquire(
+            self.priority, self.tenant, self._cost(kwargs), self.timeout
+        )
+        current_call_span().set_attribute("queue_wait_seconds", ticket.wait_seconds)
+        try:
+            response = self.client.converse_stream(**kwargs)
+        except Exception:
+            self.scheduler.release(ticket)
+            raise
+
+        stream = _ReleasingStream(
+            response.get("stream") or (), lambda: self.scheduler.release(ticket)
+        )
+        return dict(response, stream=stream)
+
+    def __getattr__(self, name):
+        # Delegate everything else (meta, other operations) to the wrapped client
+        return getattr(self.client, name)
@@ -0,0 +1,183 @@
+import concurrent.futures
+import multiprocessing
+import os
+import time
+
+from .batch_runner import FAILED, SUCCEEDED, ResultStore, run_batch
+from .inference_config import get_stop_reason_stats
+
+
+def _run_shard(
+    fn,
+    input_path,
+    store_path,
+    index,
+    shards,
+    id_column,
+    max_workers,
+    chunk_size,
+    retry_failed,
+    initializer,
+    initargs,
+):
+    # Runs in a worker process, which has its own clients and thread pool
+    if initializer is not None:
+        initializer(*initargs)
+
+    start = time.perf_counter()
+    summary = run_batch(
+        fn,
+        input_path,
+        store_path,
+        id_column=id_column,
+        max_workers=max_workers,
+        chunk_size=chunk_size,
+        retry_failed=retry_failed,
+        shard=(index, shards),
+    )
+    summary.update(
+        shard=index,
+        pid=os.getpid(),
+        seconds=time.perf_counter() - start,
+        stop_reasons=get_stop_reason_stats(),
+    )
+    return summary
+
+
+def merge_stop_reason_stats(stats):
+    """
+    Combine get_stop_reason_stats() results from several processes.
+
+    Args:
+        stats (list): Stop reason stats, one per process
+
+    Returns:
+        dict: Per model ID, "stop_reasons" counts, "responses" and "truncated_ratio"
+    """
+    counts = {}
+    for process_stats in stats:
+        for model_id, model_stats in process_stats.items():
+            model_counts = counts.setdefault(model_id, {})
+            for stop_reason, count in model_stats["stop_reasons"].items():
+                model_counts[stop_reason] = model_counts.get(stop_reason, 0) + count
+
+    merged = {}
+    for model_id, model_counts in counts.items():
+        responses = sum(model_counts.values())
+        merged[model_id] = {
+            "stop_reasons": model_counts,
+            "responses": responses,
+            "truncated_ratio": model_counts.get("max_tokens", 0) / responses,
+        }
+    return merged
+
+
+def run_sharded_batch(
+    fn,
+    input_path,
+    store_path,
+    processes=None,
+    id_column=None,
+    max_workers=4,
+    chunk_size=500,
+    retry_failed=True,
+    initializer=None,
+    initargs=(),
+    progress=None,
+    progress_interval=5.0,
+):
+    """
+    Run a function over every record of a CSV or JSONL file across several processes.
+
+    Items are split into shards by a stable hash of their ID, one shard per
+    process. Each process runs run_batch over its shard with its own clients
+    and max_workers concurrent items, so client-side work such as request
+    signing, serialization and response parsing is not limited to one core
+    by the GIL. All processes write to the same SQLite store, so an
+    interrupted job resumes with any number of processes.
+
+    Processes are started with "spawn": fn, initializer and initargs must be
+    picklable (module-level functions), and modules creating a client at
+    import time create one per process.
+
+    Args:
+        fn (callable): Module-level function called with each record (a dict).
+            Must return a JSON-serialisable result. Exceptions are stored as failures
+        input_path (str): CSV or JSONL input file, read by every process
+        store_path (str): SQLite file holding results and progress
+        processes (int, optional): Number of processes. Default is the CPU count
+        id_column (str, optional): Column with a unique item ID. Default is
+            the record's position in the file
+        max_workers (int): Items processed concurrently per process
+        chunk_size (int): Number of records read at a time
+        retry_failed (bool): Run items that failed in a previous run again
+        initializer (callable, optional): Called once in each process before
+            its shard starts, e.g. to create clients or configure logging
+        initargs (tuple): Arguments for initializer
+        progress (callable, optional): Called with the store's "succeeded" and
+            "failed" counts every progress_interval seconds
+        progress_interval (float): Seconds between progress calls
+
+    Returns:
+        dict: Merged counts of "succeeded", "failed" and "skipped" items in
+              this run, "seconds", "items_per_second", merged "stop_reasons"
+              and the per-process "shards" summaries
+    """
+    processes = processes or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    # Create the store before the processes start, so they do not race to
+    # create its table
+    ResultStore(store_path).close()
+
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes, mp_context=context
+    ) as executor:
+        futures = [
+            executor.submit(
+                _run_shard,
+                fn,
+                input_path,
+                store_path,
+                index,
+                processes,
+                id_column,
+                max_workers,
+                chunk_size,
+                retry_failed,
+                initializer,
+                initargs,
+            )
+            for index in range(processes)
+        ]
+
+        pending = set(futures)
+        while pending:
+            _, pending = concurrent.futures.wait(pending, timeout=progress_interval)
+            if progress:
+                store = ResultStore(store_path)
+                try:
+                    progress(store.stats())
+                finally:
+                    store.close()
+
+        # Raises if a process failed outside of fn, e.g. in initializer
+        shards = [future.result() for future in futures]
+
+    seconds = time.perf_counter() - start
+    summary = {
+        SUCCEEDED: sum(shard[SUCCEEDED] for shard in shards),
+        FAILED: sum(shard[FAILED] for shard in shards),
+        "skipped": sum(shard["skipped"] for shard in shards),
+    }
+    processed = summary[SUCCEEDED] + summary[FAILED]
+    summary.update(
+        seconds=seconds,
+        items_per_second=processed / seconds if seconds else 0.0,
+        stop_reasons=merge_stop_reason_stats(
+            [shard.pop("stop_reasons") for shard in shards]
+        ),
+        shards=shards,
+    )
+    return summary
@@ -0,0 +1,333 @@
+import hashlib
+import json
+import threading
+
+
+def request_key(operation, request):
+    """
+    Compute a canonical hash of a Converse request.
+
+    Media bytes are replaced by their SHA-256 digest so that large payloads
+    are hashed once and not serialised into the key.
+
+    Args:
+        operation (str): API operation name, e.g. "converse"
+        request (dict): Keyword arguments of the call
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+
+    def encode(value):
+        if isinstance(value, (bytes, bytearray)):
+            return {"__bytes__": hashlib.sha256(value).hexdigest()}
+        raise TypeError(f"Cannot hash request value of type {type(value).__name__}")
+
+    canonical = json.dumps(
+        request, sort_keys=True, separators=(",", ":"), default=encode
+    )
+    return hashlib.sha256(f"{operation}:{canonical}".encode()).hexdigest()
+
+
+class _Call:
+    """
+    A single in-flight call shared by a leader and any followers.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run a function at most once at a time per key.
+
+    The first caller for a key (the leader) runs the function. Callers that
+    arrive with the same key while it is running (followers) wait for the
+    leader and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn, or wait for the identical call that is already running.
+
+        Args:
+            key (str): Identity of the call
+            fn (callable): Function to run if no identical call is in flight
+
+        Returns:
+            tuple: (result, shared) where shared is True for followers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+    def stats(self):
+        """
+        Get coalescing statistics.
+
+        Returns:
+            dict: "leaders", "coalesced" and "in_flight"
+        """
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+class _SharedStream:
+    """
+    Fan out one upstream event stream to any number of subscribers.
+
+    Events are buffered as they are read. Whichever subscriber needs the next
+    event reads it from upstream, so a slow subscriber never holds back the
+    others, and late subscribers replay from the start. When every subscriber
+    has closed its subscription the upstream stream is closed too.
+
+    Only one subscriber at a time reads upstream, under a read lock. The
+    state lock is never held during a read, so subscribing and closing do
+    not wait for the next upstream event.
+    """
+
+    def __init__(self, upstream, on_finished):
+        self._upstream = upstream
+        self._iterator = iter(upstream)
+        self._on_finished = on_finished
+        self._events = []
+        self._finished = False
+        self._abandoned = False
+        self._error = None
+        self._subscribers = 0
+        self._state_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+
+    def subscribe(self):
+        """
+        Returns:
+            _Subscription: A new subscription, or None if every subscriber
+                           has left and the upstream stream was closed
+        """
+        with self._state_lock:
+            if self._abandoned:
+                return None
+            self._subscribers += 1
+        return _Subscription(self)
+
+    def next_event(self, index):
+        # Returns the event at index, reading upstream if it is not buffered yet
+        while True:
+            with self._state_lock:
+                if index < len(self._events):
+                    return self._events[index]
+                if self._error is not None:
+                    raise self._error
+                if self._finished:
+                    raise StopIteration
+
+            with self._read_lock:
+                with self._state_lock:
+                    if index < len(self._events) or self._finished:
+                        # Read by another subscriber while this one waited
+                        continue
+                try:
+                    event = next(self._iterator)
+                except StopIteration:
+                    self._finish()
+                    raise
+                except Exception as e:
+                    if not self._finish(e):
+                        # Closed under the reader after every subscriber left
+                        raise StopIteration from None
+                    raise
+                with self._state_lock:
+                    self._events.append(event)
+
+    def unsubscribe(self):
+        with self._state_lock:
+            self._subscribers -= 1
+            abandoned = self._subscribers == 0 and not self._finished
+            if abandoned:
+                self._finished = True
+                self._abandoned = True
+
+        if abandoned:
+            self._on_finished()
+            # Nobody is reading any more, stop generation upstream. This does
+            # not wait for the read lock, so a blocked read is interrupted
+            if hasattr(self._upstream, "close"):
+                self._upstream.close()
+
+    def _finish(self, error=None):
+        # Returns False if the stream had already finished
+        with self._state_lock:
+            if self._finished:
+                return False
+            self._finished = True
+            self._error = error
+        self._on_finished()
+        return True
+
+
+class _Subscription:
+    """
+    One subscriber's view of a shared stream. close() is safe to call from
+    another thread while the subscriber is blocked reading.
+    """
+
+    def __init__(self, shared):
+        self._shared = shared
+        self._index = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            event = self._shared.next_event(self._index)
+        except BaseException:
+            self.close()
+            raise
+        self._index += 1
+        return event
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._shared.unsubscribe()
+
+
+class SingleFlightClient:
+    """
+    Bedrock client wrapper that coalesces identical concurrent requests.
+
+    Requests are identified by a canonical hash of their arguments. While a
+    request is in flight, identical converse calls wait for its response, and
+    identical converse_stream calls subscribe to the same event stream.
+    Responses and events are shared between callers and must not be mutated.
+
+    Can be passed anywhere a Bedrock client is expected.
+    """
+
+    def __init__(self, client):
+        """
+        Args:
+            client: Bedrock client to wrap
+        """
+        self.client = client
+        self._converse_flight = SingleFlight()
+        self._stream_flight = SingleFlight()
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.streams_coalesced = 0
+
+    def converse(self, **kwargs):
+        response, _ = self._converse_flight.do(
+            request_key("converse", kwargs), self.client.converse, **kwargs
+        )
+        return response
+
+    def converse_stream(self, **kwargs):
+        key = request_key("converse_stream", kwargs)
+
+        while True:
+            with self._lock:
+                entry = self._streams.get(key)
+                if entry is not None:
+                    response, shared = entry
+                    subscription = shared.subscribe()
+                    if subscription is not None:
+                        self.streams_coalesced += 1
+                        return dict(response, stream=subscription)
+
+            # Identical calls arriving while the upstream call is being opened
+            # are coalesced by the single-flight group
+            def start():
+                response = self.client.converse_stream(**kwargs)
+
+                def finished():
+                    with self._lock:
+                        if self._streams.get(key, (None, None))[1] is shared:
+                            del self._streams[key]
+
+                shared = _SharedStream(response.get("stream") or (), finished)
+                # Subscribe before publishing, so a follower closing its
+                # subscription cannot close the stream under the leader
+                subscription = shared.subscribe()
+                with self._lock:
+                    self._streams[key] = (response, shared)
+                return response, shared, subscription
+
+            (response, shared, subscription), coalesced = self._stream_flight.do(
+                key, start
+            )
+            if not coalesced:
+                return dict(response, stream=subscription)
+
+            subscription = shared.subscribe()
+            if subscription is not None:
+                with self._lock:
+                    self.streams_coalesced += 1
+                return dict(response, stream=subscription)
+            # Every subscriber left before this one joined, open a new stream
+
+    def stats(self):
+        """
+        Get coalescing statistics.
+
+        Returns:
+            dict: Counts of upstream and coalesced converse and stream requests
+        """
+        converse = self._converse_flight.stats()
+        streams = self._stream_flight.stats()
+        with self._lock:
+            return {
+                "converse_upstream": converse["leaders"],
+                "converse_coalesced": converse["coalesced"],
+                "streams_upstream": streams["leaders"],
+                "streams_coalesced": self.streams_coalesced,
+            }
+
+    def __getattr__(self, name):
+        # Delegate everything else (meta, other operations) to the wrapped client
+        return getattr(self.client, name)
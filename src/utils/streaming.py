@@ -0,0 +1,224 @@
+import collections
+import threading
+
+
+class CancellationToken:
+    """
+    Thread-safe flag used to cancel a streaming call from another thread.
+
+    Callbacks registered with on_cancel run once, on the thread that calls
+    cancel(), so a blocked stream can be closed immediately instead of at
+    the next event.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """
+        Cancel the token and run the registered callbacks.
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                # Closing an already closed stream must not break cancellation
+                pass
+
+    def on_cancel(self, callback):
+        """
+        Register a callback to run on cancellation. Runs immediately if already cancelled.
+
+        Args:
+            callback (callable): Function taking no arguments
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+class StreamBuffer:
+    """
+    Bounded buffer between a streaming producer and a possibly slow consumer.
+
+    The policy decides what happens when the consumer falls behind:
+
+    - "block": The producer waits until there is room, which in turn stops
+      reading from Bedrock (backpressure).
+    - "coalesce": Pending deltas are merged into the last buffered item, so
+      the producer never waits and no text is lost.
+    - "latest": Only the latest snapshot of the full text is kept and get()
+      returns the full text so far instead of a delta.
+
+    The number of buffered items never exceeds max_items.
+    """
+
+    BLOCK = "block"
+    COALESCE = "coalesce"
+    LATEST = "latest"
+
+    def __init__(self, max_items=64, policy=COALESCE):
+        """
+        Args:
+            max_items (int): Maximum number of buffered items
+            policy (str): "block", "coalesce" or "latest"
+        """
+        if policy not in (self.BLOCK, self.COALESCE, self.LATEST):
+            raise ValueError(f"Unknown buffer policy: {policy}")
+
+        self.max_items = max_items
+        self.policy = policy
+        self._items = collections.deque()
+        self._snapshot = ""
+        self._snapshot_pending = False
+        self._closed = False
+        self._cancelled = False
+        self._error = None
+        self._condition = threading.Condition()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def error(self):
+        return self._error
+
+    def put(self, chunk):
+        """
+        Add a text delta. Can be used directly as the stream_conversation callback.
+
+        Args:
+            chunk (str): Text delta
+
+        Returns:
+            bool: False once the consumer has cancelled, telling the producer to stop
+        """
+        with self._condition:
+            if self.policy == self.BLOCK:
+                self._condition.wait_for(
+                    lambda: len(self._items) < self.max_items or self._cancelled
+                )
+
+            if self._cancelled:
+                return False
+
+            if self.policy == self.LATEST:
+                self._snapshot += chunk
+                self._snapshot_pending = True
+            elif self.policy == self.COALESCE and len(self._items) >= self.max_items:
+                self._items[-1] += chunk
+            else:
+                self._items.append(chunk)
+
+            self._condition.notify_all()
+            return True
+
+    def close(self):
+        """
+        Mark the end of the stream. Buffered items can still be read.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def fail(self, exc):
+        """
+        End the stream with an error from the producer. Buffered items can
+        still be read, then iter_text raises the error.
+
+        Args:
+            exc (BaseException): Exception raised by the producer
+        """
+        with self._condition:
+            self._error = exc
+            self._closed = True
+            self._condition.notify_all()
+
+    def cancel(self):
+        """
+        Stop the stream from the consumer side. Unblocks a waiting producer.
+        """
+        with self._condition:
+            self._cancelled = True
+            self._items.clear()
+            self._condition.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Get the next item, waiting for one if necessary.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait
+
+        Returns:
+            str: The next delta (or full text for "latest"), or None at the end
+                 of the stream or on timeout
+        """
+        with self._condition:
+            self._condition.wait_for(self._readable, timeout)
+
+            if self.policy == self.LATEST:
+                if not self._snapshot_pending:
+                    return None
+                self._snapshot_pending = False
+                return self._snapshot
+
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def _readable(self):
+        if self._closed or self._cancelled:
+            return True
+        if self.policy == self.LATEST:
+            return self._snapshot_pending
+        return bool(self._items)
+
+    def finished(self):
+        """
+        Check whether the stream has ended and everything has been read.
+        """
+        with self._condition:
+            if self._cancelled:
+                return True
+            if self.policy == self.LATEST:
+                return self._closed and not self._snapshot_pending
+            return self._closed and not self._items
+
+    def iter_text(self):
+        """
+        Iterate over the full text received so far, once per read.
+
+        Yields:
+            str: Accumulated text
+
+        Raises:
+            Exception: The producer's error passed to fail(), once everything
+                before it has been read
+        """
+        text = ""
+        while not self.finished():
+            item = self.get()
+            if item is None:
+                continue
+            text = item if self.policy == self.LATEST else text + item
+            yield text
+        if self._error is not None and not self._cancelled:
+            raise self._error
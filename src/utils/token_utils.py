@@ -0,0 +1,243 @@
+import json
+import math
+import struct
+
+from .models import get_model_limits
+
+# Average characters per token for English text
+CHARS_PER_TOKEN = 4
+
+# Fixed per-message overhead for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Images are billed by pixel count and downscaled to this longest side
+IMAGE_PIXELS_PER_TOKEN = 750
+IMAGE_MAX_DIMENSION = 1568
+IMAGE_FALLBACK_TOKENS = 1600
+
+# Rough rate for video, which cannot be sized without decoding
+VIDEO_TOKENS_PER_MB = 3000
+
+# Output length assumed for cost prediction when maxTokens is not set
+DEFAULT_EXPECTED_OUTPUT_TOKENS = 500
+
+# JPEG start-of-frame markers, which carry the image dimensions
+_JPEG_SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF
+}
+
+
+class ContextWindowExceededError(ValueError):
+    """
+    Raised when a request is estimated not to fit in the model's context window.
+    """
+
+
+def estimate_text_tokens(text):
+    """
+    Estimate the number of tokens in a piece of text.
+
+    Multi-byte characters (accents, CJK, emoji) tokenize less efficiently than
+    ASCII, so they are weighted by their UTF-8 length.
+
+    Args:
+        text (str): Text to estimate
+
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    if text.isascii():
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return math.ceil(len(text.encode("utf-8")) / CHARS_PER_TOKEN)
+
+
+def image_dimensions(image_bytes):
+    """
+    Read the width and height of a PNG, JPEG, GIF or WebP image from its header.
+
+    Args:
+        image_bytes (bytes): Encoded image
+
+    Returns:
+        tuple: (width, height), or None if the format is not recognised
+    """
+    data = image_bytes
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8X":
+            width = int.from_bytes(data[24:27], "little") + 1
+            height = int.from_bytes(data[27:30], "little") + 1
+            return width, height
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+    if data[:2] == b"\xff\xd8":
+        # Walk the JPEG segments until a start-of-frame marker
+        offset = 2
+        while offset + 9 < len(data):
+            if data[offset] != 0xFF:
+                offset += 1
+                continue
+            marker = data[offset + 1]
+            if marker in _JPEG_SOF_MARKERS:
+                height, width = struct.unpack(">HH", data[offset + 5 : offset + 9])
+                return width, height
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                offset += 2
+                continue
+            segment_length = struct.unpack(">H", data[offset + 2 : offset + 4])[0]
+            offset += 2 + segment_length
+    return None
+
+
+def estimate_image_tokens(image_bytes):
+    """
+    Estimate the tokens used by an image from its pixel dimensions.
+
+    Args:
+        image_bytes (bytes): Encoded image
+
+    Returns:
+        int: Estimated token count
+    """
+    dimensions = image_dimensions(image_bytes)
+    if not dimensions:
+        return IMAGE_FALLBACK_TOKENS
+
+    width, height = dimensions
+    scale = min(1.0, IMAGE_MAX_DIMENSION / max(width, height, 1))
+    return math.ceil((width * scale) * (height * scale) / IMAGE_PIXELS_PER_TOKEN)
+
+
+def estimate_content_tokens(content):
+    """
+    Estimate the tokens in a list of Converse content blocks.
+
+    Args:
+        content (list): Content blocks (text, image, video, document, toolUse, toolResult)
+
+    Returns:
+        int: Estimated token count
+    """
+    tokens = 0
+    for block in content:
+        if "text" in block:
+            tokens += estimate_text_tokens(block["text"])
+        elif "image" in block:
+            source = block["image"].get("source", {})
+            if "bytes" in source:
+                tokens += estimate_image_tokens(source["bytes"])
+            else:
+                tokens += IMAGE_FALLBACK_TOKENS
+        elif "video" in block:
+            source = block["video"].get("source", {})
+            size_mb = len(source.get("bytes", b"")) / (1024 * 1024)
+            tokens += math.ceil(size_mb * VIDEO_TOKENS_PER_MB)
+        elif "document" in block:
+            source = block["document"].get("source", {})
+            tokens += math.ceil(len(source.get("bytes", b"")) / CHARS_PER_TOKEN)
+        elif "toolUse" in block:
+            tokens += estimate_text_tokens(json.dumps(block["toolUse"].get("input", {})))
+        elif "toolResult" in block:
+            tokens += estimate_content_tokens(block["toolResult"].get("content", []))
+    return tokens
+
+
+def estimate_message_tokens(messages, system=None):
+    """
+    Estimate the input tokens of a Converse request.
+
+    Args:
+        messages (list): Converse messages
+        system (list, optional): Converse system content blocks
+
+    Returns:
+        int: Estimated input token count
+    """
+    tokens = estimate_content_tokens(system) if system else 0
+    for message in messages:
+        tokens += MESSAGE_OVERHEAD_TOKENS + estimate_content_tokens(message["content"])
+    return tokens
+
+
+def estimate_cost(model_id, input_tokens, output_tokens):
+    """
+    Estimate the on-demand price of a request.
+
+    Args:
+        model_id (str): Model ID
+        input_tokens (int): Input token count
+        output_tokens (int): Output token count
+
+    Returns:
+        float: Estimated cost in USD
+    """
+    limits = get_model_limits(model_id)
+    return (
+        input_tokens / 1000 * limits["input_price"]
+        + output_tokens / 1000 * limits["output_price"]
+    )
+
+
+def estimate_request(model_id, messages, system=None, max_tokens=None):
+    """
+    Estimate the size and cost of a Converse request before sending it.
+
+    Args:
+        model_id (str): Model ID
+        messages (list): Converse messages
+        system (list, optional): Converse system content blocks
+        max_tokens (int, optional): maxTokens that will be sent with the request
+
+    Returns:
+        dict: "input_tokens", "output_tokens" (reserved for the response),
+              "context_window", "fits" and "estimated_cost"
+    """
+    limits = get_model_limits(model_id)
+    input_tokens = estimate_message_tokens(messages, system)
+    output_tokens = max_tokens or min(
+        DEFAULT_EXPECTED_OUTPUT_TOKENS, limits["max_output_tokens"]
+    )
+
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "context_window": limits["context_window"],
+        "fits": input_tokens + output_tokens <= limits["context_window"],
+        "estimated_cost": estimate_cost(model_id, input_tokens, output_tokens),
+    }
+
+
+def check_context_budget(model_id, messages, system=None, max_tokens=None):
+    """
+    Check that a request fits in the model's context window.
+
+    Args:
+        model_id (str): Model ID
+        messages (list): Converse messages
+        system (list, optional): Converse system content blocks
+        max_tokens (int, optional): maxTokens that will be sent with the request
+
+    Returns:
+        dict: The estimate from estimate_request
+
+    Raises:
+        ContextWindowExceededError: If the request is estimated not to fit
+    """
+    estimate = estimate_request(model_id, messages, system, max_tokens)
+    if not estimate["fits"]:
+        raise ContextWindowExceededError(
+            f"Request needs about {estimate['input_tokens']} input + "
+            f"{estimate['output_tokens']} output tokens, but {model_id} has a "
+            f"context window of {estimate['context_window']} tokens"
+        )
+    return estimate
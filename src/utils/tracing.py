@@ -0,0 +1,383 @@
+import collections
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    """
+    A timed operation with attributes, part of a tree of spans.
+    """
+
+    def __init__(self, tracer, name, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = next(_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.attributes = dict(attributes)
+        self.thread_id = threading.get_ident()
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+            self.tracer._finish(self)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc is not None:
+            self.set_attributes(error=f"{exc_type.__name__}: {exc}")
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "thread_id": self.thread_id,
+            "attributes": self.attributes,
+        }
+
+
+class _NoOpSpan:
+    """
+    Span returned while tracing is disabled. Every method does nothing.
+    """
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoOpSpan()
+
+
+class Tracer:
+    """
+    Collects spans in memory and exports them as JSON or Chrome trace files.
+
+    Disabled tracers hand out a shared no-op span, so instrumented code costs
+    a single attribute check when tracing is off.
+    """
+
+    def __init__(self, enabled=False, max_spans=100000):
+        """
+        Args:
+            enabled (bool): Whether spans are recorded
+            max_spans (int): Maximum number of finished spans kept, oldest dropped first
+        """
+        self.enabled = enabled
+        self._spans = collections.deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def span(self, name, **attributes):
+        """
+        Start a span, a child of the current span if there is one.
+
+        Use as a context manager so it becomes the current span:
+
+            with tracer.span("classify", model=NOVA_LITE) as span:
+                span.set_attribute("category", category)
+
+        Args:
+            name (str): Span name
+            **attributes: Initial attributes
+
+        Returns:
+            Span: The span, or a no-op span when tracing is disabled
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    def _finish(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self):
+        """
+        Get the finished spans, in the order they ended.
+        """
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def export_json(self, path):
+        """
+        Write the finished spans to a JSON file.
+
+        Args:
+            path (str): Output file
+
+        Returns:
+            int: Number of spans written
+        """
+        spans = [span.to_dict() for span in self.spans()]
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(spans, file, indent=2, default=str)
+        return len(spans)
+
+    def export_chrome_trace(self, path):
+        """
+        Write the finished spans in Chrome trace event format. Open the file
+        in chrome://tracing or https://ui.perfetto.dev to see the timeline.
+
+        Args:
+            path (str): Output file
+
+        Returns:
+            int: Number of spans written
+        """
+        spans = self.spans()
+        events = [
+            {
+                "name": span.name,
+                "cat": "bedrock",
+                "ph": "X",
+                "ts": span.start_time * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": os.getpid(),
+                "tid": span.thread_id,
+                "args": dict(
+                    span.attributes,
+                    span_id=span.span_id,
+                    parent_id=span.parent_id,
+                    trace_id=span.trace_id,
+                ),
+            }
+            for span in spans
+        ]
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events}, file, default=str)
+        return len(events)
+
+
+_default_tracer = Tracer(enabled=os.environ.get("BEDROCK_TRACING", "") == "1")
+
+
+def get_tracer():
+    """
+    Get the process-wide tracer, enabled when BEDROCK_TRACING=1 is set.
+    """
+    return _default_tracer
+
+
+def current_span():
+    """
+    Get the current span, or a no-op span outside of any span.
+    """
+    return _current_span.get() or _NOOP_SPAN
+
+
+def current_call_span():
+    """
+    Get the span of the Converse call being made by a TracingClient, or a
+    no-op span. Client wrappers annotate this span, so their attributes do
+    not end up on an unrelated span when there is no TracingClient.
+    """
+    span = _current_span.get()
+    if span is None or span.name not in ("converse", "converse_stream"):
+        return _NOOP_SPAN
+    return span
+
+
+def traced(name=None, tracer=None):
+    """
+    Decorator that runs a function inside a span.
+
+    Args:
+        name (str, optional): Span name. Default is the function name
+        tracer (Tracer, optional): Default is the process-wide tracer
+    """
+
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            active = tracer or _default_tracer
+            if not active.enabled:
+                return fn(*args, **kwargs)
+            with active.span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def propagate(fn):
+    """
+    Bind a function to the current tracing context, so spans it starts on
+    another thread (e.g. in a ThreadPoolExecutor) are children of the current span.
+
+    Args:
+        fn (callable): Function to bind
+
+    Returns:
+        callable: Function running fn in a copy of the current context
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+class _TracedStream:
+    """
+    Event stream that ends its span when exhausted or closed, recording the
+    time to the first event and token usage.
+    """
+
+    def __init__(self, stream, span):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._span = span
+        self._first_event = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            event = next(self._iterator)
+        except BaseException:
+            self._span.end()
+            raise
+
+        if self._first_event:
+            self._first_event = False
+            self._span.set_attribute(
+                "time_to_first_event", time.perf_counter() - self._span._start
+            )
+        if "messageStop" in event:
+            self._span.set_attribute(
+                "stop_reason", event["messageStop"].get("stopReason")
+            )
+        if "metadata" in event:
+            _record_usage(self._span, event["metadata"])
+        return event
+
+    def close(self):
+        self._span.set_attribute("closed_early", self._span.duration is None)
+        self._span.end()
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
+
+def _record_usage(span, response):
+    usage = response.get("usage") or {}
+    span.set_attributes(
+        input_tokens=usage.get("inputTokens"),
+        output_tokens=usage.get("outputTokens"),
+    )
+    latency_ms = (response.get("metrics") or {}).get("latencyMs")
+    if latency_ms is not None:
+        span.set_attribute("service_seconds", latency_ms / 1000)
+
+
+class TracingClient:
+    """
+    Bedrock client wrapper that records a span per Converse call.
+
+    Spans carry the model, token usage, stop reason and the service-side
+    latency reported by Bedrock; the rest of the span duration is network and
+    client time. Wrappers underneath (ScheduledClient, RegionPool,
+    CircuitBreakerClient) add queue wait, region and fallback attributes to
+    the same span. Streams are traced until fully read or closed.
+
+    Can be passed anywhere a Bedrock client is expected.
+    """
+
+    def __init__(self, client, tracer=None):
+        """
+        Args:
+            client: Bedrock client to wrap
+            tracer (Tracer, optional): Default is the process-wide tracer
+        """
+        self.client = client
+        self.tracer = tracer or _default_tracer
+
+    def converse(self, **kwargs):
+        if not self.tracer.enabled:
+            return self.client.converse(**kwargs)
+
+        with self.tracer.span("converse", model=kwargs.get("modelId")) as span:
+            response = self.client.converse(**kwargs)
+            span.set_attribute("stop_reason", response.get("stopReason"))
+            _record_usage(span, response)
+            if "service_seconds" in span.attributes:
+                # Time queued in a ScheduledClient underneath is not network time
+                elapsed = time.perf_counter() - span._start
+                span.set_attribute(
+                    "network_seconds",
+                    elapsed
+                    - span.attributes["service_seconds"]
+                    - span.attributes.get("queue_wait_seconds", 0.0),
+                )
+            return response
+
+    def converse_stream(self, **kwargs):
+        if not self.tracer.enabled:
+            return self.client.converse_stream(**kwargs)
+
+        span = self.tracer.span("converse_stream", model=kwargs.get("modelId"))
+        # The span is current only while opening, so wrappers can annotate it
+        token = _current_span.set(span)
+        try:
+            response = self.client.converse_stream(**kwargs)
+        except Exception as exc:
+            span.set_attribute("error", f"{type(exc).__name__}: {exc}")
+            span.end()
+            raise
+        finally:
+            _current_span.reset(token)
+
+        return dict(response, stream=_TracedStream(response.get("stream") or (), span))
+
+    def __getattr__(self, name):
+        # Delegate everything else (meta, other operations) to the wrapped client
+        return getattr(self.client, name)
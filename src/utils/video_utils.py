@@ -0,0 +1,456 @@
+import concurrent.futures
+import heapq
+import itertools
+
+from .bedrock_converse_utils import (
+    NOVA_LITE,
+    MAX_IMAGES_PER_REQUEST,
+    text_completion,
+)
+from .inference_config import build_inference_config, record_stop_reason
+from .request_template import extract_text
+
+# Default prompt used to merge per-segment answers into a single answer
+MERGE_PROMPT = """
+The following are analyses of consecutive segments of the same video, in order.
+Combine them into a single coherent answer to the original question.
+
+Original question: {prompt}
+
+Segment analyses:
+{segments}
+"""
+
+# Trailing segments shorter than this are folded into the previous segment,
+# a few milliseconds of video may not decode to any frame at all
+MIN_SEGMENT_SECONDS = 1.0
+
+
+def _import_cv2():
+    """
+    Import OpenCV lazily so the rest of the utilities work without it.
+
+    Returns:
+        module: The cv2 module
+    """
+    try:
+        import cv2
+    except ImportError as e:
+        raise ImportError(
+            "Local video frame extraction requires OpenCV. "
+            "Install it with: pip install opencv-python-headless"
+        ) from e
+    return cv2
+
+
+def get_video_duration(video_path):
+    """
+    Get the duration of a video file in seconds.
+
+    Args:
+        video_path (str): Path to the video file
+
+    Returns:
+        float: Duration in seconds
+    """
+    cv2 = _import_cv2()
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+    finally:
+        capture.release()
+
+    if fps <= 0:
+        raise ValueError(f"Could not determine frame rate of video: {video_path}")
+
+    return frame_count / fps
+
+
+def _encode_frame(cv2, frame, image_format, max_dimension):
+    """
+    Resize a decoded frame to fit within max_dimension and encode it.
+
+    Returns:
+        bytes: Encoded image bytes
+    """
+    if max_dimension:
+        height, width = frame.shape[:2]
+        scale = max_dimension / max(height, width)
+        if scale < 1:
+            frame = cv2.resize(
+                frame,
+                (int(width * scale), int(height * scale)),
+                interpolation=cv2.INTER_AREA,
+            )
+
+    extension = ".png" if image_format == "png" else ".jpg"
+    params = [] if image_format == "png" else [cv2.IMWRITE_JPEG_QUALITY, 85]
+    ok, encoded = cv2.imencode(extension, frame, params)
+    if not ok:
+        raise ValueError("Failed to encode video frame")
+
+    return encoded.tobytes()
+
+
+def _frame_histogram(cv2, frame):
+    """
+    Compute a normalised grayscale histogram of a downscaled frame.
+    """
+    small = cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    histogram = cv2.calcHist([gray], [0], None, [32], [0, 256])
+    return cv2.normalize(histogram, histogram).flatten()
+
+
+def extract_video_frames(
+    video_path,
+    interval_seconds=None,
+    max_frames=MAX_IMAGES_PER_REQUEST,
+    keyframes=False,
+    scene_threshold=0.2,
+    sample_fps=2,
+    start_seconds=0,
+    end_seconds=None,
+    image_format="jpeg",
+    max_dimension=1024,
+):
+    """
+    Extract still frames from a video locally.
+
+    By default frames are spread evenly across the time range. With
+    interval_seconds a frame is taken every N seconds, and with keyframes=True
+    frames are taken where the scene changes noticeably. Slots not used by
+    scene changes are filled with evenly spaced frames, so a static video
+    still returns max_frames frames.
+
+    Args:
+        video_path (str): Path to the video file
+        interval_seconds (float, optional): Take one frame every N seconds
+        max_frames (int): Maximum number of frames to return
+        keyframes (bool): Select frames at scene changes instead of fixed times
+        scene_threshold (float): Histogram distance (0-1) that counts as a scene change
+        sample_fps (float): Frames per second inspected when detecting keyframes
+        start_seconds (float): Start of the time range to sample
+        end_seconds (float, optional): End of the time range. Default is the end of the video
+        image_format (str): "jpeg" or "png"
+        max_dimension (int, optional): Longest side of the returned frames in pixels
+
+    Returns:
+        list: Dicts with "timestamp", "format" and "bytes" keys, in time order
+    """
+    cv2 = _import_cv2()
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        if fps <= 0:
+            raise ValueError(f"Could not determine frame rate of video: {video_path}")
+
+        duration = (capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0) / fps
+        if end_seconds is None or end_seconds > duration:
+            end_seconds = duration
+
+        if keyframes:
+            selected = _select_keyframes(
+                cv2,
+                capture,
+                fps,
+                start_seconds,
+                end_seconds,
+                max_frames,
+                scene_threshold,
+                sample_fps,
+            )
+        else:
+            selected = _select_fixed_frames(
+                cv2, capture, start_seconds, end_seconds, max_frames, interval_seconds
+            )
+    finally:
+        capture.release()
+
+    return [
+        {
+            "timestamp": timestamp,
+            "format": image_format,
+            "bytes": _encode_frame(cv2, frame, image_format, max_dimension),
+        }
+        for timestamp, frame in selected
+    ]
+
+
+def _select_fixed_frames(
+    cv2, capture, start_seconds, end_seconds, max_frames, interval_seconds
+):
+    """
+    Seek to fixed timestamps and decode one frame at each.
+    """
+    span = max(end_seconds - start_seconds, 0)
+
+    if interval_seconds:
+        timestamps = []
+        timestamp = start_seconds
+        while timestamp < end_seconds and len(timestamps) < max_frames:
+            timestamps.append(timestamp)
+            timestamp += interval_seconds
+    else:
+        # Spread frames evenly, sampling the middle of each slice
+        step = span / max_frames
+        timestamps = [start_seconds + step * (i + 0.5) for i in range(max_frames)]
+
+    return _read_frames_at(cv2, capture, timestamps)
+
+
+def _read_frames_at(cv2, capture, timestamps):
+    """
+    Seek to each timestamp and decode one frame there.
+    """
+    frames = []
+    for timestamp in timestamps:
+        capture.set(cv2.CAP_PROP_POS_MSEC, timestamp * 1000)
+        ok, frame = capture.read()
+        if ok:
+            frames.append((timestamp, frame))
+
+    return frames
+
+
+def _select_keyframes(
+    cv2,
+    capture,
+    fps,
+    start_seconds,
+    end_seconds,
+    max_frames,
+    scene_threshold,
+    sample_fps,
+):
+    """
+    Scan the time range and keep the frames with the largest scene changes,
+    then fill any remaining slots with evenly spaced frames.
+    """
+    capture.set(cv2.CAP_PROP_POS_MSEC, start_seconds * 1000)
+    frame_index = int(start_seconds * fps)
+    last_frame_index = int(end_seconds * fps)
+    stride = max(int(round(fps / sample_fps)), 1)
+
+    # Min-heap of the strongest scene changes so far, so at most max_frames
+    # decoded frames are held however long the video is
+    candidates = []
+    sequence = itertools.count()
+    reference_histogram = None
+
+    while frame_index < last_frame_index:
+        # grab() skips decoding, only sampled frames are fully decoded
+        if not capture.grab():
+            break
+        if (frame_index - int(start_seconds * fps)) % stride == 0:
+            ok, frame = capture.retrieve()
+            if ok:
+                histogram = _frame_histogram(cv2, frame)
+                if reference_histogram is None:
+                    distance = 1.0
+                else:
+                    # Compare against the last kept frame so slow drift also counts
+                    distance = cv2.compareHist(
+                        reference_histogram, histogram, cv2.HISTCMP_BHATTACHARYYA
+                    )
+                if distance >= scene_threshold or reference_histogram is None:
+                    reference_histogram = histogram
+                    candidate = (distance, next(sequence), frame_index / fps, frame)
+                    if len(candidates) < max_frames:
+                        heapq.heappush(candidates, candidate)
+                    else:
+                        heapq.heappushpop(candidates, candidate)
+        frame_index += 1
+
+    selected = [(timestamp, frame) for _, _, timestamp, frame in candidates]
+    missing = max_frames - len(selected)
+    if missing > 0 and end_seconds > start_seconds:
+        # Fill the evenly spaced slots that have no keyframe, spread over the range
+        step = (end_seconds - start_seconds) / max_frames
+        occupied = {
+            min(int((timestamp - start_seconds) / step), max_frames - 1)
+            for timestamp, _ in selected
+        }
+        empty = [slot for slot in range(max_frames) if slot not in occupied]
+        slots = [empty[int((i + 0.5) * len(empty) / missing)] for i in range(missing)]
+        selected += _read_frames_at(
+            cv2, capture, [start_seconds + step * (slot + 0.5) for slot in slots]
+        )
+
+    return sorted(selected, key=lambda item: item[0])
+
+
+def _build_frame_content(prompt, frames):
+    """
+    Build a Converse content list with the prompt followed by labelled frames.
+    """
+    content = [{"text": prompt}]
+    for frame in frames:
+        content.append({"text": f"Frame at {frame['timestamp']:.1f}s:"})
+        content.append(
+            {"image": {"format": frame["format"], "source": {"bytes": frame["bytes"]}}}
+        )
+    return content
+
+
+def invoke_with_video_frames(
+    client,
+    prompt,
+    video_path,
+    model_id=NOVA_LITE,
+    temperature=0,
+    interval_seconds=None,
+    max_frames=MAX_IMAGES_PER_REQUEST,
+    keyframes=False,
+    start_seconds=0,
+    end_seconds=None,
+    max_tokens=None,
+):
+    """
+    Invoke a model with frames sampled locally from a video instead of the full video.
+
+    Args:
+        client: Bedrock client
+        prompt (str): Text prompt about the video
+        video_path (str): Path to the video file
+        model_id (str): Model ID to use
+        temperature (float): Controls randomness (0-1)
+        interval_seconds (float, optional): Take one frame every N seconds
+        max_frames (int): Maximum number of frames to send
+        keyframes (bool): Send frames at scene changes instead of fixed times
+        start_seconds (float): Start of the time range to sample
+        end_seconds (float, optional): End of the time range
+        max_tokens (int, optional): Maximum number of output tokens
+
+    Returns:
+        str: Model's text response
+    """
+    frames = extract_video_frames(
+        video_path,
+        interval_seconds=interval_seconds,
+        max_frames=max_frames,
+        keyframes=keyframes,
+        start_seconds=start_seconds,
+        end_seconds=end_seconds,
+    )
+    if not frames:
+        raise ValueError(f"No frames could be extracted from video: {video_path}")
+
+    response = client.converse(
+        modelId=model_id,
+        messages=[{"role": "user", "content": _build_frame_content(prompt, frames)}],
+        inferenceConfig=build_inference_config(temperature, max_tokens),
+    )
+    record_stop_reason(model_id, response.get("stopReason"), max_tokens)
+
+    return extract_text(response)
+
+
+def analyze_video_in_segments(
+    client,
+    prompt,
+    video_path,
+    model_id=NOVA_LITE,
+    temperature=0,
+    segment_seconds=60,
+    frames_per_segment=10,
+    keyframes=False,
+    max_workers=4,
+    merge_prompt=MERGE_PROMPT,
+    merge_model_id=None,
+):
+    """
+    Analyse a long video by splitting it into segments that are processed concurrently.
+
+    Each segment is sampled locally and sent as a separate request, so request
+    size stays bounded and wall-clock time scales with the number of workers.
+    The per-segment answers are then merged with one final text request.
+
+    Args:
+        client: Bedrock client
+        prompt (str): Question to answer about the video
+        video_path (str): Path to the video file
+        model_id (str): Model ID to use for segment analysis
+        temperature (float): Controls randomness (0-1)
+        segment_seconds (float): Length of each segment in seconds
+        frames_per_segment (int): Maximum number of frames sent per segment
+        keyframes (bool): Sample frames at scene changes instead of fixed times
+        max_workers (int): Number of segments analysed concurrently
+        merge_prompt (str, optional): Template with {prompt} and {segments} placeholders.
+            Pass None to skip the merge step
+        merge_model_id (str, optional): Model ID for the merge step. Default is model_id
+
+    Returns:
+        dict: "segments" (list of dicts with "start", "end" and "response", plus
+              "error" for segments that yielded no frames) and "summary"
+              (merged answer, or None when merging is skipped)
+    """
+    duration = get_video_duration(video_path)
+
+    boundaries = []
+    start = 0.0
+    while start < duration:
+        boundaries.append((start, min(start + segment_seconds, duration)))
+        start += segment_seconds
+    if not boundaries:
+        raise ValueError(f"Video has no frames to analyse: {video_path}")
+    if len(boundaries) > 1 and boundaries[-1][1] - boundaries[-1][0] < MIN_SEGMENT_SECONDS:
+        tail = boundaries.pop()
+        boundaries[-1] = (boundaries[-1][0], tail[1])
+
+    def analyze_segment(segment):
+        segment_start, segment_end = segment
+        segment_prompt = (
+            f"{prompt}\n\nThese frames cover {segment_start:.0f}s to "
+            f"{segment_end:.0f}s of a {duration:.0f}s video."
+        )
+        segment = {"start": segment_start, "end": segment_end, "response": None}
+        try:
+            segment["response"] = invoke_with_video_frames(
+                client,
+                segment_prompt,
+                video_path,
+                model_id=model_id,
+                temperature=temperature,
+                max_frames=frames_per_segment,
+                keyframes=keyframes,
+                start_seconds=segment_start,
+                end_seconds=segment_end,
+            )
+        except ValueError as e:
+            # A segment without decodable frames must not lose the others
+            segment["error"] = str(e)
+        return segment
+
+    # Frame decoding and the model calls both run inside the workers
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        segments = list(executor.map(analyze_segment, boundaries))
+
+    analysed = [s for s in segments if s["response"] is not None]
+    if not analysed:
+        raise ValueError(f"No frames could be extracted from video: {video_path}")
+
+    summary = None
+    if merge_prompt:
+        if len(analysed) == 1:
+            summary = analysed[0]["response"]
+        else:
+            segment_text = "\n\n".join(
+                f"[{s['start']:.0f}s - {s['end']:.0f}s]\n{s['response']}"
+                for s in analysed
+            )
+            summary = text_completion(
+                client,
+                merge_prompt.format(prompt=prompt, segments=segment_text),
+                model_id=merge_model_id or model_id,
+                temperature=temperature,
+            )
+
+    return {"segments": segments, "summary": summary}
@@ -0,0 +1,209 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from .models import NOVA_LITE
+
+
+def _unwrap(client):
+    # Wrappers (ScheduledClient, SingleFlightClient, TracingClient, ...) keep
+    # the wrapped client in .client; warm-up requests must bypass them
+    while "client" in vars(client):
+        client = client.client
+    return client
+
+
+def _warm_up_request(model_id):
+    # An empty conversation is rejected by Bedrock with a ValidationException
+    # before any model runs: a full signed round trip that costs no tokens
+    return {"modelId": model_id, "messages": []}
+
+
+def _ping_error(exc):
+    if isinstance(exc, ClientError):
+        code = exc.response.get("Error", {}).get("Code")
+        if code == "ValidationException":
+            # Expected, the connection is open and the request was accepted
+            return None
+        # e.g. AccessDeniedException or UnrecognizedClientException: the
+        # connection is open, but real requests will fail the same way
+        return f"{code}: {exc}"
+    return f"{type(exc).__name__}: {exc}"
+
+
+def _ping(client, model_id):
+    try:
+        client.converse(**_warm_up_request(model_id))
+    except Exception as exc:
+        return _ping_error(exc)
+    return None
+
+
+def warm_up_client(client, connections=1, model_id=NOVA_LITE):
+    """
+    Resolve credentials and the endpoint and open pooled connections ahead of time.
+
+    Sends connections concurrent requests that Bedrock rejects during
+    validation, so each one opens its own TLS connection in the pool without
+    running a model. Call it at startup so the first real request does not
+    pay for the handshakes.
+
+    Args:
+        client: Bedrock client, or a wrapper around one
+        connections (int): Number of connections to open, at most the client's
+            max_pool_connections
+        model_id (str): Model ID used in the warm-up requests
+
+    Returns:
+        dict: "connections" warmed, "seconds" taken and any "errors"
+              (e.g. missing credentials, denied model access or an
+              unreachable endpoint)
+    """
+    client = _unwrap(client)
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+        results = list(
+            executor.map(lambda _: _ping(client, model_id), range(connections))
+        )
+    errors = [error for error in results if error]
+    return {
+        "connections": connections - len(errors),
+        "seconds": time.perf_counter() - start,
+        "errors": errors,
+    }
+
+
+async def async_warm_up_client(client, connections=1, model_id=NOVA_LITE):
+    """
+    Async version of warm_up_client for clients from create_async_bedrock_client.
+
+    Returns:
+        dict: "connections" opened, "seconds" taken and any "errors"
+    """
+    client = _unwrap(client)
+
+    async def ping():
+        try:
+            await client.converse(**_warm_up_request(model_id))
+        except Exception as exc:
+            return _ping_error(exc)
+        return None
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(ping() for _ in range(connections)))
+    errors = [error for error in results if error]
+    return {
+        "connections": connections - len(errors),
+        "seconds": time.perf_counter() - start,
+        "errors": errors,
+    }
+
+
+class KeepAlive:
+    """
+    Background thread that re-warms a client's connections at a fixed interval,
+    so pooled connections survive lulls between bursts of traffic.
+
+    Use as a context manager, or call start() and stop().
+    """
+
+    def __init__(self, client, interval_seconds=60, connections=1, model_id=NOVA_LITE):
+        """
+        Args:
+            client: Bedrock client, or a wrapper around one
+            interval_seconds (float): Seconds between keep-alive rounds. Keep it
+                below the idle timeout of the connections (about a few minutes)
+            connections (int): Number of connections kept warm
+            model_id (str): Model ID used in the keep-alive requests
+        """
+        self.client = client
+        self.interval_seconds = interval_seconds
+        self.connections = connections
+        self.model_id = model_id
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.last_result = warm_up_client(
+                self.client, self.connections, self.model_id
+            )
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+        return False
+
+
+class AsyncKeepAlive:
+    """
+    Async version of KeepAlive for clients from create_async_bedrock_client.
+    Runs as a task on the event loop that owns the client.
+
+    Use as an async context manager, or call start() and await stop().
+    """
+
+    def __init__(self, client, interval_seconds=60, connections=1, model_id=NOVA_LITE):
+        """
+        Args:
+            client: Async Bedrock client, or a wrapper around one
+            interval_seconds (float): Seconds between keep-alive rounds
+            connections (int): Number of connections kept warm
+            model_id (str): Model ID used in the keep-alive requests
+        """
+        self.client = client
+        self.interval_seconds = interval_seconds
+        self.connections = connections
+        self.model_id = model_id
+        self.last_result = None
+        self._task = None
+
+    def start(self):
+        """
+        Start the keep-alive task. Must be called from the client's event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            self.last_result = await async_warm_up_client(
+                self.client, self.connections, self.model_id
+            )
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.stop()
+        return False
@@ -0,0 +1,81 @@
+import asyncio
+
+from src.utils.async_bedrock import AsyncSingleFlightClient
+
+TOKENS = [f"t{i} " for i in range(5)]
+
+
+class FakeEventStream:
+    def __init__(self):
+        self.closed = False
+
+    async def __aiter__(self):
+        for token in TOKENS:
+            await asyncio.sleep(0.01)
+            yield {"contentBlockDelta": {"delta": {"text": token}}}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.calls = 0
+        self.streams = []
+
+    async def converse_stream(self, **kwargs):
+        self.calls += 1
+        stream = FakeEventStream()
+        self.streams.append(stream)
+        return {"stream": stream}
+
+
+async def read_text(response, received):
+    stream = response["stream"]
+    try:
+        async for event in stream:
+            received.append(event["contentBlockDelta"]["delta"]["text"])
+    finally:
+        stream.close()
+
+
+def test_follower_receives_full_stream_when_leader_is_cancelled():
+    async def run():
+        client = AsyncSingleFlightClient(FakeAsyncClient())
+        leader = await client.converse_stream(modelId="m", messages=[])
+        follower = await client.converse_stream(modelId="m", messages=[])
+
+        leader_text, follower_text = [], []
+        leader_task = asyncio.ensure_future(read_text(leader, leader_text))
+        follower_task = asyncio.ensure_future(read_text(follower, follower_text))
+
+        await asyncio.sleep(0.025)
+        leader_task.cancel()
+        await follower_task
+
+        assert client.client.calls == 1
+        assert client.coalesced == 1
+        assert follower_text == TOKENS
+        assert len(leader_text) < len(TOKENS)
+
+    asyncio.run(run())
+
+
+def test_subscribe_after_abandon_opens_new_stream():
+    async def run():
+        client = AsyncSingleFlightClient(FakeAsyncClient())
+        first = await client.converse_stream(modelId="m", messages=[])
+        first_task = asyncio.ensure_future(read_text(first, []))
+        await asyncio.sleep(0.015)
+        first_task.cancel()
+        await asyncio.sleep(0)
+        assert client.client.streams[0].closed
+
+        received = []
+        second = await client.converse_stream(modelId="m", messages=[])
+        await read_text(second, received)
+
+        assert client.client.calls == 2
+        assert received == TOKENS
+
+    asyncio.run(run())
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+pytest.importorskip("cv2")
+
+from src.utils import video_utils
+from src.utils.video_utils import analyze_video_in_segments, get_video_duration
+
+VIDEO_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "video.mp4")
+
+
+class FakeClient:
+    def __init__(self):
+        self.requests = []
+
+    def converse(self, **kwargs):
+        self.requests.append(kwargs)
+        content = kwargs["messages"][0]["content"]
+        frames = sum("image" in block for block in content)
+        return {
+            "output": {"message": {"content": [{"text": f"{frames} frames"}]}},
+            "stopReason": "end_turn",
+        }
+
+
+@pytest.mark.parametrize("keyframes", [False, True])
+def test_short_tail_is_merged_into_previous_segment(keyframes):
+    # assets/video.mp4 is just over 19.92s long, leaving a few milliseconds
+    duration = get_video_duration(VIDEO_PATH)
+    segment_seconds = 19.92
+    assert 0 < duration - segment_seconds < video_utils.MIN_SEGMENT_SECONDS
+
+    result = analyze_video_in_segments(
+        FakeClient(), "What happens?", VIDEO_PATH,
+        segment_seconds=segment_seconds, keyframes=keyframes,
+    )
+
+    assert len(result["segments"]) == 1
+    assert result["segments"][0]["end"] == pytest.approx(duration)
+    assert result["summary"] == result["segments"][0]["response"]
+
+
+def test_segment_without_frames_does_not_lose_other_segments(monkeypatch):
+    extract = video_utils.extract_video_frames
+
+    def extract_without_second_segment(video_path, **kwargs):
+        if kwargs["start_seconds"] == 5:
+            return []
+        return extract(video_path, **kwargs)
+
+    monkeypatch.setattr(video_utils, "extract_video_frames", extract_without_second_segment)
+    client = FakeClient()
+
+    result = analyze_video_in_segments(client, "What happens?", VIDEO_PATH, segment_seconds=5)
+
+    assert len(result["segments"]) == 4
+    failed = result["segments"][1]
+    assert failed["response"] is None
+    assert "No frames" in failed["error"]
+    assert all(s["response"] for i, s in enumerate(result["segments"]) if i != 1)
+    # Three segment calls plus the merge
+    assert len(client.requests) == 4
@@ -0,0 +1,46 @@
+import asyncio
+
+from botocore.exceptions import ClientError
+
+from src.utils.warmup import async_warm_up_client, warm_up_client
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "Converse")
+
+
+class FakeClient:
+    def __init__(self, code):
+        self.code = code
+
+    def converse(self, **kwargs):
+        raise client_error(self.code)
+
+
+class FakeAsyncClient(FakeClient):
+    async def converse(self, **kwargs):
+        raise client_error(self.code)
+
+
+def test_validation_exception_counts_as_warmed():
+    result = warm_up_client(FakeClient("ValidationException"), connections=2)
+
+    assert result["connections"] == 2
+    assert result["errors"] == []
+
+
+def test_access_denied_is_not_warmed():
+    result = warm_up_client(FakeClient("AccessDeniedException"), connections=2)
+
+    assert result["connections"] == 0
+    assert len(result["errors"]) == 2
+    assert result["errors"][0].startswith("AccessDeniedException")
+
+
+def test_async_access_denied_is_not_warmed():
+    result = asyncio.run(
+        async_warm_up_client(FakeAsyncClient("AccessDeniedException"), connections=2)
+    )
+
+    assert result["connections"] == 0
+    assert result["errors"][0].startswith("AccessDeniedException")